@@ -0,0 +1,13 @@
+"""
+Benchmarks for xlay in the asv format.
+
+Run against the current checkout:
+    asv run --python=same --quick
+
+Store results for a commit and compare two commits:
+    asv run HEAD^!
+    asv continuous main HEAD
+    asv compare main HEAD
+
+Results are stored in .asv/results.
+"""
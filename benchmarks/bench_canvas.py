@@ -0,0 +1,28 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+import xlay
+
+from .lattices import make_frame, sizes
+
+
+class CanvasDraw:
+    params = sizes
+    param_names = ["size"]
+    timeout = 600
+
+    def setup(self, size):
+        fig, ax = plt.subplots()
+        style = {"center.visible": False}
+        self.canvas = xlay.Canvas2D(style=style, fig=fig, ax=ax)
+        self.canvas.add(make_frame(size))
+
+    def teardown(self, size):
+        plt.close(self.canvas.fig)
+
+    def time_draw(self, size):
+        self.canvas.draw()
+        self.canvas.fig.canvas.draw()
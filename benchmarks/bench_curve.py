@@ -0,0 +1,57 @@
+import numpy as np
+
+import xlay
+
+from .lattices import make_curve, sizes
+
+
+class CurveConstruction:
+    params = sizes
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        self.kind = np.where(np.arange(size) % 2, "bend", "line")
+        self.angle = np.where(np.arange(size) % 2, 0.5, 0)
+
+    def time_lineby_bendby(self, size):
+        make_curve(size).end
+
+    def time_from_arrays(self, size):
+        xlay.Curve.from_arrays(self.kind, 3.0, self.angle).end
+
+
+class CurveEdit:
+    params = sizes
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        self.curve = make_curve(size)
+        self.curve.end
+
+    def time_replace_last(self, size):
+        self.curve.replace_spec(size - 1, xlay.primitives.BendBy(3.0, 0.4))
+        self.curve.end
+
+    def time_insert_first(self, size):
+        self.curve.insert_spec(0, xlay.primitives.LineBy(1.0))
+        self.curve.end
+
+
+class CurvePoint:
+    params = sizes
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        self.curve = make_curve(size)
+        rng = np.random.default_rng(0)
+        self.s = np.sort(rng.uniform(0, self.curve.length * 0.99, size))
+
+    def time_point(self, size):
+        for s in self.s:
+            self.curve.point(s)
+
+    def time_matrices(self, size):
+        self.curve.matrices(self.s)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+
+import xlay
+
+from .lattices import make_beamline, make_yaml, sizes
+
+
+class BeamlineNodes:
+    params = sizes
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        self.beamline = make_beamline(size)
+
+    def time_find_sorted_nodes(self, size):
+        self.beamline.find_sorted_nodes()
+
+    def time_find_segments(self, size):
+        self.beamline.find_segments()
+
+    def time_survey(self, size):
+        self.beamline.survey()
+
+
+class Misalignment:
+    params = [10, 1000, 10000]
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        self.poses = make_beamline(size).survey()
+        self.errors = {"MB.*": {"tx": 1e-4, "ty": 1e-4, "rz": 0.01}}
+
+    def time_misalign(self, size):
+        xlay.misalign(self.poses, self.errors, n_seeds=100)
+
+
+class LayoutFromYaml:
+    params = sizes
+    param_names = ["size"]
+    timeout = 600
+
+    def setup(self, size):
+        fd, self.filename = tempfile.mkstemp(suffix=".yaml")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(make_yaml(size))
+
+    def teardown(self, size):
+        os.remove(self.filename)
+
+    def time_from_yaml(self, size):
+        xlay.Layout.from_yaml(self.filename)
+
+    def time_from_yaml_lazy_item(self, size):
+        xlay.Layout.from_yaml(self.filename, lazy=True)["MQ"]
+
+
+class LayoutDiff:
+    params = sizes
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        self.layout = xlay.Layout({"vars": {}, "RING": make_beamline(size)})
+        other = xlay.Layout({"vars": {}, "RING": make_beamline(size, angle=0.6)})
+        self.poses = self.layout.survey()
+        self.other = other.survey()
+
+    def time_diff(self, size):
+        self.layout.diff(self.other, poses=self.poses)
+
+
+class TfsSurvey:
+    params = sizes
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        fd, self.filename = tempfile.mkstemp(suffix=".tfs")
+        os.close(fd)
+        self.table = xlay.Table.from_poses(make_beamline(size).survey())
+        xlay.write_tfs(self.filename, self.table)
+
+    def teardown(self, size):
+        os.remove(self.filename)
+
+    def time_read_tfs(self, size):
+        xlay.read_tfs(self.filename)
+
+    def time_write_tfs(self, size):
+        xlay.write_tfs(self.filename, self.table)
+
+    def time_to_poses(self, size):
+        self.table.to_poses()
@@ -0,0 +1,77 @@
+import numpy as np
+
+import xlay
+
+from .lattices import make_frame, sizes
+
+
+class PoseChain:
+    params = sizes
+    param_names = ["size"]
+
+    def setup(self, size):
+        self.pose = xlay.Pose()
+        self.step = xlay.Pose().tx(1).rz(0.1)
+
+    def time_transform_chain(self, size):
+        pose = self.pose.clone()
+        for _ in range(size):
+            pose.tx(1).rz(0.1).ty(0.01)
+
+    def time_matmul_chain(self, size):
+        pose = self.pose
+        for _ in range(size):
+            pose = pose @ self.step
+
+
+class FramePathLookup:
+    params = sizes
+    param_names = ["size"]
+    timeout = 300
+
+    def setup(self, size):
+        self.frame = make_frame(size)
+        rng = np.random.default_rng(0)
+        self.paths = [f"P{i}" for i in rng.integers(0, size, 1000)]
+
+    def time_part_lookup(self, size):
+        for path in self.paths:
+            self.frame[path]
+
+    def time_pose_path_lookup(self, size):
+        pose = self.frame.at("top")
+        for path in self.paths:
+            pose[path + "/left"]
+
+
+class Kernels:
+    params = (sizes, list(xlay.kernels.backends))
+    param_names = ["size", "backend"]
+
+    def setup(self, size, backend):
+        if backend == "numba" and xlay.kernels.numba is None:
+            raise NotImplementedError("numba is not installed")
+        self.backend = xlay.kernels.backend
+        xlay.kernels.set_backend(backend)
+        rng = np.random.default_rng(0)
+        self.length = rng.uniform(1, 5, size)
+        self.angle = rng.uniform(-10, 10, size)
+        self.roll = rng.uniform(-90, 90, size)
+        self.matrices = xlay.primitives.segment_matrices(
+            xlay.primitives.BEND, 2, self.length, self.angle, self.roll, self.length
+        )
+        self.points = np.vstack([rng.normal(size=(3, 1000)), np.ones(1000)])
+
+    def teardown(self, size, backend):
+        xlay.kernels.set_backend(self.backend)
+
+    def time_segment_matrices(self, size, backend):
+        xlay.primitives.segment_matrices(
+            xlay.primitives.BEND, 2, self.length, self.angle, self.roll, self.length
+        )
+
+    def time_cumulative_matmul(self, size, backend):
+        xlay.pose.cumulative_matmul(self.matrices)
+
+    def time_transform_points(self, size, backend):
+        xlay.kernels.transform_points(self.matrices[:10], self.points)
@@ -0,0 +1,54 @@
+"""
+Synthetic lattices for the benchmarks.
+"""
+
+import numpy as np
+
+import xlay
+
+sizes = [10, 100, 1000, 10000, 100000]
+
+
+def make_frame(size):
+    """Frame of size rectangles on a ring"""
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    angles = np.linspace(0, 360, size, endpoint=False)
+    return xlay.Frame(
+        "F", *[rect.at(f"P{i}").rz(angle).tx(size) for i, angle in enumerate(angles)]
+    )
+
+
+def make_curve(size, length=3.0, angle=0.5):
+    """Curve of size segments alternating lines and bends"""
+    curve = xlay.Curve()
+    for i in range(size):
+        if i % 2 == 0:
+            curve.lineby(length)
+        else:
+            curve.bendby(length, angle)
+    return curve
+
+
+def make_beamline(size, length=3.0, spacing=5.0, angle=0.5):
+    """Beamline of size bending magnets"""
+    mb = xlay.Magnet(length=length, angle=angle, name="MB")
+    nodes = {}
+    for i in range(size):
+        name = f"MB.{i}"
+        nodes[name] = xlay.Node(name, mb, at=i * spacing)
+    return xlay.Beamline(name="RING", nodes=nodes)
+
+
+def make_yaml(size, spacing=5.0):
+    """Text of a layout file with a beamline of size bending magnets"""
+    lines = [
+        "MB: [Bend, length: 3, angle: 0.5]",
+        "MQ: [Quadrupole, length: 1]",
+        "",
+        "RING:",
+        "   - Beamline",
+    ]
+    for i in range(size):
+        kind = "MQ" if i % 2 else "MB"
+        lines.append(f"   - {kind}.{i}: [{kind}, at: {i * spacing}]")
+    return "\n".join(lines) + "\n"
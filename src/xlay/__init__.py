@@ -35,9 +35,16 @@ import importlib.metadata
 
 __version__ = importlib.metadata.version(__package__ or __name__)
 
-from .assembly import Assembly, Magnet
+from .aperture import ApertureModel
+from .assembly import Assembly, Magnet, Region
 from .layout import Beamline, Layout, Node, Env
-from .pose import Pose, Element, Frame
-from .primitives import (Bend, Box, Circle, Curve, Ellipse, Line, Polygon,
-                         Polyline, Rectangle, Text, Tube)
-from .canvas import Canvas2D
+from .pose import Pose, PoseArray, Element, Frame, set_vertex_dtype
+from .primitives import (Bend, Box, Circle, Curve, Ellipse, Line, Mesh,
+                         Polygon, Polyline, Rectangle, Text, Tube)
+from .canvas import Canvas2D, CurvilinearProjection, MultiView
+from .export import write_glb, write_obj, write_stl
+from .misalignment import misalign
+from .tfs import Table, read_tfs, write_tfs
+from .profiling import profile
+from .cache import render_cache
+from . import kernels
@@ -0,0 +1,172 @@
+"""
+Aperture model of a beamline.
+
+Apertures are given in the assembly, as the aperture attribute of a Magnet,
+or as profiles of a Region, in the form:
+
+    ["circle", r]
+    ["ellipse", a, b]
+    ["rectangle", rx, ry]
+    ["rectellipse", rx, ry, a, b]
+    ["polygon", [[x0, y0], [x1, y1], ...]]
+
+Region.profiles is a list of [start, end, aperture] with start and end
+relative to the start of the region.
+
+The model stores the s intervals sorted by start, with the shape kind and the
+parameters in arrays, such that many s values are queried at once. Intervals
+may overlap, e.g. the aperture of a magnet and the profiles of a region: the
+s axis is partitioned at all the interval boundaries and each part is owned
+by the covering interval starting last.
+
+    model = beamline.apertures()
+    idx = model.aperture_at(s)       # interval index, -1 outside apertures
+    mask = model.inside(s, x, y)     # True if (x, y) is inside the aperture
+"""
+
+import numpy as np
+from matplotlib.path import Path
+
+CIRCLE, ELLIPSE, RECTANGLE, RECTELLIPSE, POLYGON = range(5)
+
+kinds = {
+    "circle": CIRCLE,
+    "ellipse": ELLIPSE,
+    "rectangle": RECTANGLE,
+    "rectellipse": RECTELLIPSE,
+    "polygon": POLYGON,
+}
+
+
+def parse_aperture(data):
+    """Return kind, params (4) and polygon vertices of an aperture definition"""
+    name = data[0].lower()
+    if name not in kinds:
+        raise ValueError(f"Unknown aperture {name}, use one of {list(kinds)}")
+    kind = kinds[name]
+    params = np.full(4, np.inf)
+    polygon = None
+    if kind == CIRCLE:
+        params[:2] = data[1]
+    elif kind == POLYGON:
+        polygon = np.asarray(data[1], dtype=float)
+    else:
+        params[: len(data) - 1] = data[1:]
+    if kind == RECTANGLE:
+        params[2:] = np.inf
+    return kind, params, polygon
+
+
+def node_apertures(node):
+    """Yield (start, end, aperture) of a node, relative to the node start"""
+    assembly = node.assembly
+    aperture = getattr(assembly, "aperture", None)
+    if aperture is not None:
+        yield 0, node.ref_length, aperture
+    for start, end, aperture in getattr(assembly, "profiles", None) or []:
+        yield start, end, aperture
+
+
+class ApertureModel:
+    @classmethod
+    def from_beamline(cls, beamline):
+        names, _, node_start = beamline.find_node_extents()
+        intervals = []
+        for name, start in zip(names, node_start):
+            node = beamline.nodes[name]
+            for ap_start, ap_end, aperture in node_apertures(node):
+                intervals.append(
+                    (start + ap_start, start + ap_end, name, aperture)
+                )
+        return cls(intervals)
+
+    def __init__(self, intervals):
+        """intervals: list of (start, end, name, aperture definition)"""
+        intervals = sorted(intervals, key=lambda x: x[0])
+        nint = len(intervals)
+        self.start = np.array([it[0] for it in intervals], dtype=float)
+        self.end = np.array([it[1] for it in intervals], dtype=float)
+        self.names = [it[2] for it in intervals]
+        self.kind = np.zeros(nint, dtype=int)
+        self.params = np.zeros((nint, 4))
+        self.polygons = {}  # interval index -> Path
+        for idx, (_, _, _, aperture) in enumerate(intervals):
+            kind, params, polygon = parse_aperture(aperture)
+            self.kind[idx] = kind
+            self.params[idx] = params
+            if polygon is not None:
+                self.polygons[idx] = Path(polygon)
+        # partition of s: owner[k] is the interval used between breaks[k] and
+        # breaks[k+1] (-1 after the last break), break_owner[k] the one used
+        # at breaks[k]
+        self.breaks = np.unique(np.concatenate([self.start, self.end]))
+        self.owner = np.full(len(self.breaks), -1)
+        self.break_owner = np.full(len(self.breaks), -1)
+        lo = np.searchsorted(self.breaks, self.start)
+        hi = np.searchsorted(self.breaks, self.end)
+        for idx in range(nint):  # later starts overwrite earlier ones
+            self.owner[lo[idx] : hi[idx]] = idx
+            self.break_owner[lo[idx] : hi[idx] + 1] = idx
+
+    def __len__(self):
+        return len(self.start)
+
+    def __repr__(self):
+        return f"ApertureModel: {len(self)} intervals"
+
+    def aperture_at(self, s):
+        """Return the index of the aperture interval containing s, or -1
+
+        If intervals overlap, the covering one starting last is used.
+        Intervals include their end.
+        """
+        s = np.asarray(s, dtype=float)
+        nbreaks = len(self.breaks)
+        if nbreaks == 0:
+            return np.full(s.shape, -1)
+        part = np.searchsorted(self.breaks, s, side="right") - 1
+        clipped = np.maximum(part, 0)
+        idx = np.where(part >= 0, self.owner[clipped], -1)
+        on_break = (part >= 0) & (s == self.breaks[clipped])
+        return np.where(on_break, self.break_owner[clipped], idx)
+
+    def inside(self, s, x, y):
+        """Return True where (x, y) at s is inside the aperture
+
+        Points at s outside of any aperture interval are inside.
+        """
+        s, x, y = np.broadcast_arrays(
+            np.asarray(s, dtype=float), np.asarray(x, dtype=float), y
+        )
+        idx = self.aperture_at(s)
+        result = np.ones(s.shape, dtype=bool)
+        has = idx >= 0
+        ii = idx[has]
+        xx = x[has]
+        yy = y[has]
+        kind = self.kind[ii]
+        p0, p1, p2, p3 = self.params[ii].T
+        rect = (np.abs(xx) <= p0) & (np.abs(yy) <= p1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ellipse = (xx / p0) ** 2 + (yy / p1) ** 2 <= 1
+            rectellipse = rect & ((xx / p2) ** 2 + (yy / p3) ** 2 <= 1)
+        circle = xx**2 + yy**2 <= p0**2
+        inside = np.select(
+            [
+                kind == CIRCLE,
+                kind == ELLIPSE,
+                kind == RECTANGLE,
+                kind == RECTELLIPSE,
+            ],
+            [circle, ellipse, rect, rectellipse],
+            default=False,
+        )
+        # group the points by polygon, one contains_points call per polygon
+        (where,) = np.nonzero(kind == POLYGON)
+        order = where[np.argsort(ii[where], kind="stable")]
+        pidx, first = np.unique(ii[order], return_index=True)
+        for pp, group in zip(pidx, np.split(order, first[1:])):
+            points = np.column_stack([xx[group], yy[group]])
+            inside[group] = self.polygons[pp].contains_points(points)
+        result[has] = inside
+        return result
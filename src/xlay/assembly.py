@@ -4,10 +4,12 @@ The assembly is a container of parts. A part is elemement/component at a given p
 
 from typing import Any
 
+from .pose import Parts
+
 
 class Assembly:
     @classmethod
-    def from_yamldata(cls, name, data):
+    def from_yamldata(cls, name, data, env=None):
         kwargs = {}
         for attr in data:
             for kattr, vattr in attr.items():
@@ -25,15 +27,26 @@ class Assembly:
     def at(self, point, name=None):
         return point.clone(type=self, name=name)
 
-    def clone(self, **kwargs):
-        data = {**self.__dict__, **kwargs}
-        return super().__class__(prototype=self, **data)
+    def clone(self, parts=None, **kwargs):
+        """Return a copy-on-write clone sharing the parts and data of self
+
+        parts: dict of parts overriding the ones of self
+        """
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        if isinstance(self.parts, Parts):
+            new.parts = self.parts.clone(parts)
+        elif self.parts is not None or parts is not None:
+            new.parts = Parts(parts, base=dict(self.parts or {}))
+        new.prototype = self
+        new.__dict__.update(kwargs)
+        return new
 
     def __repr__(self):
         return f"{self.name}: {self.show_yaml()}"
 
     def show_yaml(self):
-        attr = [str(self.prototype)]
+        attr = [str(getattr(self.prototype, "name", self.prototype))]
         for k, v in self.__dict__.items():
             if k not in ["name", "parts", "prototype"]:
                 if v is not None:
@@ -68,4 +81,4 @@ class Region(Assembly):
         self.angle = angle
         self.tilt = tilt
         self.profiles = profiles
-        super().__init__(name=name, **parts)
+        super().__init__(name=name, prototype=self.__class__.__name__, parts=parts)
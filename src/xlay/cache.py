@@ -0,0 +1,361 @@
+"""
+Cache of the render output of elements, disabled by default.
+
+The cache key is a content fingerprint of the element and of the style, so
+the cached primitives are reused when an equal element is drawn again with an
+equal style and recomputed as soon as an attribute changes:
+
+    xlay.render_cache.enabled = True
+    canvas.draw()                    # renders
+    canvas.draw()                    # cache hits, no rendering
+    rect.lx = 2
+    canvas.draw()                    # rect is rendered again
+    print(xlay.render_cache.stats())
+
+The cache is bounded by the number of entries and by the bytes of the arrays
+of the primitives. iter_render streams the primitives on a miss and stores
+them once the iteration is complete.
+
+The cached primitives are shared between the callers, they must not be
+modified in place. Memory mapped arrays are fingerprinted by file, offset and
+shape, not by content, and not counted in the cache size.
+
+Element, Pose, PoseArray and Parts are nodes with a memoized content_hash.
+The hash of a node combines its own attributes with the hashes of the nodes
+it refers to, as in a Merkle tree, e.g. a Frame -> Parts -> Pose -> Element.
+A node hashing another one registers itself as a weakly referenced parent of
+it. Changing a node through its setters and methods clears its hash and the
+hashes of its parents, up to the first one already cleared, so only the
+changed paths are hashed again. Parts keep the digest of each item and hash
+again only the items that changed.
+
+Arrays and containers modified in place, and Pose attributes assigned
+directly, must be followed by invalidate(node).
+"""
+
+import functools
+import hashlib
+import threading
+import types
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+
+from . import profiling
+
+
+function_types = (
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    functools.partial,
+)
+
+
+scalar_types = {type(None), bool, int, float, complex, str, bytes}
+
+
+def new_hash(tag):
+    return hashlib.blake2b(tag.encode(), digest_size=16)
+
+
+def register(node, parent, key=None):
+    """Record that the memoized hash of parent depends on node
+
+    key: passed to parent.hash_changed when node changes, e.g. the key of
+    the part holding node, None if the whole parent must be hashed again.
+    The nodes returned by node.linked_nodes(), whose hashes are combined in
+    the one of node without being memoized, are registered with key None.
+    """
+    parents = getattr(node, "hash_parents", None)
+    if parents is None:
+        parents = {}
+        object.__setattr__(node, "hash_parents", parents)
+    ref = parents.get((id(parent), key))
+    if ref is None or ref() is not parent:
+        parents[id(parent), key] = weakref.ref(parent)
+    linked = getattr(node, "linked_nodes", None)
+    if linked is not None:
+        for other in linked():
+            register(other, parent)
+
+
+def invalidate(node, key=None):
+    """Clear the memoized hash of node and of the nodes depending on it
+
+    key: key of the part of node that changed, None if unknown
+    """
+    pending = [(node, key)]
+    while len(pending) > 0:
+        node, key = pending.pop()
+        changed = getattr(node, "hash_changed", None)
+        if changed is not None:
+            changed(key)
+        if getattr(node, "hash_cache", None) is None:
+            continue  # not hashed since its last change, nor its parents
+        object.__setattr__(node, "hash_cache", None)
+        parents = getattr(node, "hash_parents", None)
+        if parents:
+            object.__setattr__(node, "hash_parents", None)
+            for (_, parent_key), ref in parents.items():
+                parent = ref()
+                if parent is not None:
+                    pending.append((parent, parent_key))
+
+
+def node_hash(node, compute=None):
+    """Return the memoized content hash of a node
+
+    compute(node, memo, deps) returns the digest and appends to deps the
+    nodes used, by default fingerprint_attributes.
+    """
+    digest = getattr(node, "hash_cache", None)
+    if digest is None:
+        if compute is None:
+            compute = fingerprint_attributes
+        deps = []
+        digest = compute(node, {}, deps)
+        for dep in deps:
+            register(dep, node)
+        object.__setattr__(node, "hash_cache", digest)
+    return digest
+
+
+def fingerprint(obj, memo=None, deps=None):
+    """Return a 16 bytes digest of the content of obj
+
+    Objects are hashed by class and attributes, in slots and __dict__,
+    except the ones in the fingerprint_exclude attribute of the class.
+    Nodes are hashed by their content_hash, appended to deps if given.
+    memo: dict id -> digest of the objects already hashed
+    """
+    if memo is None:
+        memo = {}
+    if obj is None or isinstance(obj, (bool, int, float, complex, str, bytes)):
+        return new_hash(f"{type(obj).__name__}:{obj!r}").digest()
+    if hasattr(type(obj), "content_hash"):
+        if deps is not None:
+            deps.append(obj)
+        return obj.content_hash()
+    key = id(obj)
+    if key in memo:
+        return memo[key]
+    memo[key] = b"cycle"  # placeholder for self references
+    if isinstance(obj, np.memmap):
+        filename = getattr(obj, "filename", None)
+        h = new_hash(f"memmap:{filename}:{obj.offset}:{obj.shape}:{obj.strides}")
+        h.update(obj.dtype.str.encode())
+    elif isinstance(obj, np.ndarray):
+        h = new_hash(f"array:{obj.shape}:{obj.dtype.str}")
+        if obj.dtype.hasobject:
+            for item in obj.ravel():
+                h.update(fingerprint(item, memo, deps))
+        else:
+            h.update(np.ascontiguousarray(obj).data)
+    elif isinstance(obj, np.generic):
+        h = new_hash(f"{obj.dtype.str}:{obj!r}")
+    elif isinstance(obj, Mapping):
+        h = new_hash("map")
+        update_items(h, list(obj.keys()), memo, deps)
+        update_items(h, list(obj.values()), memo, deps)
+    elif isinstance(obj, (list, tuple)):
+        h = new_hash(type(obj).__name__)
+        update_items(h, obj, memo, deps)
+    elif isinstance(obj, (set, frozenset)):
+        h = new_hash(type(obj).__name__)
+        for digest in sorted(fingerprint(item, memo, deps) for item in obj):
+            h.update(digest)
+    elif isinstance(obj, function_types):
+        h = new_hash(f"function:{id(obj)}")
+    else:
+        digest = fingerprint_attributes(obj, memo, deps)
+        memo[key] = digest
+        return digest
+    digest = h.digest()
+    memo[key] = digest
+    return digest
+
+
+def fingerprint_attributes(obj, memo, deps=None):
+    """Return the digest of the class and the attributes of obj"""
+    cls = type(obj)
+    h = new_hash(f"{cls.__module__}.{cls.__qualname__}")
+    exclude = getattr(cls, "fingerprint_exclude", ())
+    for attr, value in iter_attributes(obj):
+        if attr not in exclude:
+            h.update(attr.encode())
+            h.update(fingerprint(value, memo, deps))
+    return h.digest()
+
+
+def update_items(h, items, memo, deps=None):
+    """Update the hash h with the fingerprints of a sequence of items
+
+    Sequences of scalars are hashed at once.
+    """
+    h.update(f"len:{len(items)}".encode())
+    if all(type(item) in scalar_types for item in items):
+        h.update(repr(list(items)).encode())
+    else:
+        for item in items:
+            h.update(fingerprint(item, memo, deps))
+
+
+hash_attributes = ("hash_cache", "hash_parents")
+
+
+def iter_attributes(obj):
+    """Yield (name, value) of the attributes in slots and __dict__"""
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for attr in slots:
+            if attr in ("__dict__", "__weakref__") or attr in hash_attributes:
+                continue
+            if hasattr(obj, attr):
+                yield attr, getattr(obj, attr)
+    for attr, value in sorted(getattr(obj, "__dict__", {}).items()):
+        if attr not in hash_attributes:
+            yield attr, value
+
+
+def primitives_nbytes(primitives):
+    """Return the bytes of the matrices and of the element arrays"""
+    total = 0
+    seen = set()
+    for primitive in primitives:
+        total += primitive.matrix.nbytes
+        element = primitive.element
+        if element is None or id(element) in seen:
+            continue
+        seen.add(id(element))
+        for _, value in iter_attributes(element):
+            if isinstance(value, np.ndarray) and not isinstance(value, np.memmap):
+                total += value.nbytes
+    return total
+
+
+class RenderCache:
+    """LRU cache of render outputs with hit and miss counters
+
+    maxsize: maximum number of entries
+    maxbytes: maximum bytes of the arrays of the cached primitives
+    """
+
+    def __init__(self, maxsize=1024, maxbytes=256 * 2**20):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (primitives, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            profiling.count("render_cache.miss")
+            return None
+        profiling.count("render_cache.hit")
+        return entry[0]
+
+    def put(self, key, value):
+        nbytes = primitives_nbytes(value)
+        if nbytes > self.maxbytes:
+            return  # larger than the cache
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self.entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while len(self.entries) > self.maxsize or self.nbytes > self.maxbytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "nbytes": self.nbytes,
+                "maxbytes": self.maxbytes,
+            }
+
+
+render_cache = RenderCache()
+
+
+def render_key(func, obj, style, args, kwargs):
+    memo = {}
+    h = new_hash(func.__qualname__)
+    h.update(fingerprint(obj, memo))
+    h.update(fingerprint(style, memo))
+    h.update(fingerprint((args, kwargs), memo))
+    return h.digest()
+
+
+def cached_render(func):
+    """Decorator caching the list returned by render(self, style, ...)"""
+
+    @functools.wraps(func)
+    def wrapper(self, style=None, *args, **kwargs):
+        if not render_cache.enabled:
+            return func(self, style, *args, **kwargs)
+        key = render_key(func, self, style, args, kwargs)
+        primitives = render_cache.get(key)
+        if primitives is None:
+            primitives = list(func(self, style, *args, **kwargs))
+            render_cache.put(key, primitives)
+        return list(primitives)
+
+    return wrapper
+
+
+def cached_iter_render(func):
+    """Decorator caching the items of iter_render(self, style, ...)
+
+    On a miss the items are yielded as they are produced and cached when the
+    iteration completes.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, style=None, *args, **kwargs):
+        if not render_cache.enabled:
+            return func(self, style, *args, **kwargs)
+        key = render_key(func, self, style, args, kwargs)
+        primitives = render_cache.get(key)
+        if primitives is not None:
+            return iter(primitives)
+        return iter_and_cache(key, func(self, style, *args, **kwargs))
+
+    return wrapper
+
+
+def iter_and_cache(key, iterator):
+    primitives = []
+    for primitive in iterator:
+        primitives.append(primitive)
+        yield primitive
+    render_cache.put(key, primitives)
@@ -4,12 +4,25 @@ label is for presentation
 
 
 element.render() -> generate list poses of primitives
+element.iter_render() -> yield the same primitives one by one
 canvas.draw_primitive() -> extract points or mesh from primitive and draw using style
 
+canvas.draw_async() renders, transforms and projects in a worker thread, the
+artists are created on the main thread when the result is ready. A new draw
+supersedes the previous one, which is cancelled.
+
 """
 
+import functools
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
 import matplotlib.pyplot as plt
 import matplotlib as mpl
+import matplotlib.collections as mcollections
+import matplotlib.colors as mcolors
 import matplotlib.lines as mlines
 import matplotlib.patches as mpatches
 import matplotlib.path as mpath
@@ -18,7 +31,13 @@ import matplotlib.path as mpath
 from matplotlib import patches
 import numpy as np
 
+from . import kernels
+from .cache import fingerprint
+from .pose import PoseArray, filter_primitives, get_vertex_dtype
+from .profiling import count, timed
+
 
+@timed
 def resolve_style(style, primitive, layer, name):
     if style is None:
         style = {}
@@ -31,6 +50,94 @@ def resolve_style(style, primitive, layer, name):
     return style
 
 
+def artist_kwargs(style):
+    """Return the matplotlib properties in a resolved style
+
+    Nested styles, dotted keys (e.g. "center.visible") and the render options
+    are removed.
+    """
+    return {
+        k: v
+        for k, v in style.items()
+        if not isinstance(v, dict) and "." not in k and k not in ("visible", "labels")
+    }
+
+
+def world_points(primitive, dtype=None, origin=None):
+    """Return the points of the primitive in world coordinates
+
+    Returns 4xN for a Pose or Mx4xN for the M instances of a PoseArray.
+    For elements without points, returns the location: 4 or 4xM.
+
+    The product is computed in float64 at least, the result is taken
+    relative to origin, if given, and converted to dtype, if given.
+    """
+    points = getattr(primitive.element, "points", None)
+    if points is None:
+        points = primitive.matrix[..., 3].T
+    else:
+        if callable(points):
+            points = points()
+        points = kernels.transform_points(primitive.matrix, points)
+    if origin is not None:
+        origin = np.append(origin, 0)
+        points = points - (origin if points.ndim == 1 else origin[:, None])
+    if dtype is not None:
+        points = points.astype(dtype, copy=False)
+    return points
+
+
+class WorldGeometry:
+    """
+    Rendered primitives of elements with their points in world coordinates.
+
+    Canvases sharing a WorldGeometry render and transform each element once.
+    The cache entries are keyed by the content fingerprints of the element,
+    the style and the filters, so they are refreshed after changes in place,
+    see cache.fingerprint.
+
+    dtype: dtype of the cached points, default from get_vertex_dtype
+    origin: local origin of the cached points, the canvases then show
+            coordinates relative to it. Useful with float32 for large layouts,
+            not supported by CurvilinearProjection.
+    """
+
+    def __init__(self, dtype=None, origin=None):
+        self.dtype = get_vertex_dtype(dtype)
+        self.origin = origin
+        self.cache = {}
+        self.lock = threading.Lock()  # canvases may draw in background
+
+    def get(self, key, element, style, filters):
+        """Return a list of (primitive, points) for the element
+
+        The lock is only held to access the cache, canvases drawing in
+        background render concurrently.
+        """
+        digest = fingerprint((element, style, filters))
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        items = [
+            (primitive, world_points(primitive, self.dtype, self.origin))
+            for primitive in filter_primitives(
+                element.iter_render(style), **filters
+            )
+        ]
+        with self.lock:
+            self.cache[key] = (digest, items)
+        return items
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+class Projected(tuple):
+    """(x, y) coordinates already projected, drawn as they are"""
+
+
 class SimpleProjection:
     def __init__(self, axes="xy", scale=1, origin=[0, 0]):
         self.axes = axes
@@ -48,12 +155,143 @@ class SimpleProjection:
 
         Args:
             points np.ndarray 3xN: N 3D points in columns
+                   or Mx3xN for M instances of N points
         """
+        if points.ndim == 3:
+            points = points.transpose(1, 0, 2)
+        if np.array_equal(self.scale, (1, 1)) and not np.any(self.origin):
+            return points[self.idx0], points[self.idx1]  # views, no copy
         x = points[self.idx0] * self.scale[0] + self.origin[0]
         y = points[self.idx1] * self.scale[1] + self.origin[1]
         return x, y
 
 
+class CurvilinearProjection:
+    """
+    Projection on the (s, x) or (s, y) plane of a reference curve.
+
+    The curve is sampled every ds and a point starts from the closest sample.
+    Newton iterations then move s to the foot of the point on the curve, where
+    the offset is orthogonal to the tangent, using the tangent change between
+    samples as curvature. The point is projected on the local frame at s: the
+    offset is along dx or dy, points beyond the ends are extended along the
+    end tangents. The s of the last cache_size input arrays are kept while
+    the arrays are alive, so the points of a WorldGeometry are only searched
+    once. The arrays themselves are not referenced.
+    """
+
+    def __init__(
+        self,
+        curve,
+        axes="sx",
+        ds=None,
+        scale=1,
+        origin=[0, 0],
+        cache_size=16,
+        tolerance=1e-9,
+        max_iterations=8,
+    ):
+        from scipy.spatial import cKDTree
+
+        self.curve = curve
+        self.axes = axes
+        if np.isscalar(scale):
+            self.scale = [scale, scale]
+        else:
+            self.scale = scale
+        self.origin = origin
+        self.idx1 = {"x": 0, "y": 1}[axes[1]]
+        if ds is None:
+            ds = curve.lookup_ds
+        steps = max(int(np.ceil(curve.length / ds)), 1)
+        self.s = np.linspace(curve.s_start, curve.s_end, steps + 1)
+        matrix = curve.matrices(self.s)
+        self.loc = matrix[:, :3, 3]
+        tangent = matrix[:, :3, 2]
+        # change of the tangent per unit length between consecutive samples
+        self.curvature = np.diff(tangent, axis=0) / np.diff(self.s)[:, None]
+        self.tree = cKDTree(self.loc)
+        self.tolerance = tolerance  # on s, in m
+        self.max_iterations = max_iterations
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # id(key) -> (weakref to key, s)
+
+    def locate(self, key, points):
+        """Return the s of the foot on the curve of 3xN points
+
+        key: array identifying the points, the cached result is dropped when
+        the key is garbage collected
+        """
+        cached = self.cache.get(id(key))
+        if cached is not None and cached[0]() is key:
+            self.cache.move_to_end(id(key))
+            return cached[1]
+        _, idx = self.tree.query(points.T)
+        s = self.refine(points, self.s[idx])
+        try:
+            ref = weakref.ref(key, functools.partial(self.forget, id(key)))
+        except TypeError:  # not weak referenceable, not cached
+            return s
+        self.cache[id(key)] = (ref, s)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return s
+
+    def refine(self, points, s):
+        """Return s moved by Newton iterations to the foot of 3xN points"""
+        s = s.copy()
+        active = np.arange(len(s))  # points not converged yet
+        for _ in range(self.max_iterations):
+            ss = s[active]
+            matrix = self.curve.matrices(ss)
+            delta = points[:, active].T - matrix[:, :3, 3]
+            along = np.einsum("ni,ni->n", matrix[:, :3, 2], delta)
+            interval = np.searchsorted(self.s, ss, side="right") - 1
+            interval = np.clip(interval, 0, len(self.curvature) - 1)
+            slope = 1 - np.einsum("ni,ni->n", self.curvature[interval], delta)
+            # far from the curve, near the center of curvature, take short steps
+            step = along / np.maximum(slope, 0.1)
+            new = np.clip(ss + step, self.s[0], self.s[-1])
+            s[active] = new
+            active = active[np.abs(new - ss) >= self.tolerance]
+            if len(active) == 0:
+                break
+        return s
+
+    def forget(self, key_id, ref):
+        cached = self.cache.get(key_id)
+        if cached is not None and cached[0] is ref:
+            del self.cache[key_id]
+
+    def transform(self, points):
+        """Transform points from 3D to (s, offset)
+
+        Args:
+            points np.ndarray 3xN or 4xN: N 3D points in columns
+                   or Mx4xN for M instances of N points
+        """
+        if points.ndim == 1:
+            flat = points[:3, None]
+        elif points.ndim == 2:
+            flat = points[:3]
+        else:
+            flat = points[:, :3].transpose(1, 0, 2).reshape(3, -1)
+        s = self.locate(points, flat)
+        matrix = self.curve.matrices(s)
+        delta = flat.T - matrix[:, :3, 3]
+        local = np.einsum("nji,nj->ni", matrix[:, :3, :3], delta)
+        s = s + local[:, 2]  # non zero beyond the ends only
+        offset = local[:, self.idx1]
+        if points.ndim == 1:
+            s, offset = s[0], offset[0]
+        elif points.ndim == 3:
+            s = s.reshape(len(points), -1)
+            offset = offset.reshape(len(points), -1)
+        x = s * self.scale[0] + self.origin[0]
+        y = offset * self.scale[1] + self.origin[1]
+        return x, y
+
+
 class Canvas2D:
     default_style = {}
 
@@ -68,13 +306,15 @@ class Canvas2D:
         ylabel=None,
         fig=None,
         ax=None,
+        filters=None,
+        geometry=None,
     ):
         if isinstance(projection, str):
             self.projection = SimpleProjection(axes=projection, origin=origin, scale=scale)
         else:
             self.projection = projection
         if style is None:
-            style = Canvas2D.default_style
+            style = dict(Canvas2D.default_style)  # modified in place by users
         self.style = style
         self.units = units
         if xlabel is None:
@@ -83,8 +323,18 @@ class Canvas2D:
         if ylabel is None:
             ylabel = f"{self.projection.axes[1]} [{self.units}]"
         self.ylabel = ylabel
+        if filters is None:
+            filters = {}
+        self.filters = filters  # arguments of filter_primitives
+        self.geometry = geometry  # shared WorldGeometry cache
         self.artists = {}
         self.elements = {}
+        self.executor = None  # worker of draw_async
+        self.generation = 0  # incremented by each draw, to cancel older ones
+        self.pending = None  # future of the last draw_async
+        self.timer = None
+        self.rasters = []  # DensityRaster, referenced for their callbacks
+        self.pose_batches = {}  # style key -> (kwargs, xs, ys), see draw_pose
         self.set_figure(fig, ax)
 
     def add(self, element):
@@ -92,6 +342,7 @@ class Canvas2D:
         return self
 
     def set_figure(self, fig, ax):
+        new_figure = fig is None and ax is None
         if fig is not None:
             self.fig = fig
             if ax is None:
@@ -102,61 +353,491 @@ class Canvas2D:
             if ax is None:
                 self.fig, self.ax = plt.subplots()
                 self.ax.set_aspect("equal")
-                self.draw()
-                self.fig.show()
             else:
                 self.ax = ax
                 self.fig = ax.get_figure()
+        self.labels = LabelLayer(self.ax)
+        if new_figure:
+            self.draw()
+            self.fig.show()
 
     def clear(self):
         for key, artists in self.artists.items():
             for artist in artists:
                 artist.remove()
+        self.artists = {}
+        for raster in self.rasters:
+            raster.disconnect()
+        self.rasters = []
+        self.pose_batches = {}
+        self.labels.clear()
+
+    def iter_items(self, key, element, style):
+        """Yield (primitive, points) of the element, points may be None"""
+        if self.geometry is None:
+            for primitive in filter_primitives(
+                element.iter_render(style), **self.filters
+            ):
+                yield primitive, None
+        else:
+            yield from self.geometry.get(key, element, style, self.filters)
 
+    def project(self, points):
+        if isinstance(points, Projected):
+            return points
+        return self.projection.transform(points)
+
+    @timed
     def draw(self, style=None):
+        self.cancel()
         self.clear()
         self.ax.set_xlabel(self.xlabel)
         self.ax.set_ylabel(self.ylabel)
         if style is None:
             style = self.style
         for key, element in self.elements.items():
-            for primitive in element.render(style):
-                artists = self.draw_primitive(primitive, style)
-                self.artists[key] = artists
+            artists = []
+            for primitive, points in self.iter_items(key, element, style):
+                artists.extend(self.draw_primitive(primitive, style, points))
+            artists.extend(self.draw_pose_batches())
+            self.artists[key] = artists
+        self.labels.update()
         self.fig.show()
 
-    def draw_primitive(self, primitive, style):
+    def draw_async(self, style=None, poll=50):
+        """Draw in the background, return a Future of the projected items
+
+        Rendering, transformation and projection run in a worker thread, the
+        artists are created on the main thread by a timer of the figure,
+        every poll ms, or by calling flush(). A new draw cancels this one.
+        """
+        self.cancel()
+        if style is None:
+            style = self.style
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        generation = self.generation
+        self.pending = self.executor.submit(self.compute, style, generation)
+        if self.timer is None:
+            self.timer = self.fig.canvas.new_timer(interval=poll)
+            self.timer.add_callback(self.flush)
+        self.timer.start()
+        return self.pending
+
+    def close(self):
+        """Cancel the background drawing and shut down its worker"""
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.timer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def cancel(self):
+        """Cancel the running draw_async, if any"""
+        self.generation += 1
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+        if self.timer is not None:
+            self.timer.stop()
+
+    @timed
+    def compute(self, style, generation):
+        """Return {key: [(primitive, style, (x, y))]}, None if superseded"""
+        result = {}
+        for key, element in list(self.elements.items()):
+            items = []
+            for primitive, points in self.iter_items(key, element, style):
+                if generation != self.generation:
+                    return None
+                pstyle = resolve_style(
+                    style, primitive, primitive.layer, primitive.name
+                )
+                if not pstyle.get("visible", True):
+                    continue
+                if points is None:
+                    points = world_points(primitive)
+                xy = Projected(self.projection.transform(points))
+                items.append((primitive, pstyle, xy))
+            result[key] = items
+        return result
+
+    def flush(self, wait=False):
+        """Create the artists of a finished draw_async, on the main thread
+
+        Returns True if the artists were drawn.
+        """
+        future = self.pending
+        if future is None or not (wait or future.done()):
+            return False
+        self.pending = None
+        if self.timer is not None:
+            self.timer.stop()
+        try:
+            result = future.result()
+        except CancelledError:
+            return False
+        if result is None:
+            return False
+        self.clear()
+        self.ax.set_xlabel(self.xlabel)
+        self.ax.set_ylabel(self.ylabel)
+        for key, items in result.items():
+            artists = []
+            for primitive, style, xy in items:
+                artists.extend(self.draw_resolved(primitive, style, xy))
+            artists.extend(self.draw_pose_batches())
+            self.artists[key] = artists
+        self.labels.update()
+        self.fig.canvas.draw_idle()
+        return True
+
+    @timed
+    def draw_primitive(self, primitive, style, points=None):
         style = resolve_style(
             style, primitive, primitive.layer, primitive.name
         )
         if style.get("visible", True):
-            if primitive.element is None:
-                artists=self.draw_pose(primitive, style)
-            else:
-                method=f"draw_{primitive.element.__class__.__name__}".lower()
-                artists = getattr(self, method)( primitive, style)
-            return artists
+            return self.draw_resolved(primitive, style, points)
         else:
             return []
 
-    def draw_pose(self, pose, style):
-        x, y = self.projection.transform(pose.matrix[:3, 3])
-        return [self.ax.text(x, y, pose.name)]
-
-    def draw_line(self, primitive, style):
-        points = primitive.matrix@primitive.element.points
-        x, y = self.projection.transform(points)
-        return [self.ax.plot(x, y, **style)]
-
-    def draw_polyline(self, primitive, style):
-        points = primitive.matrix@primitive.element.points
-        x, y = self.projection.transform(points)
-        return [self.ax.plot(x, y, **style)]
-
-    def draw_polygon(self, primitive, style):
-        points = primitive.matrix@primitive.element.points
-        xy = np.array(self.projection.transform(points)).T
-        patch = mpatches.Polygon(xy, edgecolor='k',facecolor='none', **style)
-        print(xy.shape)
+    def draw_resolved(self, primitive, style, points=None):
+        """Draw the primitive with an already resolved style"""
+        count("draw.primitives")
+        if isinstance(primitive, PoseArray):
+            count("draw.instances", len(primitive))
+        if primitive.element is None:
+            return self.draw_pose(primitive, style, points)
+        method = f"draw_{primitive.element.__class__.__name__}".lower()
+        return getattr(self, method)(primitive, style, points)
+
+    def draw_pose(self, pose, style, points=None):
+        """Add the poses to the scatter batch of their style
+
+        The names go to the labels if the labels style is set. The batches
+        are drawn by draw_pose_batches, one scatter collection per style.
+        """
+        if points is None:
+            points = world_points(pose)
+        x, y = self.project(points)
+        if style.get("labels", False):
+            names = pose.names if isinstance(pose, PoseArray) else [pose.name]
+            self.labels.add(x, y, names, style.get("label.priority", 0))
+        kwargs = {"marker": "+", "color": "k", **artist_kwargs(style)}
+        key = repr(sorted(kwargs.items()))
+        _, xs, ys = self.pose_batches.setdefault(key, (kwargs, [], []))
+        xs.append(np.atleast_1d(x).ravel())
+        ys.append(np.atleast_1d(y).ravel())
+        return []
+
+    def draw_pose_batches(self):
+        """Draw and empty the scatter batches of draw_pose"""
+        artists = []
+        for kwargs, xs, ys in self.pose_batches.values():
+            artists.append(
+                self.ax.scatter(np.concatenate(xs), np.concatenate(ys), **kwargs)
+            )
+        self.pose_batches = {}
+        return artists
+
+    def draw_text(self, primitive, style, points=None):
+        if points is None:
+            points = world_points(primitive)
+        x, y = self.project(points)
+        self.labels.add(
+            x, y, [primitive.element.text], style.get("label.priority", 0)
+        )
+        return []
+
+    def draw_points(self, primitive, style, points=None):
+        """Draw a point cloud as a density raster, points are not used"""
+        raster = DensityRaster(self, primitive, style)
+        self.rasters.append(raster)
+        return [raster.image]
+
+    def draw_line(self, primitive, style, points=None):
+        return self.draw_polyline(primitive, style, points)
+
+    def draw_polyline(self, primitive, style, points=None):
+        if points is None:
+            points = world_points(primitive)
+        x, y = self.project(points)
+        if isinstance(primitive, PoseArray):
+            lines = mcollections.LineCollection(
+                np.stack([x, y], axis=-1), **artist_kwargs(style)
+            )
+            self.ax.add_collection(lines)
+            self.ax.autoscale_view()
+            return [lines]
+        return self.ax.plot(x, y, **artist_kwargs(style))
+
+    def draw_polygon(self, primitive, style, points=None):
+        if points is None:
+            points = world_points(primitive)
+        x, y = self.project(points)
+        if isinstance(primitive, PoseArray):
+            polygons = mcollections.PolyCollection(
+                np.stack([x, y], axis=-1),
+                **{"edgecolor": "k", "facecolor": "none", **artist_kwargs(style)},
+            )
+            self.ax.add_collection(polygons)
+            self.ax.autoscale_view()
+            return [polygons]
+        xy = np.array([x, y]).T
+        patch = mpatches.Polygon(
+            xy, **{"edgecolor": "k", "facecolor": "none", **artist_kwargs(style)}
+        )
         self.ax.add_patch(patch)
         return [patch]
+
+
+class LabelLayer:
+    """
+    Labels of a canvas, decimated in screen space.
+
+    The screen is divided in cells of cell=(width, height) pixels, only the
+    label with the highest priority is drawn in each cell, and only for the
+    labels inside the axes. Text artists are created for the drawn labels
+    only and recomputed when the limits of the axes change.
+    """
+
+    def __init__(self, ax, cell=(60, 15), max_labels=1000):
+        self.ax = ax
+        self.cell = cell
+        self.max_labels = max_labels
+        self.chunks = []  # (x, y, texts, priority)
+        self.artists = []
+        self.updating = False
+        self.cids = []  # limit callbacks, connected while there are labels
+
+    def add(self, x, y, texts, priority=0):
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        priority = np.broadcast_to(np.asarray(priority, dtype=float), x.shape)
+        self.chunks.append((x, y, list(texts), priority))
+
+    def remove_artists(self):
+        for artist in self.artists:
+            artist.remove()
+        self.artists = []
+
+    def clear(self):
+        self.remove_artists()
+        self.chunks = []
+        self.disconnect()
+
+    def connect(self):
+        if len(self.cids) == 0:
+            self.cids = [
+                self.ax.callbacks.connect("xlim_changed", self.on_limits),
+                self.ax.callbacks.connect("ylim_changed", self.on_limits),
+            ]
+
+    def disconnect(self):
+        for cid in self.cids:
+            self.ax.callbacks.disconnect(cid)
+        self.cids = []
+
+    def select(self):
+        """Return x, y, texts of the labels to draw"""
+        if len(self.chunks) == 0:
+            return np.zeros(0), np.zeros(0), []
+        x = np.concatenate([chunk[0] for chunk in self.chunks])
+        y = np.concatenate([chunk[1] for chunk in self.chunks])
+        priority = np.concatenate([chunk[3] for chunk in self.chunks])
+        texts = [text for chunk in self.chunks for text in chunk[2]]
+        screen = self.ax.transData.transform(np.column_stack([x, y]))
+        x0, y0, x1, y1 = self.ax.bbox.extents
+        visible = (
+            (screen[:, 0] >= x0)
+            & (screen[:, 0] <= x1)
+            & (screen[:, 1] >= y0)
+            & (screen[:, 1] <= y1)
+        )
+        (order,) = np.nonzero(visible)
+        order = order[np.argsort(-priority[order], kind="stable")]
+        cells = np.floor(screen[order] / self.cell).astype(np.int64)
+        # first label of each cell in priority order
+        _, first = np.unique(cells, axis=0, return_index=True)
+        keep = order[np.sort(first)][: self.max_labels]
+        return x[keep], y[keep], [texts[i] for i in keep]
+
+    @timed
+    def update(self):
+        if len(self.chunks) > 0:
+            self.connect()
+        self.updating = True
+        try:
+            self.ax.viewLim  # apply a pending autoscale before selecting
+            self.remove_artists()
+            for xx, yy, text in zip(*self.select()):
+                self.artists.append(self.ax.text(xx, yy, text, clip_on=True))
+        finally:
+            self.updating = False
+
+    def on_limits(self, ax):
+        if len(self.chunks) > 0 and not self.updating:
+            self.update()
+
+
+class DensityRaster:
+    """
+    Density image of a Points primitive.
+
+    The points are read in chunks, transformed, projected and counted in a
+    2D histogram with the resolution of the axes in pixels. The histogram is
+    recomputed when the limits of the axes change.
+
+    Style keys: cmap, log (default True) for a logarithmic color scale.
+    """
+
+    def __init__(self, canvas, primitive, style):
+        self.canvas = canvas
+        self.ax = canvas.ax
+        self.primitive = primitive
+        self.matrices = primitive.matrix.reshape(-1, 4, 4)
+        self.updating = False
+        extent = self.extent()
+        norm = mcolors.LogNorm() if style.get("log", True) else None
+        self.image = self.ax.imshow(
+            np.ma.masked_all((1, 1)),
+            extent=extent,
+            origin="lower",
+            interpolation="nearest",
+            cmap=style.get("cmap", "viridis"),
+            norm=norm,
+            aspect=self.ax.get_aspect(),
+            zorder=0,
+        )
+        self.cids = [
+            self.ax.callbacks.connect("xlim_changed", self.on_limits),
+            self.ax.callbacks.connect("ylim_changed", self.on_limits),
+        ]
+        self.update()
+
+    def disconnect(self):
+        for cid in self.cids:
+            self.ax.callbacks.disconnect(cid)
+        self.cids = []
+
+    def extent(self):
+        """Return the projected extent of the bounding box of the points"""
+        lo, hi = self.primitive.element.bounds()
+        corners = np.array(np.meshgrid(*zip(lo, hi))).reshape(3, -1)
+        corners = np.vstack([corners, np.ones(8)])
+        x, y = self.canvas.projection.transform(self.matrices @ corners)
+        return [np.min(x), np.max(x), np.min(y), np.max(y)]
+
+    @timed
+    def update(self):
+        self.updating = True
+        try:
+            x0, x1 = self.ax.get_xlim()
+            y0, y1 = self.ax.get_ylim()
+            width = max(int(self.ax.bbox.width), 1)
+            height = max(int(self.ax.bbox.height), 1)
+            counts = np.zeros(width * height, dtype=np.int64)
+            for matrix in self.matrices:
+                for chunk in self.primitive.element.iter_chunks():
+                    world = matrix[:3, :3] @ chunk + matrix[:3, 3:]
+                    x, y = self.canvas.projection.transform(world)
+                    ix = np.floor((x - x0) * (width / (x1 - x0))).astype(int)
+                    iy = np.floor((y - y0) * (height / (y1 - y0))).astype(int)
+                    inside = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+                    counts += np.bincount(
+                        iy[inside] * width + ix[inside], minlength=width * height
+                    )
+            counts = counts.reshape(height, width)
+            self.image.set_data(np.ma.masked_equal(counts, 0))
+            self.image.set_extent(
+                [min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)]
+            )
+            if counts.max() > 0:
+                self.image.set_clim(1, counts.max())
+        finally:
+            self.updating = False
+
+    def on_limits(self, ax):
+        if self.image.axes is None or self.updating:
+            return  # removed by clear or updating
+        self.update()
+
+
+class MultiView:
+    """
+    Figure with one Canvas2D per projection sharing a WorldGeometry.
+
+    The elements are rendered and transformed in world coordinates once, each
+    view only selects its projection.
+
+    dtype, origin: vertex dtype and local origin of the WorldGeometry, used
+                   if geometry is not given
+    """
+
+    def __init__(
+        self,
+        projections=("xy", "zx", "zy"),
+        style=None,
+        filters=None,
+        fig=None,
+        geometry=None,
+        dtype=None,
+        origin=None,
+        **kwargs,
+    ):
+        if fig is None:
+            fig = plt.figure()
+        axes = np.atleast_1d(fig.subplots(1, len(projections)))
+        self.fig = fig
+        if geometry is None:
+            geometry = WorldGeometry(dtype=dtype, origin=origin)
+        self.geometry = geometry
+        self.canvases = []
+        for projection, ax in zip(projections, axes):
+            ax.set_aspect("equal")
+            canvas = Canvas2D(
+                projection=projection,
+                style=style,
+                filters=filters,
+                fig=fig,
+                ax=ax,
+                geometry=self.geometry,
+                **kwargs,
+            )
+            self.canvases.append(canvas)
+
+    def __getitem__(self, idx):
+        return self.canvases[idx]
+
+    def add(self, element):
+        for canvas in self.canvases:
+            canvas.add(element)
+        return self
+
+    def draw(self, style=None):
+        for canvas in self.canvases:
+            canvas.draw(style)
+
+    def draw_async(self, style=None, poll=50):
+        """Draw all the views in the background, see Canvas2D.draw_async"""
+        return [canvas.draw_async(style, poll) for canvas in self.canvases]
+
+    def flush(self, wait=False):
+        return [canvas.flush(wait) for canvas in self.canvases]
+
+    def close(self):
+        for canvas in self.canvases:
+            canvas.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
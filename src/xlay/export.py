@@ -0,0 +1,187 @@
+"""
+Export of meshes to binary STL, OBJ and glTF binary (GLB) files.
+
+The writers accept:
+- a Mesh
+- a (mesh, matrices) tuple with matrices of shape (4,4) or (N,4,4)
+- a Pose holding a Mesh, as returned by render
+- a list or an iterator of the above, such as iter_render
+
+STL and OBJ are written while the items are consumed. In GLB, poses
+referencing the same Mesh are grouped so that the mesh is stored once and
+each placement is a node with its own matrix.
+
+Buffers are written directly from the numpy arrays, no loop on triangles.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from .primitives import Mesh
+
+stl_dtype = np.dtype(
+    [
+        ("normal", "<f4", (3,)),
+        ("vertices", "<f4", (3, 3)),
+        ("attr", "<u2"),
+    ]
+)
+
+
+def iter_instances(items, group=True):
+    """Yield (mesh, matrices) with matrices of shape (N,4,4)
+
+    If group is False, items are yielded as they are consumed.
+    """
+    if isinstance(items, (Mesh, tuple)) or hasattr(items, "element"):
+        items = [items]
+    groups = {}
+    for item in items:
+        if isinstance(item, Mesh):
+            mesh, matrices = item, np.eye(4)
+        elif isinstance(item, tuple):
+            mesh, matrices = item
+        elif isinstance(getattr(item, "element", None), Mesh):
+            mesh, matrices = item.element, item.matrix
+        else:
+            continue
+        matrices = np.asarray(matrices).reshape(-1, 4, 4)
+        if not group:
+            yield mesh, matrices
+        elif id(mesh) in groups:
+            groups[id(mesh)][1].append(matrices)
+        else:
+            groups[id(mesh)] = (mesh, [matrices])
+    for mesh, matrices in groups.values():
+        yield mesh, np.concatenate(matrices)
+
+
+def transform_vertices(mesh, matrices):
+    """Return (N,V,3) vertices of the mesh for each of the N matrices"""
+    return np.einsum("nij,jv->nvi", matrices[:, :3], mesh.points)
+
+
+def write_stl(filename, items, header=b"xlay"):
+    """Write a binary STL file"""
+    count = 0
+    with open(filename, "wb") as fh:
+        fh.write(header[:80].ljust(80, b"\0"))
+        fh.write(struct.pack("<I", count))
+        for mesh, matrices in iter_instances(items, group=False):
+            vertices = transform_vertices(mesh, matrices)
+            tri = np.empty((len(matrices), len(mesh.faces)), dtype=stl_dtype)
+            tri["vertices"] = vertices[:, mesh.faces]
+            v0, v1, v2 = np.moveaxis(tri["vertices"], -2, 0)
+            normal = np.cross(v1 - v0, v2 - v0)
+            norm = np.linalg.norm(normal, axis=-1, keepdims=True)
+            np.divide(normal, norm, out=normal, where=norm > 0)
+            tri["normal"] = normal
+            tri["attr"] = 0
+            fh.write(memoryview(tri.ravel()))
+            count += tri.size
+        fh.seek(80)
+        fh.write(struct.pack("<I", count))
+
+
+def write_obj(filename, items, fmt="%.9g"):
+    """Write a Wavefront OBJ file, one object for each instance"""
+    offset = 1
+    instances = {}  # name -> number of objects written
+    with open(filename, "w") as fh:
+        for mesh, matrices in iter_instances(items, group=False):
+            name = mesh.name or "mesh"
+            vertices = transform_vertices(mesh, matrices)
+            nv = vertices.shape[1]
+            vfmt = f"v {fmt} {fmt} {fmt}\n" * nv
+            ffmt = "f %d %d %d\n" * len(mesh.faces)
+            first = instances.get(name, 0)
+            instances[name] = first + len(vertices)
+            for i, vv in enumerate(vertices, first):
+                fh.write(f"o {name}.{i}\n")
+                fh.write(vfmt % tuple(vv.ravel()))
+                fh.write(ffmt % tuple((mesh.faces + offset).ravel()))
+                offset += nv
+
+
+def write_glb(filename, items):
+    """Write a glTF binary file, repeated meshes are stored once
+
+    Meshes without vertices or faces are skipped, glTF accessors cannot be
+    empty.
+    """
+    gltf = {
+        "asset": {"version": "2.0", "generator": "xlay"},
+        "scene": 0,
+        "scenes": [{"nodes": []}],
+        "nodes": [],
+        "meshes": [],
+        "accessors": [],
+        "bufferViews": [],
+        "buffers": [],
+    }
+    blobs = []
+    offset = 0
+
+    def add_view(arr, target):
+        nonlocal offset
+        view = {
+            "buffer": 0,
+            "byteOffset": offset,
+            "byteLength": arr.nbytes,
+            "target": target,
+        }
+        gltf["bufferViews"].append(view)
+        blobs.append(arr)
+        offset += arr.nbytes  # float32 and uint32 keep 4 bytes alignment
+        return len(gltf["bufferViews"]) - 1
+
+    for mesh, matrices in iter_instances(items):
+        vertices = np.ascontiguousarray(mesh.vertices, dtype="<f4")
+        faces = np.ascontiguousarray(mesh.faces, dtype="<u4")
+        if len(vertices) == 0 or faces.size == 0:
+            continue
+        gltf["accessors"].append(
+            {
+                "bufferView": add_view(vertices, 34962),
+                "componentType": 5126,
+                "count": len(vertices),
+                "type": "VEC3",
+                "min": vertices.min(axis=0).tolist(),
+                "max": vertices.max(axis=0).tolist(),
+            }
+        )
+        gltf["accessors"].append(
+            {
+                "bufferView": add_view(faces, 34963),
+                "componentType": 5125,
+                "count": faces.size,
+                "type": "SCALAR",
+            }
+        )
+        nacc = len(gltf["accessors"])
+        primitive = {"attributes": {"POSITION": nacc - 2}, "indices": nacc - 1}
+        imesh = len(gltf["meshes"])
+        gltf["meshes"].append({"primitives": [primitive]})
+        if mesh.name is not None:
+            gltf["meshes"][-1]["name"] = mesh.name
+        # glTF matrices are column major
+        columns = matrices.transpose(0, 2, 1).reshape(-1, 16).tolist()
+        for matrix in columns:
+            gltf["scenes"][0]["nodes"].append(len(gltf["nodes"]))
+            gltf["nodes"].append({"mesh": imesh, "matrix": matrix})
+
+    if offset > 0:  # buffers and the BIN chunk cannot be empty
+        gltf["buffers"].append({"byteLength": offset})
+    header = json.dumps(gltf, separators=(",", ":")).encode()
+    header += b" " * (-len(header) % 4)
+    total = 12 + 8 + len(header) + (8 + offset if offset > 0 else 0)
+    with open(filename, "wb") as fh:
+        fh.write(struct.pack("<4sII", b"glTF", 2, total))
+        fh.write(struct.pack("<I4s", len(header), b"JSON"))
+        fh.write(header)
+        if offset > 0:
+            fh.write(struct.pack("<I4s", offset, b"BIN\0"))
+        for blob in blobs:
+            fh.write(memoryview(blob))
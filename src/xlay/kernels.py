@@ -0,0 +1,176 @@
+"""
+Optional compiled kernels for pose composition and curve evaluation.
+
+If numba is installed, the hot loops of the survey and of the renderers can
+use fused kernels instead of many small NumPy products:
+
+    xlay.kernels.set_backend("numba")   # or "numpy", the reference
+    xlay.kernels.backend                # current backend
+
+The default backend is "numba" if numba can be imported, else "numpy". It can
+be set before import with the XLAY_BACKEND environment variable, an unknown
+name or "numba" without numba installed gives a warning and the "numpy"
+backend.
+
+Kernels:
+    bend_matrices: Nx4x4 matrices of arc segments, see segment_matrices
+    cumulative_matmul: cumulative products of Nx4x4 matrices
+    transform_points: 4xN points transformed by 4x4 or Mx4x4 matrices
+
+The kernels are plain Python loops compiled by numba.njit, they give the same
+results as the NumPy implementations within rounding errors.
+"""
+
+import math
+import os
+import warnings
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+backends = ("numpy", "numba")
+
+
+def jit(func):
+    """Compile func with numba if available, return it unchanged otherwise"""
+    if numba is None:
+        return func
+    return numba.njit(cache=True)(func)
+
+
+def set_backend(name):
+    """Select the kernels used by segment_matrices, cumulative_matmul, ..."""
+    global backend
+    if name not in backends:
+        raise ValueError(f"Unknown backend {name}, use one of {backends}")
+    if name == "numba" and numba is None:
+        raise ImportError("numba is not installed")
+    backend = name
+
+
+def default_backend():
+    """Return the backend set by XLAY_BACKEND, or numpy if it is not usable"""
+    name = os.environ.get("XLAY_BACKEND")
+    if name is None:
+        return "numpy" if numba is None else "numba"
+    name = name.strip().lower()
+    if name not in backends:
+        warnings.warn(
+            f"Unknown XLAY_BACKEND {name!r}, use one of {backends}, "
+            "falling back to numpy"
+        )
+        return "numpy"
+    if name == "numba" and numba is None:
+        warnings.warn(
+            "XLAY_BACKEND is numba but numba is not installed, "
+            "falling back to numpy"
+        )
+        return "numpy"
+    return name
+
+
+def use_jit():
+    return backend == "numba"
+
+
+@jit
+def bend_matrices(length, angle, roll, s, out):
+    """Fill out (N,4,4) with the matrices at s of arcs in xz rolled by roll
+
+    Angles are in degrees, as in segment_matrices.
+    """
+    for ii in range(len(s)):
+        fullangle = math.radians(angle[ii])
+        psi = math.radians(roll[ii])
+        cp = math.cos(psi)
+        sp = math.sin(psi)
+        if fullangle == 0:
+            ca = 1.0
+            sa = 0.0
+            rx = 0.0
+            rz = s[ii]
+        else:
+            alpha = fullangle * s[ii] / length[ii] if length[ii] != 0 else 0.0
+            ca = math.cos(alpha)
+            sa = math.sin(alpha)
+            radius = length[ii] / fullangle
+            rx = radius * (ca - 1)
+            rz = radius * sa
+        # T @ S @ T.T with T the roll around z and S the rotation in xz
+        out[ii, 0, 0] = cp * cp * ca + sp * sp
+        out[ii, 0, 1] = cp * sp * (ca - 1)
+        out[ii, 0, 2] = -cp * sa
+        out[ii, 1, 0] = cp * sp * (ca - 1)
+        out[ii, 1, 1] = sp * sp * ca + cp * cp
+        out[ii, 1, 2] = -sp * sa
+        out[ii, 2, 0] = cp * sa
+        out[ii, 2, 1] = sp * sa
+        out[ii, 2, 2] = ca
+        out[ii, 0, 3] = cp * rx
+        out[ii, 1, 3] = sp * rx
+        out[ii, 2, 3] = rz
+        out[ii, 3, 0] = 0.0
+        out[ii, 3, 1] = 0.0
+        out[ii, 3, 2] = 0.0
+        out[ii, 3, 3] = 1.0
+    return out
+
+
+@jit
+def cumulative_matmul(matrices):
+    """Return the cumulative products M0, M0@M1, ... of Nx4x4 matrices"""
+    result = np.empty_like(matrices)
+    nn = len(matrices)
+    if nn == 0:
+        return result
+    result[0] = matrices[0]
+    for kk in range(1, nn):
+        for ii in range(4):
+            for jj in range(4):
+                acc = 0.0
+                for ll in range(4):
+                    acc += result[kk - 1, ii, ll] * matrices[kk, ll, jj]
+                result[kk, ii, jj] = acc
+    return result
+
+
+@jit
+def transform_matrices_points(matrices, points):
+    """Return the (M,4,N) products of (M,4,4) matrices and (4,N) points"""
+    mm = matrices.shape[0]
+    nn = points.shape[1]
+    result = np.empty((mm, 4, nn))
+    for kk in range(mm):
+        mat = matrices[kk]
+        for pp in range(nn):
+            x = points[0, pp]
+            y = points[1, pp]
+            z = points[2, pp]
+            w = points[3, pp]
+            for ii in range(4):
+                result[kk, ii, pp] = (
+                    mat[ii, 0] * x
+                    + mat[ii, 1] * y
+                    + mat[ii, 2] * z
+                    + mat[ii, 3] * w
+                )
+    return result
+
+
+def transform_points(matrix, points):
+    """Return matrix @ points for (4,4) or (M,4,4) matrices and (4,N) points"""
+    matrix = np.ascontiguousarray(matrix, dtype=float)
+    points = np.ascontiguousarray(points, dtype=float)
+    if not use_jit() or points.ndim != 2:
+        return matrix @ points
+    if matrix.ndim == 2:
+        return transform_matrices_points(matrix[None], points)[0]
+    return transform_matrices_points(matrix, points)
+
+
+backend = "numpy"
+set_backend(default_backend())
@@ -20,13 +20,37 @@ ll['MBB/MB.1'] -> return point
 
 """
 
+import contextlib
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import yaml
 
-from .pose import Pose
-from .assembly import Assembly, Magnet, Bend, Quadrupole
+from .pose import Pose, PoseArray
+from .aperture import ApertureModel
+from .misalignment import rotation_angle
+from .primitives import Curve
+from .profiling import count, timed, timer
+from .assembly import Assembly, Magnet, Bend, Quadrupole, Region
 
 
 class Node:
+    __slots__ = (
+        "name",
+        "assembly",
+        "at",
+        "from_",
+        "ref",
+        "ref_angle",
+        "ref_length",
+        "ref_roll",
+        "transform",
+    )
+
     def __init__(
         self,
         name,
@@ -71,6 +95,8 @@ class Node:
 
 
 class Segment:
+    __slots__ = ("length", "angle", "roll", "start")
+
     def __init__(self, length, angle, roll, start):
         self.length = length
         self.angle = angle
@@ -81,19 +107,57 @@ class Segment:
         return f"Segment: {self.length}, {self.angle}, {self.roll}, {self.start}"
 
 
+def node_transform(node):
+    """Return the 4x4 matrix of the transformations of the node"""
+    pose = Pose()
+    for kattr, vattr in node.transform:
+        getattr(pose, kattr)(vattr)
+    return pose.matrix
+
+
+def diff_poses(poses, other, tolerance=1e-9, angle_tolerance=1e-7):
+    """Compare two PoseArrays matching the poses by name, see Layout.diff"""
+    index = {name: idx for idx, name in enumerate(other.names)}
+    idx_other = np.fromiter(
+        (index.pop(name, -1) for name in poses.names), dtype=int, count=len(poses)
+    )
+    common = idx_other >= 0
+    removed = [name for name, found in zip(poses.names, common) if not found]
+    added = list(index)
+    mat = poses.matrix[common]
+    mat_other = other.matrix[idx_other[common]]
+    delta = mat_other[:, :3, 3] - mat[:, :3, 3]
+    inverse = np.swapaxes(mat[:, :3, :3], -1, -2)
+    angle = rotation_angle(inverse @ mat_other[:, :3, :3])
+    moved = (np.linalg.norm(delta, axis=1) > tolerance) | (angle > angle_tolerance)
+    names = np.array(poses.names, dtype=object)[common][moved]
+    return {
+        "added": added,
+        "removed": removed,
+        "moved": names.tolist(),
+        "delta": delta[moved],
+        "angle": angle[moved],
+    }
+
+
 class Beamline:
     @classmethod
-    def from_yamldata(cls, name, data):
+    def from_yamldata(cls, name, data, env=None):
+        """env: dict of the objects already defined to resolve assemblies"""
+        if env is None:
+            env = {}
         nodes = {}
         for nodedata in data:
             [(nodename, attrs)] = nodedata.items()
             kwargs = {}
             transform = []
-            assembly = attrs[0]
+            assembly = env.get(attrs[0], attrs[0])
             for attr in attrs[1:]:
                 for kattr, vattr in attr.items():
                     if kattr in ["tx", "ty", "tz", "rx", "ry", "rz"]:
                         transform.append([kattr, vattr])
+                    elif kattr == "from":
+                        kwargs["from_"] = vattr
                     else:
                         kwargs[kattr] = vattr
             kwargs["transform"] = transform
@@ -102,26 +166,106 @@ class Beamline:
             nodes[nodename] = Node(**kwargs)
         return cls(name=name, nodes=nodes)
 
+    @classmethod
+    def from_table(cls, name, table, skip=("DRIFT",)):
+        """Build a beamline from a MAD-X sequence, twiss or survey table
+
+        table: Table or dict with NAME, S (at the exit), L and optionally
+        KEYWORD, ANGLE (rad) and TILT (rad) columns.
+        Elements with KEYWORD in skip are not added.
+        An assembly is created for each KEYWORD, L, ANGLE, TILT combination.
+        """
+        names = np.asarray(table["NAME"])
+        length = np.asarray(table["L"], dtype=float)
+        at = np.asarray(table["S"], dtype=float) - length / 2
+        nrows = len(names)
+        if "KEYWORD" in table:
+            keyword = np.char.upper(np.asarray(table["KEYWORD"], dtype=str))
+        else:
+            keyword = np.full(nrows, "MARKER")
+        angle = np.zeros(nrows)
+        tilt = np.zeros(nrows)
+        if "ANGLE" in table:
+            angle = np.degrees(np.asarray(table["ANGLE"], dtype=float))
+        if "TILT" in table:
+            tilt = np.degrees(np.asarray(table["TILT"], dtype=float))
+        keep = ~np.isin(keyword, skip)
+        rows = zip(
+            names[keep].tolist(),
+            keyword[keep].tolist(),
+            at[keep].tolist(),
+            length[keep].tolist(),
+            angle[keep].tolist(),
+            tilt[keep].tolist(),
+        )
+        assemblies = {}
+        nodes = {}
+        for nodename, kk, ss, ll, aa, tt in rows:
+            assembly = assemblies.get((kk, ll, aa, tt))
+            if assembly is None:
+                assembly = Magnet(length=ll, angle=aa, tilt=tt, name=kk.lower())
+                assemblies[kk, ll, aa, tt] = assembly
+            nodes[nodename] = Node(nodename, assembly, at=ss, ref_roll=tt)
+        return cls(name=name, nodes=nodes)
+
     def __init__(self, name=None, nodes=None):
         self.name = name
         self.nodes = nodes
 
+    def anchor(self):
+        """Return the beamline/node the beamline starts from, or None
+
+        Nodes with from_ set to a node of another beamline, as beamline/node,
+        are positioned from s=0 of this beamline, which is placed at the pose
+        of that node by Layout.survey_all.
+        """
+        anchors = {
+            node.from_
+            for node in self.nodes.values()
+            if node.from_ is not None
+            and "/" in node.from_
+            and node.from_ not in self.nodes
+        }
+        if len(anchors) > 1:
+            raise ValueError(f"Beamline {self.name} has several anchors {anchors}")
+        return anchors.pop() if len(anchors) > 0 else None
+
     def find_sorted_nodes(self):
         abs_start = {}
-        klist = set(self.nodes.keys())
+        anchor = self.anchor()
+        klist = [k for k, node in self.nodes.items() if node.at is not None]
         while len(klist) > 0:
-            k = klist.pop()
-            node = self.nodes[k]
-            if node.at is not None:
-                if node.from_ is None:
+            unresolved = []
+            for k in klist:
+                node = self.nodes[k]
+                if node.from_ is None or node.from_ == anchor:
                     abs_start[k] = node.at
-                elif k in abs_start:
+                elif node.from_ in abs_start:
                     abs_start[k] = abs_start[node.from_] + node.at
                 else:
-                    klist.add(k)
+                    unresolved.append(k)
+            if len(unresolved) == len(klist):
+                raise ValueError(f"Cannot resolve the position of {unresolved}")
+            klist = unresolved
         sorted_nodes = sorted(abs_start.items(), key=lambda x: x[1])
         return sorted_nodes
 
+    def find_node_extents(self):
+        """Return sorted node names, positions and start positions"""
+        sorted_nodes = self.find_sorted_nodes()
+        names = [k for k, _ in sorted_nodes]
+        at = np.array([s for _, s in sorted_nodes], dtype=float)
+        fraction = {"start": 0, "entry": 0, "end": 1, "exit": 1}
+        node_start = at - [
+            fraction.get(self.nodes[k].ref, 0.5) * self.nodes[k].ref_length
+            for k in names
+        ]
+        return names, at, node_start
+
+    def apertures(self):
+        """Return the ApertureModel of the nodes of the beamline"""
+        return ApertureModel.from_beamline(self)
+
     def find_segments(self):
         sorted_nodes = self.find_sorted_nodes()
         k, node_start = sorted_nodes.pop(0)
@@ -147,6 +291,57 @@ class Beamline:
             segments.append(Segment(node.ref_length, cur_angle, cur_roll, cur_s))
         return segments
 
+    def reference_curve(self, start=None):
+        """Return the sorted node names, positions and the reference curve
+
+        The reference curve is made of the nodes, bent if ref_angle is not 0,
+        and drifts in between.
+        """
+        names, at, node_start = self.find_node_extents()
+        nodes = [self.nodes[k] for k in names]
+        s_start = min(0, node_start.min()) if len(nodes) > 0 else 0
+        kind, length, angle, roll = [], [], [], []
+        cur_s = s_start
+        for node, node_s in zip(nodes, node_start):
+            end = node_s + node.ref_length
+            if node_s < cur_s:  # node overlaps with previous node
+                if node.ref_angle != 0:
+                    raise ValueError(
+                        f"Node {node.name} overlaps with previous node"
+                    )
+                node_s = cur_s
+            if end <= cur_s:
+                continue
+            if node_s > cur_s:
+                kind.append("line")
+                length.append(node_s - cur_s)
+                angle.append(0)
+                roll.append(0)
+            kind.append("bend" if node.ref_angle != 0 else "line")
+            length.append(end - node_s)
+            angle.append(node.ref_angle)
+            roll.append(node.ref_roll)
+            cur_s = end
+        curve = Curve.from_arrays(
+            kind, length, angle, roll, start=start, s_start=s_start
+        )
+        return names, at, curve
+
+    def survey(self, start=None):
+        """Return a PoseArray of the nodes in the sorted order
+
+        The node pose is the pose of the reference curve at the node
+        position, the ref point of the node, followed by the node transform.
+        """
+        names, at, curve = self.reference_curve(start=start)
+        count("survey.nodes", len(names))
+        nodes = [self.nodes[k] for k in names]
+        matrix = curve.matrices(at) if len(at) > 0 else np.zeros((0, 4, 4))
+        for idx, node in enumerate(nodes):
+            if len(node.transform) > 0:
+                matrix[idx] = matrix[idx] @ node_transform(node)
+        return PoseArray(matrix, names=names, name=self.name)
+
     def __repr__(self):
         return f"{self.name}: {self.show_yaml()}"
 
@@ -162,18 +357,233 @@ class Beamline:
         return self.nodes[key]
 
 
+def survey_beamline(beamline, filename=None):
+    """Survey a beamline in its own frame for Layout.survey_all
+
+    Returns the node names, the (N,4,4) matrices, or the .npy file they are
+    written to if filename is given, the anchor and the pose at s=0 if the
+    beamline has an anchor.
+    """
+    poses = beamline.survey()
+    anchor = beamline.anchor()
+    origin = None
+    if anchor is not None:
+        _, _, curve = beamline.reference_curve()
+        origin = curve.matrices(0.0)[0]
+    matrix = poses.matrix
+    if filename is not None:
+        out = np.lib.format.open_memmap(
+            filename, mode="w+", dtype=matrix.dtype, shape=matrix.shape
+        )
+        out[:] = matrix
+        out.flush()
+        del out
+        matrix = filename
+    return poses.names, matrix, anchor, origin
+
+
+def build_object(key, value, env):
+    """Return the assembly or beamline of a top level YAML definition"""
+    return assemblies[value[0]].from_yamldata(key, value[1:], env=env)
+
+
+yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def byte_offsets(text, offsets):
+    """Return the UTF-8 byte offsets of increasing character offsets"""
+    result = []
+    pos = 0
+    nbytes = 0
+    for offset in offsets:
+        nbytes += len(text[pos:offset].encode())
+        pos = offset
+        result.append(nbytes)
+    return result
+
+
+class LazyData(Mapping):
+    """
+    Top level definitions of a YAML layout file, built on first access.
+
+    The file is scanned once with the events of the YAML parser, without
+    constructing the values, for the top level keys, the byte range and the
+    class name of the definitions. layout[key] parses only that range and
+    builds the object, which is kept in an LRU of maxsize objects. Evicted
+    objects are built again when accessed, as a new instance.
+
+    Definitions cannot be parsed separately if the file has anchors or
+    aliases, the file is then parsed at once and the objects are built on
+    access from the parsed data.
+
+    Top level string values are variables, returned in the "vars" dictionary.
+    """
+
+    def __init__(self, filename, maxsize=256):
+        self.filename = filename
+        self.maxsize = maxsize
+        self.loaded = OrderedDict()
+        self.index = {}  # key -> (start, end) byte offsets
+        self.kinds = {}  # key -> class name of the definition
+        self.vars = {}
+        self.yamldata = None  # parsed file, if it has anchors or aliases
+        with open(filename, "rb") as fh:
+            text = fh.read().decode()
+        with timer("LazyData.scan"):
+            if not self.scan(text):
+                self.load(text)
+
+    def scan(self, text):
+        """Index the definitions, return False if the file has anchors"""
+        resolver = yaml.resolver.Resolver()
+        ranges = {}
+        depth = 0
+        key = None  # top level key whose value is being read
+        first = False  # next event is the first item of a definition
+        for event in yaml.parse(text, Loader=yaml_loader):
+            if isinstance(event, yaml.AliasEvent):
+                return False
+            if getattr(event, "anchor", None) is not None:
+                return False
+            if isinstance(event, yaml.CollectionStartEvent):
+                depth += 1
+                if depth == 2 and key is None:
+                    return False  # not a scalar key
+                first = depth == 2 and isinstance(event, yaml.SequenceStartEvent)
+            elif isinstance(event, yaml.CollectionEndEvent):
+                depth -= 1
+                if depth == 1:
+                    if isinstance(event, yaml.SequenceEndEvent):
+                        ranges[key] = (start, event.end_mark.index)
+                    key = None
+            elif isinstance(event, yaml.ScalarEvent):
+                if depth == 1 and key is None:
+                    key = event.value
+                    start = event.start_mark.index
+                    self.kinds.pop(key, None)
+                    ranges.pop(key, None)
+                    self.vars.pop(key, None)
+                elif depth == 1:
+                    tag = event.tag
+                    if tag is None or tag == "!":
+                        tag = resolver.resolve(
+                            yaml.ScalarNode, event.value, event.implicit
+                        )
+                    if tag == "tag:yaml.org,2002:str":
+                        self.vars[key] = event.value
+                    key = None
+                elif first:
+                    self.kinds[key] = event.value
+                first = False
+        positions = sorted({pos for pair in ranges.values() for pos in pair})
+        offsets = dict(zip(positions, byte_offsets(text, positions)))
+        self.index = {
+            key: (offsets[start], offsets[end]) for key, (start, end) in ranges.items()
+        }
+        return True
+
+    def load(self, text):
+        """Parse the whole file, used if it has anchors or aliases"""
+        self.yamldata = yaml.load(text, Loader=yaml_loader) or {}
+        self.vars = {}
+        self.kinds = {}
+        self.index = {}
+        for key, value in self.yamldata.items():
+            if type(value) == str:
+                self.vars[key] = value
+            elif type(value) == list:
+                self.index[key] = None
+                if len(value) > 0 and type(value[0]) == str:
+                    self.kinds[key] = value[0]
+
+    def read(self, key):
+        """Return the parsed definition of key"""
+        if self.yamldata is not None:
+            return self.yamldata[key]
+        start, end = self.index[key]
+        with open(self.filename, "rb") as fh:
+            fh.seek(start)
+            chunk = yaml.load(fh.read(end - start), Loader=yaml_loader)
+        return next(iter(chunk.values()))
+
+    def keys_of(self, cls):
+        """Return the keys of the definitions of cls, without building them"""
+        return [
+            key
+            for key, kind in self.kinds.items()
+            if key in self.index
+            and isinstance(assemblies.get(kind), type)
+            and issubclass(assemblies[kind], cls)
+        ]
+
+    def __getitem__(self, key):
+        if key == "vars":
+            return self.vars
+        if key in self.loaded:
+            self.loaded.move_to_end(key)
+            return self.loaded[key]
+        if key not in self.index:
+            raise KeyError(key)
+        with timer("LazyData.build"):
+            obj = build_object(key, self.read(key), env=self)
+        self.loaded[key] = obj
+        while len(self.loaded) > self.maxsize:
+            self.loaded.popitem(last=False)
+        return obj
+
+    def __iter__(self):
+        yield "vars"
+        yield from self.index
+
+    def __len__(self):
+        return len(self.index) + 1
+
+    def __contains__(self, key):
+        return key == "vars" or key in self.index
+
+
+class LazyView(Mapping):
+    """Mapping of some keys of a LazyData, the objects are built on access"""
+
+    def __init__(self, data, keys):
+        self.data = data
+        self.keys_ = dict.fromkeys(keys)
+
+    def __getitem__(self, key):
+        if key not in self.keys_:
+            raise KeyError(key)
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.keys_)
+
+    def __len__(self):
+        return len(self.keys_)
+
+    def __contains__(self, key):
+        return key in self.keys_
+
+
 class Layout:
     @classmethod
-    def from_yaml(cls, filename):
-        yamldata = yaml.safe_load(open("lattice1.yaml"))
+    @timed
+    def from_yaml(cls, filename, lazy=False, maxsize=256):
+        """Load a layout file
+
+        lazy: if True, objects are built when accessed, see LazyData
+        maxsize: maximum number of objects kept by a lazy layout
+        """
+        if lazy:
+            return cls(LazyData(filename, maxsize=maxsize))
+        with timer("yaml.load"), open(filename) as fh:
+            yamldata = yaml.load(fh, Loader=yaml_loader)
         vars = {}
         data = {"vars": vars}
         for k, v in yamldata.items():
             if type(v) == str:  # variable definition
                 vars[k] = v
             elif type(v) == list:  # assembly definition
-                obj = assemblies[v[0]].from_yamldata(k, v[1:])
-                data[k] = obj
+                data[k] = build_object(k, v, env=data)
         layout = cls(data)
         return layout
 
@@ -186,6 +596,123 @@ class Layout:
     def __getitem__(self, key):
         return self.data[key]
 
+    def beamlines(self):
+        """Return a mapping name -> Beamline
+
+        The beamlines of a lazy layout are built on access, one at a time.
+        """
+        if isinstance(self.data, LazyData):
+            return LazyView(self.data, self.data.keys_of(Beamline))
+        return {k: v for k, v in self.data.items() if isinstance(v, Beamline)}
+
+    @timed
+    def survey_all(self, workers=None, directory=None):
+        """Return a dict of beamline name -> PoseArray in the layout frame
+
+        workers: number of processes, None to run in the current process
+        directory: if given, the matrices of the workers are written to .npy
+        files in directory and returned as memory mapped arrays, otherwise
+        they are exchanged through temporary files, loaded in memory as
+        copies before the files are deleted
+
+        Beamlines are surveyed in their own frame, then beamlines with an
+        anchor (see Beamline.anchor) are moved such that their s=0 pose is the
+        pose of the anchor node.
+        """
+        beamlines = self.beamlines()
+        if workers is None or workers <= 1 or len(beamlines) <= 1:
+            results = {
+                name: survey_beamline(beamline)
+                for name, beamline in beamlines.items()
+            }
+        else:
+            if directory is None:
+                context = tempfile.TemporaryDirectory()
+            else:  # no temporary directory, the files stay with the memmaps
+                context = contextlib.nullcontext(directory)
+            with context as outdir:
+                results = {}
+                filenames = [
+                    os.path.join(outdir, f"{idx}.npy")
+                    for idx in range(len(beamlines))
+                ]
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    surveyed = executor.map(
+                        survey_beamline, beamlines.values(), filenames
+                    )
+                    for name, (names, filename, anchor, origin) in zip(
+                        beamlines, surveyed
+                    ):
+                        if directory is None:
+                            matrix = np.load(filename)
+                        else:
+                            matrix = np.load(filename, mmap_mode="r+")
+                        results[name] = names, matrix, anchor, origin
+        # place the anchored beamlines after the beamlines they depend on
+        anchors = {name: result[2] for name, result in results.items()}
+        placed = [name for name, anchor in anchors.items() if anchor is None]
+        pending = [name for name, anchor in anchors.items() if anchor is not None]
+        while len(pending) > 0:
+            unresolved = []
+            for name in pending:
+                line, node = anchors[name].split("/", 1)
+                if line not in beamlines:
+                    raise ValueError(f"Unknown beamline {line} in {anchors[name]}")
+                if line not in placed:
+                    unresolved.append(name)
+                    continue
+                names, matrix, _, origin = results[name]
+                anchor_names, anchor_matrix, _, _ = results[line]
+                if node not in anchor_names:
+                    raise ValueError(f"Unknown node {node} in {anchors[name]}")
+                pose = anchor_matrix[anchor_names.index(node)]
+                matrix[:] = pose @ np.linalg.inv(origin) @ matrix
+                placed.append(name)
+            if len(unresolved) == len(pending):
+                raise ValueError(f"Cannot resolve the anchors of {unresolved}")
+            pending = unresolved
+        return {
+            name: PoseArray(matrix, names=names, name=name)
+            for name, (names, matrix, _, _) in results.items()
+        }
+
+    @timed
+    def survey(self, workers=None):
+        """Return a PoseArray of all the nodes, named beamline/node"""
+        names = []
+        matrices = []
+        for name, poses in self.survey_all(workers=workers).items():
+            names.extend(f"{name}/{node}" for node in poses.names)
+            matrices.append(poses.matrix)
+        if len(matrices) == 0:
+            return PoseArray(np.zeros((0, 4, 4)), names=[])
+        return PoseArray(np.concatenate(matrices), names=names)
+
+    @timed
+    def diff(self, other, tolerance=1e-9, angle_tolerance=1e-7, poses=None):
+        """Compare the surveyed nodes of self with the ones of other
+
+        Nodes are matched by beamline/node name. A node is moved if its
+        position changed by more than tolerance in m or its orientation by
+        more than angle_tolerance in degrees.
+
+        other: a Layout or its survey, see Layout.survey
+        poses: the survey of self if already computed, to avoid surveying
+        again when comparing self with several layouts
+
+        Returns a dict with:
+        added: names only in other
+        removed: names only in self
+        moved: names of the moved nodes
+        delta: (N,3) position change of the moved nodes
+        angle: (N) rotation angle in degrees of the moved nodes
+        """
+        if poses is None:
+            poses = self.survey()
+        if isinstance(other, Layout):
+            other = other.survey()
+        return diff_poses(poses, other, tolerance, angle_tolerance)
+
     def show(self):
         maxkey = max([len(k) for k in self.data.keys()])
         fmt = f"{{:<{maxkey}}}: {{}}"
@@ -198,6 +725,7 @@ assemblies = {
     "Magnet": Magnet,
     "Bend": Bend,
     "Quadrupole": Quadrupole,
+    "Region": Region,
     "Assembly": Assembly,
     "Beamline": Beamline,
 }
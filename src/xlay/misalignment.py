@@ -0,0 +1,187 @@
+"""
+Monte Carlo misalignment of the nodes of a Beamline.
+
+Errors are given for groups of nodes, selected by glob patterns on the node
+names, as a distribution for each of the node transformations:
+
+    errors = {
+        "MQ*": {"tx": 1e-4, "ty": 1e-4, "rz": 0.01},
+        "MB*": {"rz": lambda rng, size: rng.uniform(-0.01, 0.01, size)},
+    }
+    result = xlay.misalign(beamline, errors, n_seeds=1000)
+
+A number is the sigma of a Gaussian distribution, a callable is called with
+a numpy Generator and the shape of the samples. Rotations are in degrees as in
+Pose.rx, ry, rz. The error of each node is the matrix T @ Rx @ Ry @ Rz applied
+after the surveyed pose of the node.
+
+The seeds are processed in chunks of (chunk, n_nodes, 4, 4) matrices to
+bound the memory, optionally in a pool of processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+
+import numpy as np
+
+from .profiling import timed
+
+error_keys = ("tx", "ty", "tz", "rx", "ry", "rz")
+
+
+def error_table(names, errors):
+    """Return a list of (key, node indices, distribution) for errors
+
+    The last pattern matching a node wins for each key.
+    """
+    table = {}
+    for pattern, dist in errors.items():
+        idx = [i for i, name in enumerate(names) if fnmatch(name, pattern)]
+        for key, value in dist.items():
+            if key not in error_keys:
+                raise ValueError(f"Unknown error {key}, use one of {error_keys}")
+            column = table.setdefault(key, {})
+            for i in idx:
+                column[i] = value
+    rows = []
+    for key, column in table.items():
+        by_value = {}
+        for i, value in column.items():
+            by_value.setdefault(id(value), (value, []))[1].append(i)
+        for value, idx in by_value.values():
+            rows.append((key, np.array(idx), value))
+    return rows
+
+
+def sample_errors(rng, table, n_seeds, n_nodes):
+    """Return (n_seeds, n_nodes) samples for each key of the error table"""
+    samples = {key: np.zeros((n_seeds, n_nodes)) for key in error_keys}
+    for key, idx, value in table:
+        size = (n_seeds, len(idx))
+        if callable(value):
+            samples[key][:, idx] = value(rng, size)
+        else:
+            samples[key][:, idx] = rng.normal(0, value, size)
+    return samples
+
+
+def error_matrices(tx, ty, tz, rx, ry, rz):
+    """Return (...,4,4) matrices T @ Rx @ Ry @ Rz, angles in degrees"""
+    cx, sx = np.cos(np.radians(rx)), np.sin(np.radians(rx))
+    cy, sy = np.cos(np.radians(ry)), np.sin(np.radians(ry))
+    cz, sz = np.cos(np.radians(rz)), np.sin(np.radians(rz))
+    matrix = np.zeros(np.shape(tx) + (4, 4))
+    matrix[..., 0, 0] = cy * cz
+    matrix[..., 0, 1] = -cy * sz
+    matrix[..., 0, 2] = sy
+    matrix[..., 1, 0] = cx * sz + sx * sy * cz
+    matrix[..., 1, 1] = cx * cz - sx * sy * sz
+    matrix[..., 1, 2] = -sx * cy
+    matrix[..., 2, 0] = sx * sz - cx * sy * cz
+    matrix[..., 2, 1] = sx * cz + cx * sy * sz
+    matrix[..., 2, 2] = cx * cy
+    matrix[..., 0, 3] = tx
+    matrix[..., 1, 3] = ty
+    matrix[..., 2, 3] = tz
+    matrix[..., 3, 3] = 1
+    return matrix
+
+
+def rotation_angle(rot):
+    """Return the rotation angle in degrees of (...,3,3) rotation matrices
+
+    atan2(|axial vector|, trace - 1) is accurate for small angles, unlike
+    arccos((trace - 1) / 2).
+    """
+    trace = np.trace(rot, axis1=-2, axis2=-1)
+    axial = np.stack(
+        [
+            rot[..., 2, 1] - rot[..., 1, 2],
+            rot[..., 0, 2] - rot[..., 2, 0],
+            rot[..., 1, 0] - rot[..., 0, 1],
+        ],
+        axis=-1,
+    )
+    return np.degrees(np.arctan2(np.linalg.norm(axial, axis=-1), trace - 1))
+
+
+def misalign_chunk(nominal, table, n_seeds, seed, keep=False):
+    """Return the deviation statistics of n_seeds random seeds
+
+    Sums are returned instead of means so that chunks can be combined.
+    """
+    rng = np.random.default_rng(seed)
+    samples = sample_errors(rng, table, n_seeds, len(nominal))
+    matrix = nominal @ error_matrices(*[samples[key] for key in error_keys])
+    delta = matrix[..., :3, 3] - nominal[:, :3, 3]
+    # rotation of the misaligned frame relative to the nominal frame
+    inverse = np.swapaxes(nominal[:, :3, :3], -1, -2)
+    angle = rotation_angle(inverse @ matrix[..., :3, :3])
+    result = {
+        "n_seeds": n_seeds,
+        "delta_sum": delta.sum(axis=0),
+        "delta_sum2": (delta**2).sum(axis=0),
+        "delta_max": np.abs(delta).max(axis=0),
+        "angle_sum": angle.sum(axis=0),
+        "angle_sum2": (angle**2).sum(axis=0),
+        "angle_max": angle.max(axis=0),
+    }
+    if keep:
+        result["matrix"] = matrix
+    return result
+
+
+def combine_chunks(chunks):
+    n_seeds = sum(chunk["n_seeds"] for chunk in chunks)
+    result = {"n_seeds": n_seeds}
+    for key in ["delta", "angle"]:
+        mean = sum(chunk[f"{key}_sum"] for chunk in chunks) / n_seeds
+        mean2 = sum(chunk[f"{key}_sum2"] for chunk in chunks) / n_seeds
+        result[f"{key}_mean"] = mean
+        result[f"{key}_std"] = np.sqrt(np.maximum(mean2 - mean**2, 0))
+        result[f"{key}_max"] = np.max(
+            [chunk[f"{key}_max"] for chunk in chunks], axis=0
+        )
+    if "matrix" in chunks[0]:
+        result["matrix"] = np.concatenate([chunk["matrix"] for chunk in chunks])
+    return result
+
+
+@timed
+def misalign(
+    beamline, errors, n_seeds=1000, seed=None, chunk=100, workers=None, keep=False
+):
+    """Apply random errors to the nodes of a beamline
+
+    beamline: Beamline, surveyed with Beamline.survey, or a PoseArray
+    errors: dict of name pattern -> {"tx": sigma, ..., "rz": sigma or callable}
+    chunk: number of seeds per batch, bounds the memory to chunk*n_nodes*128 bytes
+    workers: number of processes, None to run in the current process
+    keep: if True, return the (n_seeds, n_nodes, 4, 4) misaligned matrices
+
+    Returns a dict with names, nominal matrices, the mean, std and max of the
+    position deviations (n_nodes, 3) and of the rotation angles (n_nodes)
+    in degrees.
+    """
+    if n_seeds < 1:
+        raise ValueError(f"n_seeds must be at least 1, not {n_seeds}")
+    if chunk < 1:
+        raise ValueError(f"chunk must be at least 1, not {chunk}")
+    poses = beamline.survey() if hasattr(beamline, "survey") else beamline
+    nominal = poses.matrix
+    table = error_table(poses.names, errors)
+    sizes = [min(chunk, n_seeds - start) for start in range(0, n_seeds, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(nominal, table, size, sq, keep) for size, sq in zip(sizes, seeds)]
+    if workers is None or workers <= 1 or len(sizes) <= 1:
+        chunks = [misalign_chunk(*arg) for arg in args]
+    elif any(callable(value) for _, _, value in table):
+        # callables may not be picklable, use the current process
+        chunks = [misalign_chunk(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(misalign_chunk, *zip(*args)))
+    result = combine_chunks(chunks)
+    result["names"] = list(poses.names)
+    result["nominal"] = nominal
+    return result
@@ -0,0 +1,58 @@
+"""
+Orientation interpolation with quaternions.
+
+Quaternions are stored as (x, y, z, w) in the last axis, as in
+scipy.spatial.transform.Rotation. The functions work on arrays, so that the
+orientation of many s values or many segments is computed at once.
+"""
+
+import numpy as np
+from scipy.spatial.transform import Rotation
+
+
+def quat_from_matrix(rot):
+    """Return quaternions (...,4) of rotation matrices (...,3,3)"""
+    rot = np.asarray(rot)
+    quat = Rotation.from_matrix(rot.reshape(-1, 3, 3)).as_quat()
+    return quat.reshape(rot.shape[:-2] + (4,))
+
+
+def quat_to_matrix(quat):
+    """Return rotation matrices (...,3,3) of unit quaternions (...,4)"""
+    x, y, z, w = np.moveaxis(np.asarray(quat), -1, 0)
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+    rot = np.empty(x.shape + (3, 3))
+    rot[..., 0, 0] = 1 - 2 * (yy + zz)
+    rot[..., 0, 1] = 2 * (xy - wz)
+    rot[..., 0, 2] = 2 * (xz + wy)
+    rot[..., 1, 0] = 2 * (xy + wz)
+    rot[..., 1, 1] = 1 - 2 * (xx + zz)
+    rot[..., 1, 2] = 2 * (yz - wx)
+    rot[..., 2, 0] = 2 * (xz - wy)
+    rot[..., 2, 1] = 2 * (yz + wx)
+    rot[..., 2, 2] = 1 - 2 * (xx + yy)
+    return rot
+
+
+def slerp(q0, q1, t):
+    """Spherical linear interpolation between q0 and q1 at t in [0,1]
+
+    q0, q1: (...,4) quaternions broadcastable with t (...)
+    Returns (...,4) unit quaternions along the shortest arc.
+    """
+    q0 = np.asarray(q0, dtype=float)
+    q1 = np.asarray(q1, dtype=float)
+    t = np.asarray(t, dtype=float)[..., None]
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.clip(np.abs(dot), 0, 1)
+    omega = np.arccos(dot)
+    so = np.sin(omega)
+    small = so < 1e-9  # fall back to linear interpolation
+    so = np.where(small, 1, so)
+    w0 = np.where(small, 1 - t, np.sin((1 - t) * omega) / so)
+    w1 = np.where(small, t, np.sin(t * omega) / so)
+    quat = w0 * q0 + w1 * q1
+    return quat / np.linalg.norm(quat, axis=-1, keepdims=True)
@@ -11,23 +11,83 @@ Potential decision:
 
 """
 
+from collections.abc import MutableMapping
+
 import numpy as np
 from scipy.spatial.transform import Rotation, Slerp
 
+from .cache import (cached_iter_render, cached_render, fingerprint, invalidate,
+                    iter_attributes, new_hash, node_hash, register,
+                    update_items)
+from . import kernels
+from .profiling import count, timed, timed_iter
+
+# dtype of the vertex buffers given to renderers and exporters, poses and
+# cumulative transforms are always computed in float64
+vertex_dtype = np.dtype(np.float64)
+
+
+def set_vertex_dtype(dtype):
+    """Set the default dtype of Points, Mesh and WorldGeometry buffers"""
+    global vertex_dtype
+    vertex_dtype = np.dtype(dtype)
+
+
+def get_vertex_dtype(dtype=None):
+    """Return dtype or the default vertex dtype if dtype is None"""
+    if dtype is None:
+        return vertex_dtype
+    return np.dtype(dtype)
+
+
+def cumulative_matmul(matrices):
+    """Return the cumulative products M0, M0@M1, M0@M1@M2, ... of Nx4x4 matrices
+
+    Computed with a prefix scan in log2(N) batched products, or in one
+    sequential loop with the numba backend.
+    """
+    if kernels.use_jit():
+        return kernels.cumulative_matmul(np.array(matrices, dtype=float))
+    result = np.array(matrices, dtype=float)
+    step = 1
+    while step < len(result):
+        result[step:] = result[:-step] @ result[step:]
+        step *= 2
+    return result
+
+
 class Element:
+    __slots__ = ("name", "label", "layer", "hash_cache", "hash_parents", "__weakref__")
+    fingerprint_exclude = ()
+
     def __init__(self, name=None, label=None, layer=None):
         self.name = name
         self.label = label
         self.layer = layer
 
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        # nothing to clear until the hash is computed, e.g. in __init__
+        if getattr(self, "hash_cache", None) is not None:
+            if key not in self.fingerprint_exclude:
+                invalidate(self)
+
+    def content_hash(self):
+        """Return the memoized digest of the content, see cache.node_hash"""
+        return node_hash(self)
+
+    def __getstate__(self):
+        return dict(iter_attributes(self))
+
+    def __setstate__(self, state):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+
     def __getitem__(self, key):
-        if key in self.__dict__:
-            return self.__dict__[key]
-        else:
-            try:
-               return getattr(self, key)
-            except AttributeError:
-                raise KeyError(f"{self} has no attribute {key}")
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(f"{self} has no attribute {key}")
 
     def at(self, name=None, pose=None):
         if pose is None:
@@ -35,18 +95,49 @@ class Element:
         else:
             return pose.new(name=name,element=self)
 
+    @timed
     def render(self, style):
-        return [Pose(name=self.name, element=self)]
+        return [Pose(name=self.name, element=self, layer=self.layer)]
 
-    def draw2d(self, style=None, projection='xy'):
+    def iter_render(self, style):
+        """Yield the primitives of render one by one"""
+        yield from self.render(style)
+
+    def draw2d(self, style=None, projection='xy', background=False):
+        """Draw on a new Canvas2D, in a worker thread if background"""
         from .canvas import Canvas2D
         canvas = Canvas2D(projection=projection, style=style)
         canvas.add(self)
-        canvas.draw()
+        if background:
+            canvas.draw_async()
+        else:
+            canvas.draw()
         return canvas
 
 
 class Pose:
+    """
+    Pose uses __slots__ to limit the memory footprint, clone and pickle use
+    the slots instead of __dict__.
+
+    The setters and transformations clear the memoized content hash,
+    assigning matrix, name, label, layer or element directly requires
+    cache.invalidate(pose).
+    """
+
+    __slots__ = (
+        "matrix",
+        "name",
+        "label",
+        "layer",
+        "element",
+        "hash_cache",
+        "hash_parents",
+        "__weakref__",
+    )
+    state_slots = ("matrix", "name", "label", "layer", "element")
+    hash_changed = None  # no hook, avoid the lookup in __getattr__
+
     def __init__(
         self,
         x=0,
@@ -85,6 +176,7 @@ class Pose:
         self.label = label
         self.layer = layer
         self.element = element
+        self.hash_cache = None
 
     def __repr__(self):
         args = []
@@ -112,6 +204,9 @@ class Pose:
             return res
 
     def __getattr__(self, key):
+        if key.startswith("__") or key in Pose.__slots__:
+            # avoid recursion for unset slots, copy and pickle protocols
+            raise AttributeError(key)
         try:
             return self[key]
         except AttributeError:
@@ -124,6 +219,7 @@ class Pose:
     @x.setter
     def x(self, value):
         self.matrix[0, 3] = value
+        self.modified()
 
     @property
     def y(self):
@@ -132,6 +228,7 @@ class Pose:
     @y.setter
     def y(self, value):
         self.matrix[1, 3] = value
+        self.modified()
 
     @property
     def z(self):
@@ -140,6 +237,7 @@ class Pose:
     @z.setter
     def z(self, value):
         self.matrix[2, 3] = value
+        self.modified()
 
     @property
     def dx(self):
@@ -148,6 +246,7 @@ class Pose:
     @dx.setter
     def dx(self, value):
         self.matrix[:3, 0] = value
+        self.modified()
 
     @property
     def dy(self):
@@ -156,6 +255,7 @@ class Pose:
     @dy.setter
     def dy(self, value):
         self.matrix[:3, 1] = value
+        self.modified()
 
     @property
     def dz(self):
@@ -164,6 +264,7 @@ class Pose:
     @dz.setter
     def dz(self, value):
         self.matrix[:3, 2] = value
+        self.modified()
 
     @property
     def loc(self):
@@ -172,6 +273,7 @@ class Pose:
     @loc.setter
     def loc(self, value):
         self.matrix[:3, 3] = value
+        self.modified()
 
     @property
     def loc4(self):
@@ -184,6 +286,7 @@ class Pose:
     @rot.setter
     def rot(self, value):
         self.matrix[:3, :3] = value
+        self.modified()
 
     @property
     def n(self):
@@ -208,23 +311,52 @@ class Pose:
         matrix[:3, 3] += other.matrix[:3, 3]
         return self.clone(matrix=matrix)
 
+    def modified(self):
+        """Clear the memoized hash after a change of the matrix"""
+        try:
+            cached = self.hash_cache
+        except AttributeError:
+            return  # never hashed
+        if cached is not None:
+            invalidate(self)
+
+    def content_hash(self):
+        """Return the digest of the memoized pose digest and of the element
+
+        Modifying the matrix in place requires self.modified().
+        """
+        return combine_element(node_hash(self, fingerprint_pose), self.element)
+
+    def linked_nodes(self):
+        """Return the nodes combined in content_hash, see cache.register"""
+        return linked_element(self.element)
+
+    def __getstate__(self):
+        return tuple(getattr(self, attr) for attr in Pose.state_slots)
+
+    def __setstate__(self, state):
+        for attr, value in zip(Pose.state_slots, state):
+            setattr(self, attr, value)
+
+    def _apply(self, transform):
+        """Right multiply the matrix by transform"""
+        self.matrix = np.dot(self.matrix, transform)
+        self.modified()
+
     def tx(self, x):
-        self.matrix = np.dot(
-            self.matrix,
+        self._apply(
             np.array([[1, 0, 0, x], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]),
         )
         return self
 
     def ty(self, y):
-        self.matrix = np.dot(
-            self.matrix,
+        self._apply(
             np.array([[1, 0, 0, 0], [0, 1, 0, y], [0, 0, 1, 0], [0, 0, 0, 1]]),
         )
         return self
 
     def tz(self, z):
-        self.matrix = np.dot(
-            self.matrix,
+        self._apply(
             np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, z], [0, 0, 0, 1]]),
         )
         return self
@@ -233,8 +365,7 @@ class Pose:
         angle_rad = np.radians(angle)
         cx = np.cos(angle_rad)
         sx = np.sin(angle_rad)
-        self.matrix = np.dot(
-            self.matrix,
+        self._apply(
             np.array(
                 [
                     [1, 0, 0, 0],
@@ -242,7 +373,7 @@ class Pose:
                     [0, sx, cx, 0],
                     [0, 0, 0, 1],
                 ]
-            ),
+            )
         )
         return self
 
@@ -250,8 +381,7 @@ class Pose:
         angle_rad = np.radians(angle)
         cx = np.cos(angle_rad)
         sx = np.sin(angle_rad)
-        self.matrix = np.dot(
-            self.matrix,
+        self._apply(
             np.array(
                 [
                     [cx, 0, sx, 0],
@@ -259,7 +389,7 @@ class Pose:
                     [-sx, 0, cx, 0],
                     [0, 0, 0, 1],
                 ]
-            ),
+            )
         )
         return self
 
@@ -267,8 +397,7 @@ class Pose:
         angle_rad = np.radians(angle)
         cx = np.cos(angle_rad)
         sx = np.sin(angle_rad)
-        self.matrix = np.dot(
-            self.matrix,
+        self._apply(
             np.array(
                 [
                     [cx, -sx, 0, 0],
@@ -276,13 +405,14 @@ class Pose:
                     [0, 0, 1, 0],
                     [0, 0, 0, 1],
                 ]
-            ),
+            )
         )
         return self
 
     def clone(self, **kwargs):
         """Return a full clone of the current pose"""
-        newargs = {**self.__dict__, **kwargs}
+        newargs = {attr: getattr(self, attr) for attr in Pose.state_slots}
+        newargs.update(kwargs)
         return Pose(**newargs)
 
     def new(self, **kwargs):
@@ -292,41 +422,418 @@ class Pose:
     def distance(self, pose):
         return np.linalg.norm(self.matrix[:3, 3] - pose.matrix[:3, 3])
 
+    @timed
     def render(self, style):
+        return list(self.iter_render(style))
+
+    @timed_iter
+    def iter_render(self, style):
         from .primitives import Text
-        primitives = []
         if style.get("labels", False):
-            primitives.append(
-                Text(text=self.name).at(self,pose=self))
+            yield Text(text=self.name).at(name=self.name, pose=self)
         if style.get("center.visible", True):
-            primitives.append(self.new(name=self.name))
+            yield self.new(name=self.name)
         if self.element is not None:
-            for primitive in self.element.render(style):
-                primitives.append(
-                    primitive.at(name=f"{self.name}/{primitive.name}",pose=self)
-                )
-        return primitives
+            for primitive in self.element.iter_render(style):
+                yield primitive.at(name=f"{self.name}/{primitive.name}",pose=self)
 
-    def draw2d(self, style=None, projection='xy'):
+    def draw2d(self, style=None, projection='xy', background=False):
+        """Draw on a new Canvas2D, in a worker thread if background"""
         from .canvas import Canvas2D
         canvas = Canvas2D(projection=projection, style=style)
         canvas.add(self)
-        canvas.draw()
+        if background:
+            canvas.draw_async()
+        else:
+            canvas.draw()
         return canvas
 
 
 
+class PoseView(Pose):
+    """
+    Pose whose matrix is a view on a row of a shared Nx4x4 buffer.
+
+    Transformations are written in place in the buffer and clear the hash
+    of the owner array.
+    """
+
+    __slots__ = ("owner",)
+
+    def _apply(self, transform):
+        self.matrix[...] = np.dot(self.matrix, transform)
+        self.modified()
+
+    def modified(self):
+        invalidate(self)
+        owner = getattr(self, "owner", None)
+        if owner is not None:
+            invalidate(owner)
+
+
+class PoseArray:
+    """
+    N poses sharing the same element, stored in a Nx4x4 matrix.
+
+    Used by render to emit an instanced primitive: the element is rendered
+    once in local coordinates and placed by the array of matrices.
+    """
+
+    @classmethod
+    def from_poses(cls, poses, element=None, name=None):
+        if element is None:
+            element = poses[0].element
+        return cls(
+            matrix=np.array([pose.matrix for pose in poses]),
+            names=[pose.name for pose in poses],
+            element=element,
+            name=name,
+            label=poses[0].label,
+            layer=poses[0].layer,
+        )
+
+    def __init__(
+        self,
+        matrix,
+        names=None,
+        element=None,
+        name=None,
+        label=None,
+        layer=None,
+        dtype=None,
+    ):
+        """dtype: float32 can be used for display only arrays"""
+        if isinstance(matrix, np.memmap) and dtype in (None, matrix.dtype):
+            self.matrix = matrix.reshape(-1, 4, 4)  # stays mapped to the file
+        else:
+            self.matrix = np.asarray(matrix, dtype=dtype).reshape(-1, 4, 4)
+        if names is None:
+            names = [f"{name}/{i}" for i in range(len(self.matrix))]
+        self.names = names
+        self.element = element
+        self.name = name
+        self.label = label
+        self.layer = layer
+        self.hash_cache = None
+        self.hash_parents = None
+
+    def __getstate__(self):
+        return {**self.__dict__, "hash_cache": None, "hash_parents": None}
+
+    def content_hash(self):
+        """Return the digest of the memoized array digest and of the element
+
+        Modifying the matrix in place, except through views, requires
+        cache.invalidate(array).
+        """
+        return combine_element(node_hash(self, fingerprint_posearray), self.element)
+
+    def linked_nodes(self):
+        return linked_element(self.element)
+
+    def __repr__(self):
+        if self.element is not None and self.element.name is not None:
+            return f"<{len(self)} x {self.element.name!r}>"
+        return f"<{len(self)} poses>"
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __getitem__(self, idx):
+        return Pose(
+            matrix=self.matrix[idx].copy(),
+            name=self.names[idx],
+            element=self.element,
+            label=self.label,
+            layer=self.layer,
+        )
+
+    def view(self, idx):
+        """Return a PoseView sharing the memory of the idx-th matrix"""
+        view = PoseView(
+            matrix=self.matrix[idx],
+            name=self.names[idx],
+            element=self.element,
+            label=self.label,
+            layer=self.layer,
+        )
+        view.owner = self
+        return view
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def loc(self):
+        return self.matrix[:, :3, 3]
+
+    @property
+    def rot(self):
+        return self.matrix[:, :3, :3]
+
+    def clone(self, **kwargs):
+        newargs = {
+            "matrix": self.matrix,
+            "names": self.names,
+            "element": self.element,
+            "name": self.name,
+            "label": self.label,
+            "layer": self.layer,
+            **kwargs,
+        }
+        return PoseArray(**newargs)
+
+    def new(self, **kwargs):
+        """Return a new array with the same matrices and names as self"""
+        return PoseArray(matrix=self.matrix, names=self.names, **kwargs)
+
+    def at(self, name=None, pose=None):
+        """Return the array named name placed in the frame of pose"""
+        if name is None:
+            name = self.name
+        if pose is None:
+            return self.clone(name=name)
+        names = [f"{pose.name}/{nn}" for nn in self.names]
+        return self.clone(
+            matrix=pose.matrix @ self.matrix, names=names, name=name
+        )
+
+    def place(self, primitive):
+        """Return primitive (Pose or PoseArray) placed at all the poses"""
+        if isinstance(primitive, PoseArray):
+            matrix = self.matrix[:, None] @ primitive.matrix[None]
+            names = [f"{aa}/{bb}" for aa in self.names for bb in primitive.names]
+        else:
+            matrix = self.matrix @ primitive.matrix
+            names = [f"{aa}/{primitive.name}" for aa in self.names]
+        return PoseArray(
+            matrix=matrix,
+            dtype=self.matrix.dtype,
+            names=names,
+            element=primitive.element,
+            name=primitive.name,
+            label=primitive.label,
+            layer=primitive.layer,
+        )
+
+    @timed
+    def render(self, style):
+        return list(self.iter_render(style))
+
+    @timed_iter
+    def iter_render(self, style):
+        from .primitives import Text
+        if style.get("labels", False):
+            for pose in self:
+                yield Text(text=pose.name).at(name=pose.name, pose=pose)
+        if style.get("center.visible", True):
+            yield self.new(name=self.name)
+        if self.element is not None:
+            for primitive in self.element.iter_render(style):
+                yield self.place(primitive)
+
+
+class Parts(MutableMapping):
+    """
+    Copy-on-write mapping of parts.
+
+    Lookups fall back to the base mapping, a snapshot of the parts of the
+    prototype taken when the clone is made, shared and not modified.
+    Assignments and deletions are stored as sparse deltas, so that a clone
+    costs memory proportional to its differences from the prototype. The
+    part objects themselves are shared, not copied.
+
+    The content hash is the sum of digests of the items, kept per key, so
+    that a change of one item is hashed in constant time. It does not depend
+    on the order of the items.
+    """
+
+    def __init__(self, data=None, base=None):
+        self.base = {} if base is None else base
+        self.delta = {} if data is None else dict(data)
+        self.removed = set()
+        self.frozen = None  # snapshot of the items, see snapshot
+        self.hash_cache = None
+        self.hash_parents = None
+        self.terms = {}  # key -> digest of the item as an integer
+        self.total = 0  # sum of the terms modulo 2**128
+        self.dirty = None  # keys of the terms to update, None for all
+
+    def content_hash(self):
+        """Return the memoized digest of the items"""
+        if self.hash_cache is None:
+            self.hash_cache = hash_parts(self)
+        return self.hash_cache
+
+    def hash_changed(self, key):
+        """Mark the term of key, or all of them if key is None, to update"""
+        if key is None:
+            self.dirty = None
+        elif self.dirty is not None:
+            self.dirty.add(key)
+
+    def __getstate__(self):
+        return {
+            **self.__dict__,
+            "hash_cache": None,
+            "hash_parents": None,
+            "terms": {},
+            "total": 0,
+            "dirty": None,
+            "frozen": None,
+        }
+
+    def __getitem__(self, key):
+        if key in self.delta:
+            return self.delta[key]
+        if key in self.removed:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        self.delta[key] = value
+        self.removed.discard(key)
+        self.frozen = None
+        invalidate(self, key)
+
+    def __delitem__(self, key):
+        if key in self.delta:
+            del self.delta[key]
+            if key in self.base:
+                self.removed.add(key)
+        elif key in self.base and key not in self.removed:
+            self.removed.add(key)
+        else:
+            raise KeyError(key)
+        self.frozen = None
+        invalidate(self, key)
+
+    def __contains__(self, key):
+        if key in self.delta:
+            return True
+        return key not in self.removed and key in self.base
+
+    def __iter__(self):
+        for key in self.base:
+            if key not in self.removed:
+                yield key
+        for key in self.delta:
+            if key not in self.base:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Parts({dict(self)!r})"
+
+    def overrides(self):
+        """Return the parts set and the names of the parts removed"""
+        return dict(self.delta), set(self.removed)
+
+    def snapshot(self):
+        """Return a dict of the items, shared until self is modified"""
+        if self.frozen is None:
+            self.frozen = dict(self)
+        return self.frozen
+
+    def clone(self, overrides=None):
+        """Return a Parts based on a snapshot of the items of self"""
+        return Parts(overrides, base=self.snapshot())
+
+    def flatten(self):
+        """Return a Parts without base, with a copy of the current items"""
+        return Parts(dict(self))
+
+
+def fingerprint_pose(pose, memo, deps):
+    """Digest of the matrix and names of a pose, without the element"""
+    h = new_hash(f"pose:{pose.name!r}:{pose.label!r}:{pose.layer!r}")
+    h.update(np.ascontiguousarray(pose.matrix, dtype=float).data)
+    return h.digest()
+
+
+def fingerprint_posearray(array, memo, deps):
+    """Digest of the matrices and names of a PoseArray, without the element"""
+    h = new_hash(f"posearray:{array.name!r}:{array.label!r}:{array.layer!r}")
+    h.update(fingerprint(array.matrix, memo, deps))
+    update_items(h, array.names, memo, deps)
+    return h.digest()
+
+
+def combine_element(digest, element):
+    """Digest of a pose digest and of its element
+
+    The hash of a shared element is combined when requested instead of
+    being memoized in each pose.
+    """
+    if element is None:
+        return digest
+    h = new_hash("placed")
+    h.update(digest)
+    h.update(fingerprint(element))
+    return h.digest()
+
+
+def linked_element(element):
+    if hasattr(type(element), "content_hash"):
+        return (element,)
+    return ()
+
+
+def hash_parts(parts):
+    """Update the terms of the changed items and return the parts digest"""
+    if parts.dirty is None:
+        parts.terms = {}
+        parts.total = 0
+        keys = list(parts)
+    else:
+        keys = parts.dirty
+    for key in keys:
+        parts.total -= parts.terms.pop(key, 0)
+        if key not in parts:
+            continue
+        value = parts[key]
+        h = new_hash(f"part:{key!r}")
+        h.update(fingerprint(value))
+        if hasattr(type(value), "content_hash"):
+            register(value, parts, key)
+        term = int.from_bytes(h.digest(), "little")
+        parts.terms[key] = term
+        parts.total += term
+    parts.total %= 2**128
+    parts.dirty = set()
+    h = new_hash(f"parts:{len(parts.terms)}")
+    h.update(parts.total.to_bytes(16, "little"))
+    return h.digest()
+
+
 class Frame(Element):
+    fingerprint_exclude = ("prototype",)
+
     def __init__(self, name, *parts, data=None, parent=None, prototype=None):
         self.name = name
-        self.parts = {el.name: el for el in parts} # Poses of the parts
+        self.parts = Parts({el.name: el for el in parts})  # Poses of the parts
         self.data = data  # other metadata
         self.parent = parent  # name of the parent assembly
         self.prototype = prototype  # if it has been cloned
 
-    def clone(self, **kwargs):
-        data = {**self.__dict__, **kwargs}
-        return super().__class__(prototype=self, **data)
+    def clone(self, parts=None, **kwargs):
+        """Return a copy-on-write clone sharing the parts and data of self
+
+        parts: dict of parts overriding the ones of self
+        """
+        new = self.__class__.__new__(self.__class__)
+        for attr in ("name", "label", "layer"):
+            if hasattr(self, attr):
+                setattr(new, attr, getattr(self, attr))
+        new.__dict__.update(self.__dict__)
+        new.parts = self.parts.clone(parts)
+        new.prototype = self
+        for attr, value in kwargs.items():
+            setattr(new, attr, value)
+        return new
 
     def __getitem__(self, path):
         path =path.split("/")
@@ -337,9 +844,191 @@ class Frame(Element):
         else:
             return res
 
-    def render(self,style=None):
-        primitives = []
-        for part in self.parts.values():
-            primitives.extend(part.render(style=style))
-        return primitives
+    @timed
+    @cached_render
+    def render(self, style=None, workers=None):
+        """Render the parts, parts sharing the same element are instanced
+
+        The draw order differs from rendering the parts one by one: the parts
+        are grouped by element in order of first appearance, see group_parts,
+        and within a group the k-th primitive of all the parts comes before
+        the (k+1)-th, e.g. all the centers before all the element shapes.
+
+        With workers > 1 the groups of parts sharing an element are split in
+        contiguous chunks rendered by a process pool, such that the result
+        is the same as the serial one, see pack_primitives.
+        """
+        groups = group_parts(self.parts.values())
+        if workers is None or workers <= 1 or len(groups) < 2:
+            return list(iter_render_groups(groups, style))
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = split_groups(groups, workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            packed = list(pool.map(render_packed, chunks, [style] * len(chunks)))
+        return unpack_primitives(packed)
+
+    def diff(self, other):
+        """Compare the parts of self and other by content hash
+
+        Returns a dict with the names of the parts added (only in other),
+        removed (only in self) and changed. Only differing subtrees are
+        hashed again.
+        """
+        result = {"added": [], "removed": [], "changed": []}
+        if self.parts.content_hash() == other.parts.content_hash():
+            return result
+        for key, part in self.parts.items():
+            if key not in other.parts:
+                result["removed"].append(key)
+            elif part.content_hash() != other.parts[key].content_hash():
+                result["changed"].append(key)
+        result["added"] = [key for key in other.parts if key not in self.parts]
+        return result
+
+    @timed_iter
+    @cached_iter_render
+    def iter_render(self, style=None):
+        return iter_render_parts(self.parts.values(), style)
+
+
+def group_parts(parts):
+    """Return the lists of parts sharing the same element, in order"""
+    groups = {}
+    for part in parts:
+        groups.setdefault(id(part.element), []).append(part)
+    return list(groups.values())
+
+
+def split_groups(groups, nchunks):
+    """Split groups in at most nchunks contiguous lists of similar size"""
+    size = sum(len(parts) for parts in groups) / nchunks
+    chunks = [[]]
+    total = 0
+    for parts in groups:
+        if len(chunks[-1]) > 0 and total >= size * len(chunks):
+            chunks.append([])
+        chunks[-1].append(parts)
+        total += len(parts)
+    return chunks
+
+
+def iter_render_parts(parts, style):
+    """Yield the primitives of the parts, parts sharing the same element are
+    instanced"""
+    yield from iter_render_groups(group_parts(parts), style)
+
+
+def iter_render_groups(groups, style):
+    """Yield the primitives of groups of parts sharing the same element"""
+    for parts in groups:
+        if len(parts) > 1 and all(isinstance(part, Pose) for part in parts):
+            parts = [PoseArray.from_poses(parts)]
+            count("render.instanced_parts", len(parts[0]))
+        for part in parts:
+            yield from part.iter_render(style)
+
+
+def filter_primitives(primitives, layers=None, names=None, classes=None):
+    """Yield the primitives matching the filters
+
+    layers: collection of layers
+    names: collection of glob patterns matched against the primitive name,
+           the instances of a PoseArray are selected by their names
+    classes: collection of element class names, "Pose" for bare poses
+    """
+    from fnmatch import fnmatchcase
+
+    def match(name):
+        return any(fnmatchcase(str(name), pattern) for pattern in names)
+
+    for primitive in primitives:
+        if layers is not None and primitive.layer not in layers:
+            continue
+        if classes is not None:
+            element = primitive.element
+            kind = "Pose" if element is None else element.__class__.__name__
+            if kind not in classes:
+                continue
+        if names is not None:
+            if isinstance(primitive, PoseArray):
+                mask = np.array([match(name) for name in primitive.names], dtype=bool)
+                if not mask.any():
+                    continue
+                if not mask.all():
+                    primitive = primitive.clone(
+                        matrix=primitive.matrix[mask],
+                        names=[nn for nn, mm in zip(primitive.names, mask) if mm],
+                    )
+            elif not match(primitive.name):
+                continue
+        yield primitive
+
+
+def pack_primitives(primitives):
+    """Pack primitives in a matrix buffer, records and unique elements
+
+    The matrices of all the primitives are stacked in one (N,4,4) float64
+    buffer. Each record holds (is_array, size, dtype, name, names, label,
+    layer, element index), the elements are listed once each.
+    """
+    elements = []
+    index = {}
+    records = []
+    matrices = []
+    for primitive in primitives:
+        element = primitive.element
+        if id(element) not in index:
+            index[id(element)] = len(elements)
+            elements.append(element)
+        is_array = isinstance(primitive, PoseArray)
+        matrix = primitive.matrix.reshape(-1, 4, 4)
+        matrices.append(matrix)
+        records.append(
+            (
+                is_array,
+                len(matrix),
+                matrix.dtype.str,
+                primitive.name,
+                primitive.names if is_array else None,
+                primitive.label,
+                primitive.layer,
+                index[id(element)],
+            )
+        )
+    if len(matrices) > 0:
+        buffer = np.concatenate(matrices).astype(float, copy=False)
+    else:
+        buffer = np.zeros((0, 4, 4))
+    return buffer, records, elements
+
+
+def unpack_primitives(packed):
+    """Return the primitives of a list of pack_primitives results
+
+    Elements with the same content hash are shared between the chunks, such
+    that primitives of the same element can still be grouped by identity.
+    """
+    shared = {}
+    primitives = []
+    for buffer, records, elements in packed:
+        elements = [
+            element
+            if element is None
+            else shared.setdefault(element.content_hash(), element)
+            for element in elements
+        ]
+        start = 0
+        for is_array, size, dtype, name, names, label, layer, idx in records:
+            matrix = buffer[start : start + size].astype(dtype, copy=False)
+            start += size
+            kwargs = dict(name=name, element=elements[idx], label=label, layer=layer)
+            if is_array:
+                primitives.append(PoseArray(matrix, names=names, **kwargs))
+            else:
+                primitives.append(Pose(matrix=matrix[0], **kwargs))
+    return primitives
+
 
+def render_packed(groups, style):
+    return pack_primitives(iter_render_groups(groups, style))
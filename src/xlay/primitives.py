@@ -31,9 +31,13 @@ mesh(): return mesh
 """
 
 import numpy as np
-from scipy.spatial.transform import Rotation, Slerp
 
-from .pose import Element, Pose
+from . import kernels
+from .orientation import quat_from_matrix, quat_to_matrix, slerp
+from .pose import (Element, Pose, PoseArray, cumulative_matmul,
+                   get_vertex_dtype)
+from .cache import cached_render
+from .profiling import count, timed
 
 
 class Point:
@@ -60,31 +64,95 @@ class Point:
         return f"Point({self.arr[:3]},{', '.join(args)})"
 
 
-class Points:
-    def __init__(self, points, name=None, label=None, layer=None):
+class Points(Element):
+    """
+    Cloud of points, for instance of a laser scan of the tunnel.
+
+    The source is kept as given, so that memory mapped arrays are read in
+    chunks by iter_chunks and never loaded at once. The canvas draws it as a
+    density raster.
+    """
+
+    __slots__ = ("source", "dtype", "chunk_size", "bounds_cache")
+    fingerprint_exclude = ("bounds_cache",)
+
+    def __init__(
+        self,
+        points,
+        name=None,
+        label=None,
+        layer=None,
+        dtype=None,
+        chunk_size=1000000,
+    ):
         """
-        stored in 4xN vector with 1 in the last row
+        points: (3,N) or (4,N) array, possibly memory mapped
+        dtype: dtype of arr, default from get_vertex_dtype
         """
-        if hasattr(points, "shape"):
-            if points.shape[0] == 3:
-                self.arr = np.ones((4, points.shape[1]), dtype=float)
-                self.arr[:3] = points
-            elif points.shape[0] == 4:
-                self.arr = points
-            else:
-                raise ValueError("Points shape must be (3,N) or (4,N)")
+        if not hasattr(points, "shape") or points.shape[0] not in (3, 4):
+            raise ValueError("Points shape must be (3,N) or (4,N)")
+        self.source = points
+        self.dtype = get_vertex_dtype(dtype)
+        self.chunk_size = chunk_size
+        self.bounds_cache = None
         self.name = name
         self.label = label
         self.layer = layer
 
+    @classmethod
+    def from_file(cls, filename, dtype="<f4", columns=3, offset=0, **kwargs):
+        """Memory map a .npy file or a raw file of N rows of x, y, z, ...
+
+        Only the first 3 columns are used.
+        """
+        if str(filename).endswith(".npy"):
+            data = np.load(filename, mmap_mode="r")
+        else:
+            data = np.memmap(filename, dtype=dtype, mode="r", offset=offset)
+            data = data.reshape(-1, columns)
+        return cls(data[:, :3].T, **kwargs)
+
+    @property
+    def arr(self):
+        """4xN array with 1 in the last row, the source is loaded in memory"""
+        arr = np.ones((4, len(self)), dtype=self.dtype)
+        arr[:3] = self.source[:3]
+        return arr
+
+    def __len__(self):
+        return self.source.shape[1]
+
+    def iter_chunks(self, chunk_size=None):
+        """Yield 3xn float64 arrays of consecutive points"""
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        for start in range(0, len(self), chunk_size):
+            yield np.asarray(
+                self.source[:3, start : start + chunk_size], dtype=float
+            )
+
+    def bounds(self):
+        """Return the min and max (3) of the points, computed once"""
+        if self.bounds_cache is None:
+            lo = np.full(3, np.inf)
+            hi = np.full(3, -np.inf)
+            for chunk in self.iter_chunks():
+                lo = np.minimum(lo, chunk.min(axis=1))
+                hi = np.maximum(hi, chunk.max(axis=1))
+            self.bounds_cache = (lo, hi)
+        return self.bounds_cache
+
     def __repr__(self):
         args = []
         if self.name is not None:
             args.append(f"name={self.name}")
-        return f"<Points({self.arr[:3]},{', '.join(args)})>"
+        return f"<Points({len(self)} points,{', '.join(args)})>"
 
 
 class Line(Element):
+    __slots__ = ("start", "end", "quats")
+    fingerprint_exclude = ("quats",)
+
     def __init__(self, start, end, name=None, label=None, layer=None):
         if not isinstance(start, Pose):
             start = Pose(*start)
@@ -92,6 +160,7 @@ class Line(Element):
             end = Pose(*end)
         self.start = start
         self.end = end
+        self.quats = None  # (rotations, quaternions) of start and end
         self.name = name
         self.label = label
         self.layer = layer
@@ -105,19 +174,37 @@ class Line(Element):
     def length(self):
         return self.start.distance(self.end)
 
+    def end_quats(self):
+        """Return the quaternions of start and end, recomputed if they moved"""
+        rot = np.array([self.start.rot, self.end.rot])
+        if self.quats is None or not np.array_equal(self.quats[0], rot):
+            self.quats = (rot, quat_from_matrix(rot))
+        return self.quats[1]
+
+    def matrices(self, s):
+        """Return the Nx4x4 matrices at the path lengths s"""
+        quats = self.end_quats()
+        s = np.atleast_1d(np.asarray(s, dtype=float))
+        length = self.length()
+        t = s / length if length > 0 else np.zeros_like(s)
+        matrix = np.zeros((len(s), 4, 4))
+        quat = slerp(quats[0], quats[1], t)
+        matrix[:, :3, :3] = quat_to_matrix(quat)
+        delta = self.end.loc - self.start.loc
+        matrix[:, :3, 3] = self.start.loc + t[:, None] * delta
+        matrix[:, 3, 3] = 1
+        return matrix
+
     def point(self, s):
-        pstart = self.start.loc
-        pend = self.end.loc
-        rstart = Rotation.from_matrix(self.start.rot)
-        rend = Rotation.from_matrix(self.end.rot)
-        rot = Slerp([0, self.length], [rstart, rend])(s)
-        return Pose(loc=pstart + s * (pend - pstart), rot=rot.as_matrix())
+        return Pose(matrix=self.matrices(s)[0])
 
     def points(self):
         return np.array([self.start.loc4, self.end.loc4]).T
 
 
 class Rectangle(Element):
+    __slots__ = ("lx", "ly")
+
     def __init__(self, name=None, lx=1, ly=1, label=None, layer=None):
         self.lx = lx
         self.ly = ly
@@ -168,27 +255,32 @@ class Rectangle(Element):
         return Pose(name=f"{self.name}/bottom", y=-self.ly / 2)
 
     def points(self):
+        """Return the corners ul, ur, lr, ll, ul as 5x4 array"""
+        x = self.lx / 2
+        y = self.ly / 2
         return np.array(
             [
-                pp.loc4
-                for pp in (self.ul, self.ur, self.lr, self.ll, self.ul)
-            ]
+                [-x, y, 0, 1],
+                [x, y, 0, 1],
+                [x, -y, 0, 1],
+                [-x, -y, 0, 1],
+                [-x, y, 0, 1],
+            ],
+            dtype=float,
         )
 
+    @timed
+    @cached_render
     def render(self, style):
-        primitives = []
-        points = np.array(
-            [
-                pp.loc4
-                for pp in (self.ul, self.ur, self.lr, self.ll, self.ul)
-            ]
-        ).T
-        print(points)
-        primitives.append(Polygon(points=points).at(name=self.name))
-        return primitives
+        polygon = Polygon(
+            name=self.name, points=self.points().T, label=self.label, layer=self.layer
+        )
+        return [Pose(name=self.name, element=polygon, layer=self.layer)]
 
 
 class Polyline(Element):
+    __slots__ = ("points",)
+
     def __init__(self, name=None, points=None, label=None, layer=None):
         self.name = name
         self.points = points
@@ -201,6 +293,8 @@ class Polyline(Element):
 
 
 class Polygon(Polyline):
+    __slots__ = ()
+
     def __init__(self, name=None, points=None, label=None, layer=None):
         self.name = name
         self.points = points
@@ -241,25 +335,14 @@ class Bend:
             f"Bend({self.start},{self.length},{self.angle},{', '.join(args)})"
         )
 
+    def matrices(self, s):
+        """Return the Nx4x4 matrices at the path lengths s"""
+        s = np.atleast_1d(np.asarray(s, dtype=float))
+        local = segment_matrices(BEND, 2, self.length, self.angle, self.roll, s)
+        return self.start.matrix @ local
+
     def point(self, s):
-        # using mad-x formula
-        fullangle = np.deg2rad(self.angle)
-        radius = self.length / fullangle
-        alpha = fullangle * s / self.length
-        ca = np.cos(alpha)
-        sa = np.sin(alpha)
-        psi = np.deg2rad(self.roll)
-        cp = np.cos(psi)
-        sp = np.sin(psi)
-        R = np.array([radius * (ca - 1), 0, radius * sa])
-        S = np.array([[ca, 0, -sa], [0, 1, 0], [sa, 0, ca]])
-        T = np.array([[cp, -sp, 0], [sp, cp, 0], [0, 0, 1]])
-        Ti = np.array([[cp, sp, 0], [-sp, cp, 0], [0, 0, 1]])
-        R = T @ R
-        S = T @ S @ Ti
-        loc = self.start.rot @ R + self.start.loc
-        rot = self.start.rot @ S
-        return Point(loc=loc, rot=rot)
+        return Pose(matrix=self.matrices(s)[0])
 
     def points(self, steps=5):
         s = np.linspace(0, self.length, steps)
@@ -284,6 +367,71 @@ class Circle:
 
 
 # curve segments
+LINE, BEND, ABSOLUTE = 0, 1, 2  # kinds of segments in Curve arrays
+
+
+def segment_matrices(kind, axis, length, angle, roll, s):
+    """Return Nx4x4 matrices at s from the segment start in the segment frame
+
+    kind: LINE along axis (0, 1, 2 for x, y, z) or BEND in xz rolled by roll
+    Arguments are arrays broadcast together, angle and roll are in degrees.
+    """
+    kind, axis, length, angle, roll, s = np.broadcast_arrays(
+        kind, axis, length, angle, roll, np.atleast_1d(s).astype(float)
+    )
+    nn = len(s)
+    matrix = np.zeros((nn, 4, 4))
+    matrix[:, 3, 3] = 1
+    line = kind == LINE
+    matrix[line, :3, :3] = np.eye(3)
+    matrix[line, axis[line], 3] = s[line]
+    bend = np.flatnonzero(kind == BEND)
+    if len(bend) > 0 and kernels.use_jit():
+        matrix[bend] = kernels.bend_matrices(
+            length[bend].astype(float),
+            angle[bend].astype(float),
+            roll[bend].astype(float),
+            s[bend],
+            np.empty((len(bend), 4, 4)),
+        )
+    elif len(bend) > 0:
+        # using mad-x formula
+        s = s[bend]
+        length = length[bend].astype(float)
+        fullangle = np.deg2rad(angle[bend])
+        alpha = np.divide(
+            fullangle * s, length, out=np.zeros_like(s), where=length != 0
+        )
+        ca = np.cos(alpha)
+        sa = np.sin(alpha)
+        psi = np.deg2rad(roll[bend])
+        cp = np.cos(psi)
+        sp = np.sin(psi)
+        straight = fullangle == 0
+        radius = np.divide(
+            length, fullangle, out=np.zeros_like(s), where=~straight
+        )
+        R = np.zeros((len(bend), 3))
+        R[:, 0] = np.where(straight, 0, radius * (ca - 1))
+        R[:, 2] = np.where(straight, s, radius * sa)
+        S = np.zeros((len(bend), 3, 3))
+        S[:, 0, 0] = ca
+        S[:, 0, 2] = -sa
+        S[:, 1, 1] = 1
+        S[:, 2, 0] = sa
+        S[:, 2, 2] = ca
+        T = np.zeros((len(bend), 3, 3))
+        T[:, 0, 0] = cp
+        T[:, 0, 1] = -sp
+        T[:, 1, 0] = sp
+        T[:, 1, 1] = cp
+        T[:, 2, 2] = 1
+        Ti = T.transpose(0, 2, 1)
+        matrix[bend, :3, 3] = np.einsum("nij,nj->ni", T, R)
+        matrix[bend, :3, :3] = T @ S @ Ti
+    return matrix
+
+
 class LineTo:
     def __init__(self, end):
         self.end = end
@@ -295,6 +443,9 @@ class LineTo:
         length = start.distance(self.end)
         return Line(start, self.end), length, self.end
 
+    def get_row(self):
+        return ABSOLUTE, 2, 0, 0, 0
+
 
 class ArcTo:
     def __init__(self, radius, end):
@@ -305,7 +456,10 @@ class ArcTo:
         return f"ArcTo({self.radius},{self.end})"
 
     def get_segment(self, start):
-        raise NotImplementedError
+        raise NotImplementedError("ArcTo segments are not supported yet, use BendBy")
+
+    def get_row(self):
+        raise NotImplementedError("ArcTo segments are not supported yet, use BendBy")
 
 
 class LineBy:
@@ -324,6 +478,12 @@ class LineBy:
         end = getattr(start.new(), f"t{self.axis}")(self.length)
         return Line(start, end), self.length, end
 
+    def get_row(self):
+        """Return kind, axis, length, angle, roll for the Curve arrays"""
+        if self.axis not in ("x", "y", "z"):
+            raise ValueError(f"LineBy axis must be 'x', 'y' or 'z', not {self.axis!r}")
+        return LINE, "xyz".index(self.axis), self.length, 0, 0
+
 
 class BendBy:
     def __init__(self, length=0, angle=0, roll=0, axis="xz"):
@@ -348,6 +508,10 @@ class BendBy:
         segment = Bend(start, self.length, self.angle, self.roll)
         return segment, self.length, segment.end
 
+    def get_row(self):
+        """Return kind, axis, length, angle, roll for the Curve arrays"""
+        return BEND, 2, self.length, self.angle, self.roll
+
 
 class Curve:
     """
@@ -357,53 +521,242 @@ class Curve:
 
     Each s is associated to one and one-only pose.
 
+    The segments are stored in arrays (kind, axis, length, angle, roll). The
+    start matrices of the segments are computed on demand with a cumulative
+    product and, after an edit, only downstream of the edited segment.
+    Segment objects, and the specs of curves built from arrays, are created
+    on access.
     """
 
     @classmethod
     def from_svgpath(cls, svgpath):
         pass
 
+    @classmethod
+    def from_arrays(
+        cls, kind, length, angle=0, roll=0, start=None, s_start=0.0, lookup_ds=1.0
+    ):
+        """Build a curve from arrays of segments
+
+        kind: "line" or "bend" for each segment
+        length, angle, roll: arrays or scalars, angle and roll in degrees
+        """
+        kind = np.asarray(kind)
+        if kind.dtype.kind in "USO":
+            kind = np.char.lower(kind.astype(str))
+            if not np.all((kind == "line") | (kind == "bend")):
+                raise ValueError("Curve segment kind must be 'line' or 'bend'")
+            kind = np.where(kind == "bend", BEND, LINE)
+        kind, length, angle, roll = np.broadcast_arrays(kind, length, angle, roll)
+        curve = cls(start=start, s_start=s_start, lookup_ds=lookup_ds)
+        curve.specs = [None] * len(kind)  # created on access by get_spec
+        curve.kind = kind.astype(int)
+        curve.axis = np.full(len(kind), 2)
+        curve.lengths = length.astype(float)
+        curve.angle = angle.astype(float)
+        curve.roll = roll.astype(float)
+        return curve
+
     def __init__(self, start=None, specs=None, s_start=0.0, lookup_ds=1.0):
         if start is None:
-            start = Point()
-        if specs is None:
-            specs = []
+            start = Pose()
         self.start = start
-        self.end = start
         self.s_start = s_start
-        self.s_end = s_start
-        self.specs = specs
-        self.segments = []
-        self.lookup_ds = lookup_ds
-        self.lookup_end = s_start
-        self.lookup = []
-        for spec in specs:
-            self.add_spec(spec)
+        self.lookup_ds = lookup_ds  # default sampling step
+        self.specs = []  # None for segments only defined by the arrays
+        self.pending = []  # rows of the specs not yet in the arrays
+        self.kind = np.zeros(0, dtype=int)
+        self.axis = np.zeros(0, dtype=int)
+        self.lengths = np.zeros(0)
+        self.angle = np.zeros(0)
+        self.roll = np.zeros(0)
+        self.valid = 0  # start matrices are valid up to this segment
+        self.start_matrices = np.zeros((0, 4, 4))
+        self.s_starts = np.zeros(0)
+        self.end_matrix = start.matrix
+        self._segments = []
+        if specs is not None:
+            for spec in specs:
+                self.add_spec(spec)
+
+    def sync(self):
+        """Move the pending specs in the arrays"""
+        if not self.pending:
+            return
+        kind, axis, length, angle, roll = np.array(self.pending, dtype=float).T
+        self.kind = np.concatenate([self.kind, kind.astype(int)])
+        self.axis = np.concatenate([self.axis, axis.astype(int)])
+        self.lengths = np.concatenate([self.lengths, length])
+        self.angle = np.concatenate([self.angle, angle])
+        self.roll = np.concatenate([self.roll, roll])
+        self.pending = []
+
+    def update(self):
+        """Compute the start matrices downstream of the first edited segment"""
+        self.sync()
+        nn = len(self.specs)
+        kk = self.valid
+        if kk >= nn and len(self.start_matrices) == nn:
+            return
+        count("curve.segments", nn - kk)
+        if kk == 0:
+            current = self.start.matrix
+        else:
+            current = self.end_of(kk - 1, self.start_matrices[kk - 1])
+        transforms = segment_matrices(
+            self.kind[kk:],
+            self.axis[kk:],
+            self.lengths[kk:],
+            self.angle[kk:],
+            self.roll[kk:],
+            self.lengths[kk:],
+        )
+        starts = np.empty((nn, 4, 4))
+        starts[:kk] = self.start_matrices[:kk]
+        ii = kk
+        for stop in list(np.flatnonzero(self.kind[kk:] == ABSOLUTE) + kk) + [nn]:
+            if stop > ii:
+                cum = cumulative_matmul(transforms[ii - kk : stop - kk])
+                starts[ii] = current
+                starts[ii + 1 : stop] = current @ cum[:-1]
+                current = current @ cum[-1]
+            if stop < nn:
+                starts[stop] = current
+                end = self.specs[stop].end
+                self.lengths[stop] = np.linalg.norm(end.loc - current[:3, 3])
+                current = end.matrix
+                ii = stop + 1
+        self.start_matrices = starts
+        self.end_matrix = current
+        cumlength = np.cumsum(self.lengths)[:-1]
+        self.s_starts = self.s_start + np.concatenate([[0], cumlength])
+        self.valid = nn
+
+    def get_spec(self, idx):
+        """Return the spec of segment idx, creating it from the arrays if needed"""
+        spec = self.specs[idx]
+        if spec is None:
+            self.sync()
+            if self.kind[idx] == BEND:
+                spec = BendBy(self.lengths[idx], self.angle[idx], self.roll[idx])
+            else:
+                spec = LineBy(self.lengths[idx], "xyz"[self.axis[idx]])
+            self.specs[idx] = spec
+        return spec
+
+    def end_of(self, idx, start):
+        """Return the end matrix of segment idx starting at start"""
+        if self.kind[idx] == ABSOLUTE:
+            return self.specs[idx].end.matrix
+        transform = segment_matrices(
+            self.kind[idx],
+            self.axis[idx],
+            self.lengths[idx],
+            self.angle[idx],
+            self.roll[idx],
+            self.lengths[idx],
+        )
+        return start @ transform[0]
+
+    def invalidate(self, idx):
+        self.valid = min(self.valid, idx)
+        del self._segments[idx:]
 
     def add_spec(self, spec):
-        seg_start = self.s_end
-        segment, length, end = spec.get_segment(self.end)
-        self.s_end += length
-        self.end = end
-        self.segments.append((seg_start, segment))
-        idx = len(self.segments) - 1
+        row = spec.get_row()  # fails before the curve is modified
+        if isinstance(spec, LineTo):
+            self.update()  # the length depends on the current end
         self.specs.append(spec)
-        steps = int((self.s_end - self.lookup_end) / self.lookup_ds)
-        self.lookup += [idx] * steps
-        self.lookup_end += steps * self.lookup_ds
-        self.length = self.s_end - self.s_start
+        self.pending.append(row)
+
+    def insert_spec(self, idx, spec):
+        """Insert spec before segment idx"""
+        row = spec.get_row()  # fails before the curve is modified
+        self.sync()
+        self.specs.insert(idx, spec)
+        for name, value in zip(["kind", "axis", "lengths", "angle", "roll"], row):
+            setattr(self, name, np.insert(getattr(self, name), idx, value))
+        self.invalidate(idx)
+
+    def replace_spec(self, idx, spec):
+        """Replace segment idx with spec"""
+        row = spec.get_row()  # fails before the curve is modified
+        self.sync()
+        self.specs[idx] = spec
+        for name, value in zip(["kind", "axis", "lengths", "angle", "roll"], row):
+            getattr(self, name)[idx] = value
+        self.invalidate(idx)
+
+    def delete_spec(self, idx):
+        """Delete segment idx"""
+        self.sync()
+        del self.specs[idx]
+        for name in ["kind", "axis", "lengths", "angle", "roll"]:
+            setattr(self, name, np.delete(getattr(self, name), idx))
+        self.invalidate(idx)
+
+    @property
+    def end(self):
+        self.update()
+        return Pose(matrix=self.end_matrix)
+
+    @property
+    def s_end(self):
+        self.update()
+        return self.s_start + self.lengths.sum()
 
+    @property
+    def length(self):
+        return self.s_end - self.s_start
+
+    @property
+    def segments(self):
+        """List of (s, segment) of the curve"""
+        self.update()
+        for idx in range(len(self._segments), len(self.specs)):
+            start = Pose(matrix=self.start_matrices[idx])
+            segment, _, _ = self.get_spec(idx).get_segment(start)
+            self._segments.append((self.s_starts[idx], segment))
+        return self._segments
+
+    @timed
     def point(self, s):
         if s < self.s_start or s > self.s_end:
             raise ValueError(
                 f"Curve point out of range {s} not in [{self.s_start},{self.s_end}]"
             )
-        lookup_idx = int((s - self.s_start) // self.lookup_ds)
-        seg_idx = self.lookup[lookup_idx]
-        segment_s, segment = self.segments[seg_idx]
-        if s < segment_s:
-            segment_s, segment = self.segments[seg_idx - 1]
-        return segment.point(s - segment_s)
+        return Pose(matrix=self.matrices(s)[0])
+
+    def matrices(self, s):
+        """Return the Nx4x4 matrices at the path lengths s"""
+        s = np.atleast_1d(np.asarray(s, dtype=float))
+        if np.any(s < self.s_start) or np.any(s > self.s_end):
+            raise ValueError(
+                f"Curve points out of range [{self.s_start},{self.s_end}]"
+            )
+        seg_idx = np.searchsorted(self.s_starts, s, side="right") - 1
+        seg_idx = np.clip(seg_idx, 0, len(self.specs) - 1)
+        ds = s - self.s_starts[seg_idx]
+        kind = self.kind[seg_idx]
+        local = segment_matrices(
+            kind,
+            self.axis[seg_idx],
+            self.lengths[seg_idx],
+            self.angle[seg_idx],
+            self.roll[seg_idx],
+            ds,
+        )
+        matrix = self.start_matrices[seg_idx] @ local
+        for idx in np.unique(seg_idx[kind == ABSOLUTE]):
+            mask = seg_idx == idx
+            _, segment = self.segments[idx]
+            matrix[mask] = segment.matrices(ds[mask])
+        return matrix
+
+    def poses(self, s):
+        """Return the PoseArray at the path lengths s"""
+        names = [f"s={ss}" for ss in np.atleast_1d(s)]
+        return PoseArray(self.matrices(s), names=names)
 
     def lineto(self, end):
         self.add_spec(LineTo(end))
@@ -430,7 +783,7 @@ class Curve:
         pass
 
     def __repr__(self):
-        return f"Curve: {self.s_start}, {self.s_end}, {len(self.segments)} segments"
+        return f"Curve: {self.s_start}, {self.s_end}, {len(self.specs)} segments"
 
 
 class Box:
@@ -441,6 +794,22 @@ class Box:
         self.label = label
         self.layer = layer
 
+    def mesh(self):
+        """Return a triangulated mesh of the box"""
+        corners = np.array(
+            [[i, j, k] for i in (-1, 1) for j in (-1, 1) for k in (-1, 1)],
+            dtype=float,
+        )
+        points = (corners * np.asarray(self.size) / 2).T
+        if self.center is not None:
+            points = points + np.asarray(self.center.loc)[:, None]
+        faces = [
+            [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],
+            [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],
+            [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3],
+        ]  # fmt: skip
+        return Mesh(points, faces, name=self.name, layer=self.layer)
+
 
 class Tube:
     def __init__(self, curve, sections, name=None, label=None, layer=None):
@@ -451,7 +820,7 @@ class Tube:
         self.layer = layer
 
 
-class Text:
+class Text(Element):
     def __init__(self, text, name=None, label=None, layer=None):
         self.text = text
         self.name = name
@@ -468,10 +837,51 @@ class Field:
         self.layer = layer
 
 
-class Mesh:
-    def __init__(self, points, faces, name=None, label=None, layer=None):
-        self.points = points
-        self.faces = faces
+class Mesh(Element):
+    def __init__(
+        self, points, faces, name=None, label=None, layer=None, dtype=None
+    ):
+        """
+        points: vertices stored in 4xN array like Points, (3,N) is accepted
+        faces: Mx3 array of vertex indices of the triangles
+        dtype: default from get_vertex_dtype
+        """
+        dtype = get_vertex_dtype(dtype)
+        points = np.asarray(points)
+        if points.shape[0] == 3:
+            self.points = np.ones((4, points.shape[1]), dtype=dtype)
+            self.points[:3] = points
+        elif points.shape[0] == 4:
+            self.points = np.asarray(points, dtype=dtype)
+        else:
+            raise ValueError("Mesh points shape must be (3,N) or (4,N)")
+        self.faces = np.asarray(faces).reshape(-1, 3)
         self.name = name
         self.label = label
         self.layer = layer
+
+    def __repr__(self):
+        return f"Mesh({self.points.shape[1]} vertices, {len(self.faces)} faces)"
+
+    @property
+    def vertices(self):
+        """Return Nx3 view of the vertices"""
+        return self.points[:3].T
+
+    def mesh(self):
+        return self
+
+    def to_stl(self, filename):
+        from .export import write_stl
+
+        write_stl(filename, self)
+
+    def to_obj(self, filename):
+        from .export import write_obj
+
+        write_obj(filename, self)
+
+    def to_glb(self, filename):
+        from .export import write_glb
+
+        write_glb(filename, self)
@@ -0,0 +1,214 @@
+"""
+Opt-in instrumentation of the hot paths.
+
+Functions decorated with @timed report their duration to the registry when
+profiling is enabled, otherwise the overhead is a flag check. Functions
+returning iterators, such as iter_render, are decorated with @timed_iter
+which reports the time spent producing the items.
+
+    with xlay.profile() as registry:
+        canvas.draw()
+    print(registry.summary())
+    registry.to_chrome_trace("trace.json")  # open with chrome://tracing
+
+The registry is thread safe and also holds counters, incremented with
+count(name, value) at the instrumented sites, e.g. survey.nodes,
+curve.segments, render.instanced_parts, draw.primitives, draw.instances and
+render_cache.hit/miss.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+
+enabled = False
+
+
+class Registry:
+    def __init__(self, max_events=1000000):
+        self.lock = threading.Lock()
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.timers = {}  # name -> [count, total, min, max] in ns
+            self.counters = {}
+            self.events = []  # (name, start, duration, thread id) in ns
+
+    def add(self, name, start, duration):
+        with self.lock:
+            stat = self.timers.get(name)
+            if stat is None:
+                self.timers[name] = [1, duration, duration, duration]
+            else:
+                stat[0] += 1
+                stat[1] += duration
+                stat[2] = min(stat[2], duration)
+                stat[3] = max(stat[3], duration)
+            if len(self.events) < self.max_events:
+                self.events.append((name, start, duration, threading.get_ident()))
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self, sort="total"):
+        """Return a table of the timers, times in ms, and the counters"""
+        columns = ["count", "total", "min", "max"]
+        with self.lock:
+            rows = sorted(
+                self.timers.items(),
+                key=lambda item: item[1][columns.index(sort)],
+                reverse=True,
+            )
+            counters = sorted(self.counters.items())
+        width = max([len(name) for name, _ in rows + counters] + [4])
+        lines = [
+            f"{'name':<{width}} {'count':>9} {'total':>10} {'mean':>10}"
+            f" {'min':>10} {'max':>10}"
+        ]
+        for name, (count, total, tmin, tmax) in rows:
+            lines.append(
+                f"{name:<{width}} {count:>9} {total/1e6:>10.3f}"
+                f" {total/count/1e6:>10.3f} {tmin/1e6:>10.3f} {tmax/1e6:>10.3f}"
+            )
+        for name, value in counters:
+            lines.append(f"{name:<{width}} {value:>9}")
+        return "\n".join(lines)
+
+    def to_chrome_trace(self, filename=None):
+        """Return the events in Chrome trace format, optionally save them"""
+        pid = os.getpid()
+        with self.lock:
+            events = [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start / 1e3,
+                    "dur": duration / 1e3,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, duration, tid in self.events
+            ]
+            events += [
+                {"name": name, "ph": "C", "ts": 0, "pid": pid, "args": {name: value}}
+                for name, value in self.counters.items()
+            ]
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if filename is not None:
+            with open(filename, "w") as fh:
+                json.dump(trace, fh)
+        return trace
+
+
+registry = Registry()
+
+
+def enable(reset=True):
+    global enabled
+    if reset:
+        registry.reset()
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+class profile:
+    """Context manager enabling the profiling, returns the registry"""
+
+    def __init__(self, reset=True):
+        self.reset = reset
+
+    def __enter__(self):
+        self.previous = enabled
+        enable(reset=self.reset)
+        return registry
+
+    def __exit__(self, *args):
+        if not self.previous:
+            disable()
+
+
+class timer:
+    """Context manager timing a block of code when profiling is enabled"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        if enabled:
+            registry.add(self.name, self.start, time.perf_counter_ns() - self.start)
+
+
+def count(name, value=1):
+    if enabled:
+        registry.count(name, value)
+
+
+def timed_iter(func=None, name=None):
+    """Decorator timing the iteration of the iterator returned by func
+
+    The time spent producing the items, not the time of the consumer, is
+    summed and reported once when the iterator is exhausted or closed.
+    """
+    if func is None:
+        return functools.partial(timed_iter, name=name)
+    if name is None:
+        name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        return timed_items(name, func, args, kwargs)
+
+    return wrapper
+
+
+def timed_items(name, func, args, kwargs):
+    start = time.perf_counter_ns()
+    iterator = iter(func(*args, **kwargs))
+    total = time.perf_counter_ns() - start
+    try:
+        while True:
+            t0 = time.perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                total += time.perf_counter_ns() - t0
+            yield item
+    finally:
+        registry.add(name, start, total)
+
+
+def timed(func=None, name=None):
+    """Decorator timing func when profiling is enabled"""
+    if func is None:
+        return functools.partial(timed, name=name)
+    if name is None:
+        name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            registry.add(name, start, time.perf_counter_ns() - start)
+
+    return wrapper
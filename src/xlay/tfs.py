@@ -0,0 +1,188 @@
+"""
+Reader and writer of TFS tables, as produced by the MAD-X survey and twiss
+commands.
+
+    table = xlay.read_tfs("survey.tfs")
+    table["X"]                   # numpy array of a column
+    poses = table.to_poses()     # PoseArray from X, Y, Z, THETA, PHI, PSI
+    beamline = xlay.Beamline.from_table("lhcb1", table)
+
+Columns are parsed in bulk into numpy arrays, without objects per row.
+
+In MAD-X the orientation of a frame is W = Ry(THETA) @ Rx(-PHI) @ Rz(PSI)
+with angles in radians.
+"""
+
+import re
+
+import numpy as np
+
+from .pose import PoseArray
+from .profiling import timed
+
+token_re = re.compile(r'"[^"]*"|\S+')
+
+numeric_formats = {"%le": float, "%lf": float, "%f": float, "%d": int}
+
+
+def parse_value(fmt, value):
+    value = value.strip()
+    if fmt in numeric_formats:
+        return numeric_formats[fmt](value)
+    if fmt.endswith("d"):
+        return int(value)
+    return value.strip('"')
+
+
+class Table:
+    """Columns of a TFS table, as numpy arrays, and the header parameters"""
+
+    def __init__(self, columns, header=None):
+        self.columns = columns
+        self.header = {} if header is None else header
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def __len__(self):
+        if len(self.columns) == 0:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __repr__(self):
+        return f"Table: {len(self)} rows, columns {list(self.columns)}"
+
+    def to_poses(self, name=None):
+        """Return a PoseArray of a survey table"""
+        matrix = madx_matrices(
+            *[self.columns[k] for k in ["X", "Y", "Z", "THETA", "PHI", "PSI"]]
+        )
+        names = list(self.columns["NAME"]) if "NAME" in self.columns else None
+        if name is None:
+            name = self.header.get("SEQUENCE")
+        return PoseArray(matrix, names=names, name=name)
+
+    @classmethod
+    def from_poses(cls, poses, header=None):
+        """Return a survey table of the poses of a PoseArray"""
+        x, y, z, theta, phi, psi = madx_angles(poses.matrix)
+        names = poses.names
+        if names is None:
+            names = [f"{poses.name}.{i}" for i in range(len(poses))]
+        columns = {"NAME": np.array(names, dtype=str)}
+        columns.update(X=x, Y=y, Z=z, THETA=theta, PHI=phi, PSI=psi)
+        return cls(columns, header)
+
+
+@timed
+def read_tfs(filename):
+    """Read a TFS file and return a Table"""
+    header = {}
+    names = []
+    formats = []
+    with open(filename) as fh:
+        for line in fh:
+            if line.startswith("@"):
+                key, fmt, value = line[1:].split(None, 2)
+                header[key] = parse_value(fmt, value)
+            elif line.startswith("*"):
+                names = line[1:].split()
+            elif line.startswith("$"):
+                formats = line[1:].split()
+                break
+        body = fh.read()
+    tokens = token_re.findall(body)
+    ncols = len(names)
+    if ncols == 0 or len(tokens) % ncols != 0:
+        raise ValueError(f"Cannot parse the table of {filename}")
+    rows = np.array(tokens, dtype=object).reshape(-1, ncols)
+    columns = {}
+    for idx, (name, fmt) in enumerate(zip(names, formats)):
+        column = rows[:, idx]
+        if fmt in numeric_formats or fmt.endswith("d"):
+            dtype = int if fmt.endswith("d") else float
+            columns[name] = column.astype(str).astype(dtype)
+        else:
+            columns[name] = np.array(
+                [tt[1:-1] if tt[:1] == '"' else tt for tt in column], dtype=str
+            )
+    return Table(columns, header)
+
+
+def write_tfs(filename, table, fmt="%.16e", chunk=10000):
+    """Write a Table, or a dict of columns, to a TFS file
+
+    fmt: format of the float columns
+    chunk: number of rows formatted at once
+    """
+    if not isinstance(table, Table):
+        table = Table(table)
+    with open(filename, "w") as fh:
+        for key, value in table.header.items():
+            if isinstance(value, (int, np.integer)):
+                fh.write(f"@ {key} %d {value}\n")
+            elif isinstance(value, (float, np.floating)):
+                fh.write(f"@ {key} %le {value!r}\n")
+            else:
+                fh.write(f'@ {key} %{len(str(value))}s "{value}"\n')
+        formats = []
+        row_formats = []
+        columns = []
+        for name, column in table.columns.items():
+            column = np.asarray(column)
+            if column.dtype.kind in "iu":
+                formats.append("%d")
+                row_formats.append("%d")
+            elif column.dtype.kind == "f":
+                formats.append("%le")
+                row_formats.append(fmt)
+            else:
+                formats.append("%s")
+                row_formats.append('"%s"')
+            columns.append(column)
+        fh.write("* " + " ".join(table.columns) + "\n")
+        fh.write("$ " + " ".join(formats) + "\n")
+        if len(columns) == 0:
+            return
+        # one % operation formats a whole chunk of rows
+        row_format = " " + " ".join(row_formats) + "\n"
+        values = np.empty((len(table), len(columns)), dtype=object)
+        for idx, column in enumerate(columns):
+            values[:, idx] = column.tolist()
+        for start in range(0, len(values), chunk):
+            rows = values[start : start + chunk]
+            fh.write(row_format * len(rows) % tuple(rows.ravel().tolist()))
+
+
+def madx_matrices(x, y, z, theta, phi, psi):
+    """Return (N,4,4) matrices of MAD-X survey coordinates, angles in rad"""
+    ct, st = np.cos(theta), np.sin(theta)
+    cp, sp = np.cos(phi), np.sin(phi)
+    cs, ss = np.cos(psi), np.sin(psi)
+    matrix = np.zeros(np.shape(x) + (4, 4))
+    matrix[..., 0, 0] = ct * cs - st * sp * ss
+    matrix[..., 0, 1] = -ct * ss - st * sp * cs
+    matrix[..., 0, 2] = st * cp
+    matrix[..., 1, 0] = cp * ss
+    matrix[..., 1, 1] = cp * cs
+    matrix[..., 1, 2] = sp
+    matrix[..., 2, 0] = -st * cs - ct * sp * ss
+    matrix[..., 2, 1] = st * ss - ct * sp * cs
+    matrix[..., 2, 2] = ct * cp
+    matrix[..., 0, 3] = x
+    matrix[..., 1, 3] = y
+    matrix[..., 2, 3] = z
+    matrix[..., 3, 3] = 1
+    return matrix
+
+
+def madx_angles(matrix):
+    """Return x, y, z, theta, phi, psi of (N,4,4) matrices, angles in rad"""
+    theta = np.arctan2(matrix[..., 0, 2], matrix[..., 2, 2])
+    phi = np.arcsin(np.clip(matrix[..., 1, 2], -1, 1))
+    psi = np.arctan2(matrix[..., 1, 0], matrix[..., 1, 1])
+    x, y, z = np.moveaxis(matrix[..., :3, 3], -1, 0)
+    return x, y, z, theta, phi, psi
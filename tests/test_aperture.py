@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+import xlay
+from xlay.aperture import ApertureModel
+
+
+def brute_force(intervals, s):
+    """Index in the sorted intervals of the covering one starting last"""
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+    result = []
+    for ss in s:
+        found = -1
+        for rank, i in enumerate(order):
+            if intervals[i][0] <= ss <= intervals[i][1]:
+                found = rank
+        result.append(found)
+    return np.array(result)
+
+
+def test_overlapping_intervals():
+    model = ApertureModel(
+        [(0, 10, "MB", ["circle", 0.01]), (2, 3, "MB", ["circle", 0.02])]
+    )
+    assert model.aperture_at([1, 2.5, 5, 9, 10, 11]).tolist() == [0, 1, 0, 0, 0, -1]
+    assert not model.inside(5, 0.5, 0)
+    assert model.inside(5, 0.005, 0)
+    assert model.inside(2.5, 0.015, 0)
+    assert not model.inside(1, 0.015, 0)
+
+
+def test_nested_intervals():
+    intervals = [
+        (0, 20, "A", ["rectangle", 1, 1]),
+        (5, 15, "B", ["ellipse", 0.5, 0.2]),
+        (8, 9, "C", ["circle", 0.1]),
+        (25, 30, "D", ["circle", 0.3]),
+    ]
+    model = ApertureModel(intervals)
+    s = np.array([-1, 0, 4, 5, 7, 8.5, 9, 12, 15, 17, 20, 22, 25, 30, 31])
+    assert np.array_equal(model.aperture_at(s), brute_force(intervals, s))
+
+
+def test_random_intervals_match_brute_force():
+    rng = np.random.default_rng(0)
+    start = rng.uniform(0, 100, 50)
+    intervals = [
+        (ss, ss + ll, f"N{i}", ["circle", 0.01])
+        for i, (ss, ll) in enumerate(zip(start, rng.uniform(0, 20, 50)))
+    ]
+    model = ApertureModel(intervals)
+    s = np.concatenate([rng.uniform(-5, 125, 1000), start])
+    assert np.array_equal(model.aperture_at(s), brute_force(intervals, s))
+
+
+@pytest.mark.parametrize(
+    "aperture, inside, outside",
+    [
+        (["circle", 1], (0.7, 0.7), (0.8, 0.8)),
+        (["ellipse", 2, 1], (1.9, 0), (0, 1.1)),
+        (["rectangle", 1, 2], (0.9, 1.9), (1.1, 0)),
+        (["rectellipse", 1, 1, 1.2, 1.2], (0.8, 0.8), (0.9, 0.9)),
+        (["polygon", [[-1, -1], [1, -1], [0, 1]]], (0, 0), (0.9, 0.9)),
+    ],
+)
+def test_shapes(aperture, inside, outside):
+    model = ApertureModel([(0, 1, "N", aperture)])
+    assert model.inside(0.5, *inside)
+    assert not model.inside(0.5, *outside)
+
+
+def test_empty_model():
+    model = ApertureModel([])
+    assert model.aperture_at([0, 1]).tolist() == [-1, -1]
+    assert model.inside([0, 1], [5, 5], [5, 5]).all()
+
+
+def make_beamline():
+    magnet = xlay.Magnet(length=2, aperture=["circle", 0.01], name="MQ")
+    region = xlay.Region(
+        length=10,
+        profiles=[[0, 5, ["circle", 0.02]], [5, 10, ["rectangle", 0.03, 0.01]]],
+        name="VAC",
+    )
+    nodes = {
+        "MQ.1": xlay.Node("MQ.1", magnet, at=5),
+        "VAC.1": xlay.Node("VAC.1", region, at=15),
+    }
+    return xlay.Beamline(name="LINE", nodes=nodes)
+
+
+def test_beamline_apertures():
+    model = make_beamline().apertures()
+    assert model.names == ["MQ.1", "VAC.1", "VAC.1"]
+    assert np.allclose(model.start, [4, 10, 15])
+    assert np.allclose(model.end, [6, 15, 20])
+    s = [3, 5, 8, 12, 17, 21]
+    assert model.aperture_at(s).tolist() == [-1, 0, -1, 1, 2, -1]
+    assert model.inside(s, 0.015, 0).tolist() == [True, False, True, True, True, True]
+    assert not model.inside(17, 0, 0.02)
+
+
+def test_from_beamline_matches_apertures():
+    beamline = make_beamline()
+    model = ApertureModel.from_beamline(beamline)
+    assert np.array_equal(model.kind, beamline.apertures().kind)
+    assert np.array_equal(model.params, beamline.apertures().params)
+
+
+def test_region_from_yaml(tmp_path):
+    filename = tmp_path / "layout.yaml"
+    filename.write_text(
+        """\
+VAC: [Region, length: 4, profiles: [[0, 4, [ellipse, 0.02, 0.01]]]]
+
+LINE:
+   - Beamline
+   - VAC.1: [VAC, at: 2]
+"""
+    )
+    layout = xlay.Layout.from_yaml(str(filename))
+    model = layout["LINE"].apertures()
+    assert len(model) == 1
+    assert model.inside(1, 0.015, 0) and not model.inside(1, 0, 0.015)
@@ -0,0 +1,49 @@
+"""Run each benchmark once at the smallest size, so that they do not rot"""
+
+import importlib
+import inspect
+import itertools
+import pkgutil
+
+import pytest
+
+import benchmarks
+
+
+def iter_benchmarks():
+    for info in pkgutil.iter_modules(benchmarks.__path__):
+        if not info.name.startswith("bench_"):
+            continue
+        module = importlib.import_module(f"benchmarks.{info.name}")
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            for name in dir(cls):
+                if name.startswith("time_"):
+                    yield pytest.param(cls, name, id=f"{cls.__name__}.{name}")
+
+
+def smallest_params(cls):
+    """Return the argument tuples with the smallest size and all the others"""
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if len(getattr(cls, "param_names", [])) <= 1:
+        return [(min(params),)]
+    return [(min(params[0]),) + rest for rest in itertools.product(*params[1:])]
+
+
+@pytest.mark.parametrize("cls, name", list(iter_benchmarks()))
+def test_benchmark_runs(cls, name):
+    for args in smallest_params(cls):
+        bench = cls()
+        try:
+            if hasattr(bench, "setup"):
+                bench.setup(*args)
+        except NotImplementedError:
+            continue  # skipped by asv, e.g. numba not installed
+        try:
+            getattr(bench, name)(*args)
+        finally:
+            if hasattr(bench, "teardown"):
+                bench.teardown(*args)
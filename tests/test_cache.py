@@ -0,0 +1,83 @@
+import pytest
+
+import xlay
+from xlay.cache import RenderCache, primitives_nbytes, render_cache
+
+
+@pytest.fixture
+def cache():
+    render_cache.clear()
+    render_cache.enabled = True
+    yield render_cache
+    render_cache.enabled = False
+    render_cache.clear()
+
+
+def make_frame(size=4):
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    box = xlay.Rectangle("B", lx=2, ly=2)
+    parts = [rect.at(f"P{i}").tx(2 * i) for i in range(size)]
+    return xlay.Frame("F", box.at("Q"), *parts), rect
+
+
+def test_disabled_by_default():
+    assert not render_cache.enabled
+    frame, _ = make_frame()
+    list(frame.iter_render({}))
+    assert render_cache.stats()["size"] == 0
+
+
+def make_pose_frame(size=4):
+    """Frame without cached elements, only the frame is cached"""
+    return xlay.Frame("F", *[xlay.Pose(name=f"P{i}").tx(i) for i in range(size)])
+
+
+def test_iter_render_hits_and_invalidates(cache):
+    frame = make_pose_frame()
+    style = {"labels": True}
+    first = list(frame.iter_render(style))
+    second = list(frame.iter_render(style))
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert all(aa is bb for aa, bb in zip(first, second))
+    frame.parts["P0"].x = 5
+    third = list(frame.iter_render(style))
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert third[-1].matrix[0, 0, 3] == 5
+
+
+def test_iter_render_streams_on_miss(cache):
+    frame = make_pose_frame()
+    iterator = frame.iter_render({"labels": True})
+    next(iterator)
+    assert cache.stats()["size"] == 0  # not cached until complete
+    assert len(list(iterator)) == 4
+    assert cache.stats()["size"] == 1
+
+
+def test_nested_render_cache(cache):
+    frame, rect = make_frame()
+    first = list(frame.iter_render({}))
+    rect.lx = 3
+    second = list(frame.iter_render({}))
+    assert first[-1].element is not second[-1].element
+
+
+def test_cache_bounded_by_bytes():
+    cache = RenderCache(maxsize=100, maxbytes=3000)
+    frame, _ = make_frame()
+    primitives = frame.render({})
+    nbytes = primitives_nbytes(primitives)
+    assert 0 < nbytes <= 3000
+    for key in range(10):
+        cache.put(key, primitives)
+        assert cache.nbytes <= 3000
+    assert len(cache.entries) == 3000 // nbytes
+    assert cache.get(9) is primitives
+    assert cache.get(0) is None
+
+
+def test_cache_skips_oversized_entries():
+    cache = RenderCache(maxbytes=10)
+    frame, _ = make_frame()
+    cache.put("key", frame.render({}))
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,312 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pytest
+
+from xlay.canvas import SimpleProjection
+
+
+@pytest.mark.parametrize("scale", [1, [1, 1], np.array([1, 1]), np.array([2.0, 3.0])])
+def test_simple_projection_scale(scale):
+    points = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+    projection = SimpleProjection("xz", scale=scale, origin=np.array([0, 0]))
+    x, y = projection.transform(points)
+    sx, sy = np.broadcast_to(scale, (2,))
+    assert np.allclose(x, [1 * sx, 2 * sx])
+    assert np.allclose(y, [5 * sy, 6 * sy])
+
+
+def test_simple_projection_origin():
+    projection = SimpleProjection("xy", origin=(1, -1))
+    x, y = projection.transform(np.zeros((3, 2)))
+    assert np.allclose(x, 1) and np.allclose(y, -1)
+
+
+def make_projection(**kwargs):
+    from xlay import Curve, CurvilinearProjection
+
+    curve = Curve()
+    curve.lineby(10)
+    curve.bendby(10, 30)
+    return CurvilinearProjection(curve, **kwargs)
+
+
+def test_curvilinear_assign_cache_is_weak_and_bounded():
+    import gc
+    import weakref
+
+    projection = make_projection(cache_size=2)
+    points = np.vstack([np.random.default_rng(0).uniform(0, 5, (3, 10)), np.ones(10)])
+    x0, y0 = projection.transform(points)
+    assert len(projection.cache) == 1
+    x1, y1 = projection.transform(points)  # cache hit
+    assert np.allclose(x0, x1) and np.allclose(y0, y1)
+    ref = weakref.ref(points)
+    del points
+    gc.collect()
+    assert ref() is None
+    assert len(projection.cache) == 0
+    arrays = [np.zeros((4, 3)) + i for i in range(5)]
+    for array in arrays:
+        projection.transform(array)
+    assert len(projection.cache) == 2
+
+
+def line_and_arc_points(s, x, y):
+    """4xN points at (s, x, y) of the curve of make_projection"""
+    radius = 10 / np.radians(30)
+    angle = np.clip(s - 10, 0, None) / radius
+    along = np.clip(s, None, 10)  # the line is along z, then the arc bends to -x
+    px = (radius + x) * np.cos(angle) - radius
+    pz = along + (radius + x) * np.sin(angle)
+    return np.vstack([px, y, pz, np.ones_like(s)])
+
+
+@pytest.mark.parametrize("axes", ["sx", "sy"])
+def test_curvilinear_matches_analytic(axes):
+    rng = np.random.default_rng(1)
+    s = np.concatenate([rng.uniform(0, 20, 200), [-2, 0, 10, 20]])
+    x = rng.uniform(-2, 2, len(s))
+    y = rng.uniform(-2, 2, len(s))
+    projection = make_projection(axes=axes)
+    ss, offset = projection.transform(line_and_arc_points(s, x, y))
+    assert np.allclose(ss, s, rtol=0, atol=1e-7)
+    assert np.allclose(offset, x if axes == "sx" else y, rtol=0, atol=1e-7)
+
+
+def test_multiview_dtype_and_origin():
+    import matplotlib.pyplot as plt
+
+    import xlay
+
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    view = xlay.MultiView(
+        projections=("xy",), dtype=np.float32, origin=np.array([1000.0, 0, 0])
+    )
+    view.add(xlay.Frame("F", rect.at("P").tx(1000.5)))
+    view.draw()
+    assert view.geometry.dtype == np.float32
+    items = view.geometry.get("F", view[0].elements["F"], view[0].style, {})
+    points = [points for _, points in items if points.ndim == 2]
+    assert all(array.dtype == np.float32 for array in points)
+    assert all(np.abs(array[0]).max() < 2 for array in points)
+    plt.close(view.fig)
+
+
+class BlockingElement:
+    """Element whose rendering waits for an event"""
+
+    def __init__(self, event):
+        self.name = "blocking"
+        self.event = event
+
+    def iter_render(self, style):
+        self.event.wait(5)
+        return iter([])
+
+
+def test_world_geometry_renders_concurrently():
+    import threading
+
+    import xlay
+    from xlay.canvas import WorldGeometry
+
+    geometry = WorldGeometry()
+    event = threading.Event()
+    thread = threading.Thread(
+        target=geometry.get, args=("A", BlockingElement(event), {}, {})
+    )
+    thread.start()
+    try:
+        rect = xlay.Rectangle("R", lx=1, ly=0.5)
+        items = geometry.get("B", rect, {}, {})  # must not wait for A
+        assert len(items) == 1
+        assert thread.is_alive()
+    finally:
+        event.set()
+        thread.join()
+    assert "A" in geometry.cache and "B" in geometry.cache
+
+
+def test_canvas_close_shuts_down_worker():
+    import matplotlib.pyplot as plt
+
+    import xlay
+
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    fig, ax = plt.subplots()
+    with xlay.Canvas2D(fig=fig, ax=ax) as canvas:
+        canvas.add(xlay.Frame("F", rect.at("P")))
+        future = canvas.draw_async()
+        assert canvas.flush(wait=True)
+        executor = canvas.executor
+    assert future.done()
+    assert canvas.executor is None
+    assert executor._shutdown
+    plt.close(fig)
+
+
+def make_distinct_frame(size=5):
+    import xlay
+
+    parts = [
+        xlay.Rectangle(f"R{i}", lx=1, ly=0.5).at(f"P{i}").tx(3 * i)
+        for i in range(size)
+    ]
+    return xlay.Frame("F", *parts)
+
+
+def draw_canvas(style):
+    import matplotlib.pyplot as plt
+
+    import xlay
+
+    fig, ax = plt.subplots()
+    canvas = xlay.Canvas2D(fig=fig, ax=ax, style=style)
+    canvas.add(make_distinct_frame())
+    canvas.draw()
+    return canvas
+
+
+def test_draw_batches_poses_per_style():
+    import matplotlib.collections as mcollections
+    import matplotlib.pyplot as plt
+
+    canvas = draw_canvas({})
+    scatters = [
+        artist
+        for artist in canvas.artists["F"]
+        if isinstance(artist, mcollections.PathCollection)
+    ]
+    assert len(scatters) == 1
+    assert len(scatters[0].get_offsets()) == 5
+    plt.close(canvas.fig)
+
+
+def test_draw_labels_follow_style():
+    import matplotlib.pyplot as plt
+
+    canvas = draw_canvas({"labels": False})
+    assert canvas.labels.chunks == []
+    assert canvas.labels.artists == []
+    plt.close(canvas.fig)
+    canvas = draw_canvas({"labels": True})
+    texts = {artist.get_text() for artist in canvas.labels.artists}
+    assert "P0" in texts
+    plt.close(canvas.fig)
+
+
+def test_clear_disconnects_limit_callbacks():
+    import matplotlib.pyplot as plt
+
+    canvas = draw_canvas({"labels": True})
+    registry = canvas.ax.callbacks.callbacks
+    before = len(registry.get("xlim_changed", {}))
+    assert len(canvas.labels.cids) == 2
+    canvas.clear()
+    assert canvas.labels.cids == []
+    assert len(registry.get("xlim_changed", {})) == before - 1
+    plt.close(canvas.fig)
+
+
+def test_clear_disconnects_density_rasters():
+    import matplotlib.pyplot as plt
+
+    import xlay
+    from xlay.primitives import Points
+
+    points = Points(np.random.default_rng(0).normal(size=(3, 1000)), name="cloud")
+    fig, ax = plt.subplots()
+    canvas = xlay.Canvas2D(fig=fig, ax=ax, style={"center.visible": False})
+    canvas.add(xlay.Frame("F", points.at("P")))
+    canvas.draw()
+    assert len(canvas.rasters) == 1
+    raster = canvas.rasters[0]
+    assert np.ma.count(raster.image.get_array()) > 0
+    canvas.clear()
+    assert raster.cids == []
+    plt.close(fig)
+
+
+def draw_cloud(source, **kwargs):
+    import matplotlib.pyplot as plt
+
+    import xlay
+    from xlay.primitives import Points
+
+    points = Points(source, name="cloud", **kwargs)
+    fig, ax = plt.subplots()
+    canvas = xlay.Canvas2D(fig=fig, ax=ax, style={"center.visible": False})
+    canvas.add(xlay.Frame("F", points.at("P")))
+    canvas.draw()
+    return canvas, canvas.rasters[0]
+
+
+def test_density_raster_counts_points_in_limits():
+    import matplotlib.pyplot as plt
+
+    source = np.random.default_rng(1).normal(size=(3, 5000))
+    canvas, raster = draw_cloud(source)
+    canvas.ax.set_xlim(-10, 10)
+    canvas.ax.set_ylim(-10, 10)
+    assert raster.image.get_array().sum() == 5000
+    canvas.ax.set_xlim(0, 10)  # recomputed on limit changes
+    assert raster.image.get_array().sum() == np.sum(source[0] >= 0)
+    plt.close(canvas.fig)
+
+
+def test_density_raster_memmap_chunks(tmp_path):
+    import matplotlib.pyplot as plt
+
+    from xlay.primitives import Points
+
+    source = np.random.default_rng(2).normal(size=(3, 3000)).astype("<f4")
+    filename = tmp_path / "cloud.npy"
+    np.save(filename, source)
+    assert isinstance(Points.from_file(filename).source, np.memmap)
+    mapped = np.load(filename, mmap_mode="r")
+    images = []
+    for points, kwargs in [(source, {}), (mapped, {"chunk_size": 700})]:
+        canvas, raster = draw_cloud(points, **kwargs)
+        canvas.ax.set_xlim(-5, 5)
+        canvas.ax.set_ylim(-5, 5)
+        images.append(raster.image.get_array().filled(0))
+        plt.close(canvas.fig)
+    assert np.array_equal(images[0], images[1])
+
+
+def test_points_bounds_and_shape():
+    from xlay.primitives import Points
+
+    source = np.array([[0, 1, -2], [3, 0, 1], [0, 0, 5]], dtype=float)
+    points = Points(source, chunk_size=2)
+    lo, hi = points.bounds()
+    assert np.array_equal(lo, [-2, 0, 0]) and np.array_equal(hi, [1, 3, 5])
+    with pytest.raises(ValueError):
+        Points(np.zeros((2, 5)))
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_redraw_follows_changes_in_place(shared):
+    import matplotlib.pyplot as plt
+
+    import xlay
+    from xlay.canvas import WorldGeometry
+
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    fig, ax = plt.subplots()
+    geometry = WorldGeometry() if shared else None
+    canvas = xlay.Canvas2D(fig=fig, ax=ax, geometry=geometry)
+    canvas.add(xlay.Frame("F", rect.at("P")))
+    canvas.draw()
+    assert len(ax.collections) == 1  # center markers
+    canvas.style["center.visible"] = False
+    canvas.draw()
+    assert len(ax.collections) == 0
+    rect.lx = 3
+    canvas.draw()
+    [patch] = ax.patches
+    assert np.ptp(patch.get_path().vertices[:, 0]) == pytest.approx(3)
+    plt.close(fig)
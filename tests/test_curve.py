@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+import xlay
+from xlay.primitives import ArcTo, BendBy, LineBy
+
+kinds = ["line", "bend", "bend", "line", "bend"]
+lengths = [2.0, 3.0, 1.5, 4.0, 2.5]
+angles = [0, 30, -20, 0, 45]
+rolls = [0, 0, 90, 0, 30]
+
+
+def incremental(kinds, lengths, angles, rolls):
+    curve = xlay.Curve()
+    for kind, length, angle, roll in zip(kinds, lengths, angles, rolls):
+        if kind == "line":
+            curve.lineby(length)
+        else:
+            curve.bendby(length, angle, roll)
+    return curve
+
+
+def samples(curve, num=50):
+    return curve.matrices(np.linspace(curve.s_start, curve.s_end, num))
+
+
+def test_from_arrays_matches_incremental():
+    reference = incremental(kinds, lengths, angles, rolls)
+    curve = xlay.Curve.from_arrays(kinds, lengths, angles, rolls)
+    assert curve.s_end == pytest.approx(sum(lengths))
+    assert np.allclose(curve.end.matrix, reference.end.matrix)
+    assert np.allclose(samples(curve), samples(reference))
+    assert len(curve.segments) == len(kinds)
+
+
+def test_from_arrays_broadcasts_scalars():
+    curve = xlay.Curve.from_arrays(["bend"] * 4, 1.0, angle=90)
+    assert np.allclose(curve.end.rot, xlay.Pose().ry(360).rot, atol=1e-12)
+
+
+def test_from_arrays_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        xlay.Curve.from_arrays(["line", "arc"], [1, 1])
+
+
+@pytest.mark.parametrize(
+    "edit, expected",
+    [
+        (
+            lambda curve: curve.replace_spec(2, LineBy(1.5)),
+            (kinds[:2] + ["line"] + kinds[3:], lengths, angles[:2] + [0] + angles[3:]),
+        ),
+        (
+            lambda curve: curve.insert_spec(1, BendBy(1.0, 10)),
+            (kinds[:1] + ["bend"] + kinds[1:], lengths[:1] + [1.0] + lengths[1:],
+             angles[:1] + [10] + angles[1:]),
+        ),
+        (
+            lambda curve: curve.delete_spec(3),
+            (kinds[:3] + kinds[4:], lengths[:3] + lengths[4:], angles[:3] + angles[4:]),
+        ),
+    ],
+    ids=["replace", "insert", "delete"],
+)
+def test_edits_match_rebuilt_curve(edit, expected):
+    curve = xlay.Curve.from_arrays(kinds, lengths, angles)
+    curve.end  # compute the start matrices before the edit
+    edit(curve)
+    reference = xlay.Curve.from_arrays(*expected)
+    assert np.allclose(curve.end.matrix, reference.end.matrix)
+    assert np.allclose(samples(curve), samples(reference))
+
+
+def test_edit_recomputes_downstream_only():
+    curve = xlay.Curve.from_arrays(["bend"] * 100, 1.0, angle=1)
+    curve.end
+    with xlay.profile() as registry:
+        curve.replace_spec(90, BendBy(1.0, 2))
+        curve.end
+    assert registry.counters["curve.segments"] == 10
+
+
+def test_from_arrays_creates_specs_on_access():
+    curve = xlay.Curve.from_arrays(kinds, lengths, angles, rolls)
+    assert curve.specs == [None] * len(kinds)
+    curve.end
+    assert curve.specs == [None] * len(kinds)
+    spec = curve.get_spec(1)
+    assert isinstance(spec, BendBy) and spec.angle == 30
+    assert isinstance(curve.get_spec(0), LineBy)
+
+
+@pytest.mark.parametrize(
+    "spec, error",
+    [(ArcTo(1.0, xlay.Pose()), NotImplementedError), (LineBy(1.0, "w"), ValueError)],
+    ids=["arcto", "lineby-axis"],
+)
+def test_bad_spec_leaves_curve_intact(spec, error):
+    curve = incremental(kinds, lengths, angles, rolls)
+    end = curve.end.matrix
+    for edit in [
+        lambda: curve.add_spec(spec),
+        lambda: curve.insert_spec(1, spec),
+        lambda: curve.replace_spec(1, spec),
+    ]:
+        with pytest.raises(error):
+            edit()
+    assert len(curve.specs) == len(kinds)
+    assert np.allclose(curve.end.matrix, end)
+    assert len(curve.segments) == len(kinds)
@@ -0,0 +1,89 @@
+import json
+import struct
+
+import numpy as np
+
+import xlay
+from xlay.export import stl_dtype
+
+
+def tetrahedron():
+    points = np.array([[0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=float)
+    faces = [[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]]
+    return xlay.Mesh(points, faces, name="T")
+
+
+def poses(mesh):
+    return [mesh.at("A"), mesh.at("B").tx(2).rz(90)]
+
+
+def read_glb(filename):
+    data = open(filename, "rb").read()
+    magic, version, total = struct.unpack("<4sII", data[:12])
+    assert (magic, version, total) == (b"glTF", 2, len(data))
+    size, kind = struct.unpack("<I4s", data[12:20])
+    assert kind == b"JSON"
+    gltf = json.loads(data[20 : 20 + size])
+    bin_size, kind = struct.unpack("<I4s", data[20 + size : 28 + size])
+    assert kind == b"BIN\0"
+    return gltf, data[28 + size : 28 + size + bin_size]
+
+
+def test_write_stl(tmp_path):
+    mesh = tetrahedron()
+    filename = tmp_path / "mesh.stl"
+    xlay.write_stl(filename, poses(mesh))
+    data = filename.read_bytes()
+    (count,) = struct.unpack("<I", data[80:84])
+    assert count == 8
+    tri = np.frombuffer(data[84:], dtype=stl_dtype)
+    assert len(tri) == count
+    second = poses(mesh)[1].matrix
+    expected = (second[:3, :3] @ mesh.points[:3] + second[:3, 3:]).T[mesh.faces]
+    assert np.allclose(tri["vertices"][4:], expected, atol=1e-6)
+    assert np.allclose(np.linalg.norm(tri["normal"], axis=-1), 1)
+
+
+def test_write_obj(tmp_path):
+    mesh = tetrahedron()
+    filename = tmp_path / "mesh.obj"
+    xlay.write_obj(filename, poses(mesh))
+    lines = filename.read_text().splitlines()
+    assert [line for line in lines if line.startswith("o ")] == ["o T.0", "o T.1"]
+    assert sum(line.startswith("v ") for line in lines) == 8
+    faces = [line for line in lines if line.startswith("f ")]
+    assert faces[0] == "f 1 3 2"
+    assert faces[4] == "f 5 7 6"
+
+
+def test_write_glb_stores_shared_mesh_once(tmp_path):
+    mesh = tetrahedron()
+    filename = tmp_path / "mesh.glb"
+    frame = xlay.Frame("F", *poses(mesh))
+    xlay.write_glb(filename, frame.iter_render({"center.visible": False}))
+    gltf, blob = read_glb(filename)
+    assert len(gltf["meshes"]) == 1
+    assert len(gltf["nodes"]) == 2
+    view = gltf["bufferViews"][gltf["accessors"][0]["bufferView"]]
+    start = view["byteOffset"]
+    vertices = np.frombuffer(blob[start : start + view["byteLength"]], dtype="<f4")
+    assert np.allclose(vertices.reshape(-1, 3), mesh.vertices)
+    matrices = [np.reshape(node["matrix"], (4, 4)).T for node in gltf["nodes"]]
+    expected = [pose.matrix for pose in poses(mesh)]
+    assert np.allclose(sorted(m[0, 3] for m in matrices), [0, 2])
+    assert any(np.allclose(matrix, expected[1]) for matrix in matrices)
+
+
+def test_write_glb_skips_empty_meshes(tmp_path):
+    empty = xlay.Mesh(np.zeros((3, 0)), np.zeros((0, 3), dtype=int), name="E")
+    filename = tmp_path / "mesh.glb"
+    xlay.write_glb(filename, [empty.at("A"), *poses(tetrahedron())])
+    gltf, blob = read_glb(filename)
+    assert [mesh["name"] for mesh in gltf["meshes"]] == ["T"]
+    assert len(gltf["nodes"]) == 2
+    assert len(blob) == gltf["buffers"][0]["byteLength"]
+    xlay.write_glb(filename, [empty.at("A")])
+    data = filename.read_bytes()
+    assert struct.unpack("<I", data[8:12])[0] == len(data)
+    gltf = json.loads(data[20:])
+    assert gltf["meshes"] == [] and gltf["buffers"] == []
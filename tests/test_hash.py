@@ -0,0 +1,118 @@
+import gc
+import pickle
+import weakref
+
+import numpy as np
+import pytest
+
+import xlay
+from xlay import pose as pose_module
+from xlay.pose import Parts, Pose, PoseArray
+
+
+def fresh_hash(node):
+    """Hash of a copy without memoized digests"""
+    return pickle.loads(pickle.dumps(node)).content_hash()
+
+
+def make_frame(size=8):
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    parts = [rect.at(f"P{i}").tx(i) for i in range(size)]
+    return xlay.Frame("F", *parts), rect
+
+
+def test_construction_does_not_invalidate(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pose_module, "invalidate", lambda *args: calls.append(args))
+    Pose(name="P")
+    xlay.Rectangle("R", lx=1, ly=2)
+    xlay.Frame("F", Pose(name="P"))
+    assert calls == []
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda frame, rect: frame.parts["P1"].tx(1),
+        lambda frame, rect: setattr(frame.parts["P1"], "x", 3),
+        lambda frame, rect: setattr(frame.parts["P1"], "rot", np.eye(3)[::-1]),
+        lambda frame, rect: setattr(rect, "lx", 3),
+        lambda frame, rect: frame.parts.__setitem__("P9", Pose(name="P9")),
+        lambda frame, rect: frame.parts.__delitem__("P2"),
+        lambda frame, rect: setattr(frame, "data", {"a": 1}),
+    ],
+)
+def test_hash_follows_mutations(mutate):
+    frame, rect = make_frame()
+    before = frame.content_hash()
+    mutate(frame, rect)
+    assert frame.content_hash() != before
+    assert frame.content_hash() == fresh_hash(frame)
+
+
+def test_one_part_change_updates_one_term():
+    frame, _ = make_frame()
+    frame.content_hash()
+    terms = dict(frame.parts.terms)
+    frame.parts["P3"].ty(1)
+    assert frame.hash_cache is None
+    assert frame.parts.dirty == {"P3"}
+    frame.content_hash()
+    changed = [key for key in terms if terms[key] != frame.parts.terms[key]]
+    assert changed == ["P3"]
+
+
+def test_unrelated_change_keeps_hash():
+    frame, _ = make_frame()
+    digest = frame.content_hash()
+    other = Pose()
+    other.content_hash()
+    other.tx(1)
+    xlay.Rectangle("R", lx=1, ly=0.5).lx = 2
+    assert frame.hash_cache == digest
+
+
+def test_shared_element_change_updates_all_parts():
+    frame, rect = make_frame()
+    clone = frame.clone()
+    digests = frame.content_hash(), clone.content_hash()
+    rect.ly = 2
+    assert frame.content_hash() not in digests
+    assert clone.content_hash() == frame.content_hash() == fresh_hash(frame)
+
+
+def test_clone_part_change_keeps_prototype_hash():
+    frame, _ = make_frame()
+    clone = frame.clone({"P0": Pose(name="P0")})
+    digest = frame.content_hash()
+    clone.content_hash()
+    clone.parts["P0"].tx(1)
+    assert frame.hash_cache == digest
+    assert clone.content_hash() == fresh_hash(clone)
+
+
+def test_parts_hash_ignores_order():
+    aa, bb = Pose(name="A"), Pose(name="B").tx(1)
+    assert Parts({"A": aa, "B": bb}).content_hash() == Parts({"B": bb, "A": aa}).content_hash()
+
+
+def test_pose_view_invalidates_owner():
+    array = PoseArray(np.tile(np.eye(4), (3, 1, 1)), name="A")
+    frame = xlay.Frame("F", array)
+    digest = frame.content_hash()
+    array.view(1).tx(2)
+    assert array.matrix[1, 0, 3] == 2
+    assert frame.content_hash() != digest
+    assert frame.content_hash() == fresh_hash(frame)
+
+
+def test_parents_are_weak():
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    frame = xlay.Frame("F", rect.at("P"))
+    frame.content_hash()
+    ref = weakref.ref(frame)
+    del frame
+    gc.collect()
+    assert ref() is None
+    rect.lx = 2  # dead parents are skipped
+    assert rect.content_hash() == fresh_hash(rect)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from xlay import kernels
+from xlay.pose import cumulative_matmul
+from xlay.primitives import BEND, segment_matrices
+
+
+@pytest.fixture(params=["numpy", "numba"])
+def backend(request, monkeypatch):
+    # without numba the kernels run as plain Python loops
+    monkeypatch.setattr(kernels, "backend", request.param)
+    return request.param
+
+
+def reference(func, *args):
+    previous = kernels.backend
+    kernels.backend = "numpy"
+    try:
+        return func(*args)
+    finally:
+        kernels.backend = previous
+
+
+def random_matrices(rng, nn):
+    angles = rng.uniform(-np.pi, np.pi, nn)
+    matrices = np.tile(np.eye(4), (nn, 1, 1))
+    matrices[:, 0, 0] = np.cos(angles)
+    matrices[:, 0, 1] = -np.sin(angles)
+    matrices[:, 1, 0] = np.sin(angles)
+    matrices[:, 1, 1] = np.cos(angles)
+    matrices[:, :3, 3] = rng.normal(size=(nn, 3))
+    return matrices
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_bend_matrices(backend, seed):
+    rng = np.random.default_rng(seed)
+    nn = 40
+    length = rng.uniform(0, 5, nn)
+    length[:3] = 0
+    angle = rng.uniform(-90, 90, nn)
+    angle[3:6] = 0
+    roll = rng.uniform(-180, 180, nn)
+    s = rng.uniform(0, 1, nn) * length
+    args = (BEND, 2, length, angle, roll, s)
+    result = segment_matrices(*args)
+    assert np.allclose(result, reference(segment_matrices, *args), atol=1e-12)
+
+
+@pytest.mark.parametrize("nn", [0, 1, 2, 7, 33])
+def test_cumulative_matmul(backend, nn):
+    matrices = random_matrices(np.random.default_rng(nn), nn)
+    result = cumulative_matmul(matrices)
+    assert result.shape == matrices.shape
+    assert np.allclose(result, reference(cumulative_matmul, matrices), atol=1e-12)
+
+
+@pytest.mark.parametrize("shape", [(4, 4), (5, 4, 4)])
+def test_transform_points(backend, shape):
+    rng = np.random.default_rng(2)
+    matrix = random_matrices(rng, int(np.prod(shape[:-2]))).reshape(shape)
+    points = np.vstack([rng.normal(size=(3, 11)), np.ones(11)])
+    result = kernels.transform_points(matrix, points)
+    assert np.allclose(result, matrix @ points, atol=1e-12)
+
+
+@pytest.mark.parametrize("value", ["numpi", "NUMBA" if kernels.numba is None else "cuda"])
+def test_invalid_env_backend_warns(monkeypatch, value):
+    monkeypatch.setenv("XLAY_BACKEND", value)
+    with pytest.warns(UserWarning, match="falling back to numpy"):
+        assert kernels.default_backend() == "numpy"
+
+
+def test_env_backend(monkeypatch):
+    monkeypatch.setenv("XLAY_BACKEND", " NumPy ")
+    assert kernels.default_backend() == "numpy"
+    monkeypatch.delenv("XLAY_BACKEND")
+    assert kernels.default_backend() == ("numpy" if kernels.numba is None else "numba")
+
+
+def test_set_backend_rejects_unknown():
+    with pytest.raises(ValueError):
+        kernels.set_backend("numpi")
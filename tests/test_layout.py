@@ -0,0 +1,185 @@
+import os
+
+import numpy as np
+import pytest
+
+import xlay
+
+lattice = """\
+MB: [Bend, length: 3, angle: 0.5]
+MQ: [Quadrupole, length: 1]
+
+RING:
+   - Beamline
+   - MB.1: [MB, at: 5]
+   - MQ.1: [MQ, at: 10, rz: {rz:.3e}]
+   - MB.2: [MB, at: 15]
+"""
+
+
+def write_layout(tmp_path, name="layout.yaml", rz=0):
+    filename = tmp_path / name
+    filename.write_text(lattice.format(rz=rz))
+    return str(filename)
+
+
+def test_diff_detects_small_rotation(tmp_path):
+    layout = xlay.Layout.from_yaml(write_layout(tmp_path, "a.yaml"))
+    other = xlay.Layout.from_yaml(write_layout(tmp_path, "b.yaml", rz=1e-6))
+    result = layout.diff(other)
+    assert result["moved"] == ["RING/MQ.1"]
+    assert np.allclose(result["angle"], 1e-6, rtol=1e-6)
+    assert layout.diff(other, angle_tolerance=1e-5)["moved"] == []
+
+
+def test_diff_reuses_surveys(tmp_path):
+    layout = xlay.Layout.from_yaml(write_layout(tmp_path, "a.yaml"))
+    other = xlay.Layout.from_yaml(write_layout(tmp_path, "b.yaml", rz=1e-6))
+    poses, other_poses = layout.survey(), other.survey()
+    with xlay.profile() as registry:
+        result = layout.diff(other_poses, poses=poses)
+    assert "Layout.survey" not in registry.timers
+    assert result["moved"] == ["RING/MQ.1"]
+    assert np.allclose(result["angle"], layout.diff(other)["angle"])
+
+
+def write_text(tmp_path, text, name="lazy.yaml"):
+    filename = tmp_path / name
+    filename.write_text(text, encoding="utf-8")
+    return str(filename)
+
+
+def test_lazy_matches_eager(tmp_path):
+    filename = write_layout(tmp_path)
+    eager = xlay.Layout.from_yaml(filename)
+    lazy = xlay.Layout.from_yaml(filename, lazy=True)
+    assert list(lazy.data) == list(eager.data)
+    assert np.allclose(lazy.survey().matrix, eager.survey().matrix)
+
+
+def test_lazy_quoted_keys_and_comments(tmp_path):
+    filename = write_text(
+        tmp_path,
+        """\
+# é: [Bend, length: 9]
+"MB.A": [Bend, length: 2]
+'Q:1':
+  - Quadrupole
+# MX: [Bend]
+  - length: 4
+name: "été"
+size: 1.5
+""",
+    )
+    data = xlay.Layout.from_yaml(filename, lazy=True).data
+    assert set(data) == {"vars", "MB.A", "Q:1"}
+    assert data["MB.A"].length == 2
+    assert data["Q:1"].length == 4
+    assert data["vars"] == {"name": "été"}
+
+
+def test_lazy_anchors_fall_back_to_full_parse(tmp_path):
+    filename = write_text(
+        tmp_path,
+        """\
+common: &common {length: 3}
+MB: [Bend, *common, angle: 1]
+MQ: [Quadrupole, *common]
+""",
+    )
+    layout = xlay.Layout.from_yaml(filename, lazy=True, maxsize=1)
+    data = layout.data
+    assert data.yamldata is not None
+    for _ in range(2):  # evicted objects are built again with the anchors
+        assert data["MB"].length == 3
+        assert data["MQ"].length == 3
+    assert len(data.loaded) == 1
+
+
+def test_lazy_beamlines_are_built_on_access(tmp_path):
+    layout = xlay.Layout.from_yaml(write_layout(tmp_path), lazy=True)
+    beamlines = layout.beamlines()
+    assert list(beamlines) == ["RING"]
+    assert "RING" in beamlines and "MB" not in beamlines
+    assert len(layout.data.loaded) == 0
+    assert beamlines["RING"].name == "RING"
+
+
+anchored = """\
+MB: [Bend, length: 2, angle: 10]
+MQ: [Quadrupole, length: 1]
+EXT:
+  - Beamline
+  - MQ.E1: [MQ, at: 2, from: INJ/MQ.I2]
+RING:
+  - Beamline
+  - MB.1: [MB, at: 5]
+  - MQ.1: [MQ, at: 10]
+  - MB.2: [MB, at: 15]
+INJ:
+  - Beamline
+  - MQ.I1: [MQ, at: 3, from: RING/MQ.1]
+  - MQ.I2: [MQ, at: 6, from: RING/MQ.1]
+"""
+
+
+def node_distance(poses, aa, bb):
+    return np.linalg.norm(poses[aa].loc - poses[bb].loc)
+
+
+def test_survey_all_places_anchored_beamlines(tmp_path):
+    layout = xlay.Layout.from_yaml(write_text(tmp_path, anchored))
+    result = layout.survey_all()
+    assert list(result) == ["EXT", "RING", "INJ"]
+    poses = layout.survey()
+    pose = dict(zip(poses.names, poses))
+    assert node_distance(pose, "RING/MQ.1", "INJ/MQ.I1") == pytest.approx(3)
+    assert node_distance(pose, "RING/MQ.1", "INJ/MQ.I2") == pytest.approx(6)
+    assert node_distance(pose, "INJ/MQ.I2", "EXT/MQ.E1") == pytest.approx(2)
+    ring = layout["RING"].survey()
+    assert np.allclose(result["RING"].matrix, ring.matrix)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_survey_all_workers_match_serial(tmp_path, lazy):
+    layout = xlay.Layout.from_yaml(write_text(tmp_path, anchored), lazy=lazy)
+    serial = layout.survey_all()
+    parallel = layout.survey_all(workers=2)
+    mapped = layout.survey_all(workers=2, directory=str(tmp_path))
+    assert isinstance(mapped["RING"].matrix, np.memmap)
+    for name, poses in serial.items():
+        assert parallel[name].names == poses.names
+        assert np.allclose(parallel[name].matrix, poses.matrix)
+        assert np.allclose(mapped[name].matrix, poses.matrix)
+
+
+def test_survey_all_directory_has_no_temporary_directory(tmp_path, monkeypatch):
+    import tempfile
+
+    layout = xlay.Layout.from_yaml(write_text(tmp_path, anchored))
+    serial = layout.survey_all()
+
+    def fail():
+        raise AssertionError("TemporaryDirectory created")
+
+    monkeypatch.setattr(tempfile, "TemporaryDirectory", fail)
+    mapped = layout.survey_all(workers=2, directory=str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["0.npy", "1.npy", "2.npy", "lazy.yaml"]
+    for name, poses in serial.items():
+        assert isinstance(mapped[name].matrix, np.memmap)
+        assert np.allclose(mapped[name].matrix, poses.matrix)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        anchored.replace("from: RING/MQ.1", "from: LHC/MQ.1"),
+        anchored.replace("from: RING/MQ.1", "from: RING/MQ.9"),
+        anchored.replace("from: RING/MQ.1", "from: EXT/MQ.E1"),
+    ],
+    ids=["beamline", "node", "cycle"],
+)
+def test_survey_all_invalid_anchor(tmp_path, text):
+    layout = xlay.Layout.from_yaml(write_text(tmp_path, text))
+    with pytest.raises(ValueError):
+        layout.survey_all()
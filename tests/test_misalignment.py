@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import xlay
+from xlay.misalignment import error_matrices, error_table, rotation_angle
+
+
+@pytest.mark.parametrize("angle", [1e-9, 1e-7, 1e-3, 1.0, 90.0, 179.0, 180.0])
+def test_rotation_angle(angle):
+    for axis in ["rx", "ry", "rz"]:
+        rot = getattr(xlay.Pose(), axis)(angle).rot
+        assert rotation_angle(rot) == pytest.approx(angle, rel=1e-6)
+
+
+def test_rotation_angle_batched():
+    zero = np.zeros(2)
+    rz = np.array([1e-7, 2.0])
+    rot = error_matrices(zero, zero, zero, zero, zero, rz)[..., :3, :3]
+    assert np.allclose(rotation_angle(rot), [1e-7, 2.0], rtol=1e-6)
+
+
+def make_beamline(size=4, angle=0.5):
+    mb = xlay.Magnet(length=3.0, angle=angle, name="MB")
+    mq = xlay.Magnet(length=1.0, name="MQ")
+    nodes = {}
+    for i in range(size):
+        nodes[f"MB.{i}"] = xlay.Node(f"MB.{i}", mb, at=i * 10.0)
+        nodes[f"MQ.{i}"] = xlay.Node(f"MQ.{i}", mq, at=i * 10.0 + 5)
+    return xlay.Beamline(name="RING", nodes=nodes)
+
+
+def test_misalign_zero_errors():
+    beamline = make_beamline()
+    result = xlay.misalign(beamline, {"MB*": {"tx": 0.0}}, n_seeds=10, seed=1)
+    assert np.allclose(result["delta_max"], 0)
+    assert np.allclose(result["angle_max"], 0)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"n_seeds": 0}, {"n_seeds": -1}, {"chunk": 0}], ids=str
+)
+def test_misalign_rejects_no_seeds(kwargs):
+    with pytest.raises(ValueError):
+        xlay.misalign(make_beamline(), {"MB*": {"tx": 1e-3}}, **kwargs)
+
+
+def test_error_table_last_pattern_wins():
+    names = ["MB.1", "MQ.1", "MQ.2"]
+    table = error_table(names, {"M*": {"tx": 1.0}, "MQ*": {"tx": 2.0, "rz": 3.0}})
+    rows = {(key, value): list(idx) for key, idx, value in table}
+    assert rows == {("tx", 1.0): [0], ("tx", 2.0): [1, 2], ("rz", 3.0): [1, 2]}
+    with pytest.raises(ValueError):
+        error_table(names, {"M*": {"dx": 1.0}})
+
+
+def test_misalign_statistics():
+    beamline = make_beamline(angle=0)
+    sigma = 1e-3
+    result = xlay.misalign(beamline, {"MQ*": {"tx": sigma}}, n_seeds=4000, seed=2)
+    quads = [name.startswith("MQ") for name in result["names"]]
+    bends = np.logical_not(quads)
+    assert np.allclose(result["delta_std"][quads, 0], sigma, rtol=0.1)
+    assert np.allclose(result["delta_mean"][quads, 0], 0, atol=3 * sigma / np.sqrt(4000))
+    assert np.allclose(result["delta_max"][bends], 0)
+    assert np.allclose(result["delta_std"][:, 1:], 0)
+
+
+def test_misalign_callable_and_keep():
+    beamline = make_beamline()
+    uniform = {"rz": lambda rng, size: rng.uniform(-0.5, 0.5, size)}
+    result = xlay.misalign(
+        beamline, {"*": uniform}, n_seeds=50, seed=3, chunk=7, keep=True
+    )
+    assert result["matrix"].shape == (50, len(result["names"]), 4, 4)
+    assert np.all(result["angle_max"] <= 0.5)
+    inverse = np.swapaxes(result["nominal"][:, :3, :3], -1, -2)
+    angle = rotation_angle(inverse @ result["matrix"][..., :3, :3])
+    assert np.allclose(result["angle_mean"], angle.mean(axis=0))
+    assert np.allclose(result["angle_max"], angle.max(axis=0))
+
+
+def test_misalign_workers_match_serial():
+    beamline = make_beamline()
+    errors = {"MB*": {"tx": 1e-4, "rz": 0.01}}
+    serial = xlay.misalign(beamline, errors, n_seeds=40, seed=4, chunk=10)
+    parallel = xlay.misalign(
+        beamline, errors, n_seeds=40, seed=4, chunk=10, workers=2
+    )
+    for key in ["delta_mean", "delta_std", "delta_max", "angle_mean", "angle_max"]:
+        assert np.allclose(serial[key], parallel[key], rtol=1e-12, atol=0)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation, Slerp
+
+from xlay.orientation import quat_from_matrix, quat_to_matrix, slerp
+
+
+def random_rotations(seed, size):
+    return Rotation.random(size, random_state=seed)
+
+
+def test_matrix_round_trip():
+    rot = random_rotations(0, 12).as_matrix().reshape(3, 4, 3, 3)
+    quat = quat_from_matrix(rot)
+    assert quat.shape == (3, 4, 4)
+    assert np.allclose(quat_to_matrix(quat), rot)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_slerp_matches_scipy(seed):
+    pair = random_rotations(seed, 2)
+    t = np.linspace(0, 1, 11)
+    expected = Slerp([0, 1], pair)(t).as_matrix()
+    quat = slerp(pair[0].as_quat(), pair[1].as_quat(), t)
+    assert np.allclose(np.linalg.norm(quat, axis=-1), 1)
+    assert np.allclose(quat_to_matrix(quat), expected)
+
+
+def test_slerp_batched_pairs():
+    q0 = random_rotations(4, 5).as_quat()
+    q1 = random_rotations(5, 5).as_quat()
+    t = np.linspace(0, 1, 5)
+    result = slerp(q0, q1, t)
+    for ii in range(5):
+        pair = Rotation.from_quat([q0[ii], q1[ii]])
+        expected = Slerp([0, 1], pair)(t[ii]).as_matrix()
+        assert np.allclose(quat_to_matrix(result[ii]), expected)
+
+
+def test_slerp_shortest_arc_and_identical():
+    quat = Rotation.from_euler("z", 10, degrees=True).as_quat()
+    mid = slerp(quat, -quat, 0.5)  # same rotation with opposite sign
+    assert np.allclose(quat_to_matrix(mid), quat_to_matrix(quat))
+    assert np.allclose(slerp(quat, quat, [0.0, 0.3, 1.0]), quat)
@@ -0,0 +1,180 @@
+import pickle
+
+import numpy as np
+import pytest
+
+import xlay
+from xlay.layout import Node
+from xlay.pose import PoseArray, filter_primitives
+
+
+def test_posearray_at_applies_name():
+    array = PoseArray(np.tile(np.eye(4), (3, 1, 1)), names=["a", "b", "c"])
+    pose = xlay.Pose(name="P").tx(1)
+    placed = array.at(name="P/array", pose=pose)
+    assert placed.name == "P/array"
+    assert placed.names == ["P/a", "P/b", "P/c"]
+    assert np.allclose(placed.loc[:, 0], 1)
+
+
+def test_posearray_at_without_pose():
+    array = PoseArray(np.eye(4), names=["a"], name="old")
+    assert array.at(name="new").name == "new"
+    assert array.at().name == "old"
+
+
+def make_frame():
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    return xlay.Frame("F", *[rect.at(f"P{i}").tx(i) for i in range(3)])
+
+
+def test_clone_is_isolated_from_prototype_changes():
+    frame = make_frame()
+    clone = frame.clone(parts={"P1": xlay.Pose(name="P1").ty(5)})
+    frame.parts["P3"] = xlay.Pose(name="P3")
+    del frame.parts["P0"]
+    frame.parts["P2"] = xlay.Pose(name="P2").tz(7)
+    assert list(clone.parts) == ["P0", "P1", "P2"]
+    assert clone.parts["P1"].y == 5
+    assert clone.parts["P2"].z == 0
+    assert clone.prototype is frame
+
+
+def test_clones_share_snapshot_and_part_objects():
+    frame = make_frame()
+    first = frame.clone()
+    second = frame.clone()
+    assert first.parts.base is second.parts.base
+    assert first.parts["P0"] is frame.parts["P0"]
+    frame.parts["P3"] = xlay.Pose(name="P3")
+    third = frame.clone()
+    assert third.parts.base is not first.parts.base
+    assert "P3" in third.parts and "P3" not in first.parts
+
+
+def test_clone_overrides_and_removals():
+    frame = make_frame()
+    clone = frame.clone()
+    del clone.parts["P0"]
+    clone.parts["Q"] = xlay.Pose(name="Q")
+    assert list(clone.parts) == ["P1", "P2", "Q"]
+    assert list(frame.parts) == ["P0", "P1", "P2"]
+    assert clone.parts.overrides()[1] == {"P0"}
+
+
+def test_assembly_clone_snapshot():
+    magnet = xlay.Magnet(length=1, name="MB", parts={"a": 1})
+    clone = magnet.clone(parts={"b": 2})
+    magnet.parts["c"] = 3
+    assert dict(clone.parts) == {"a": 1, "b": 2}
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        xlay.Pose(name="P"),
+        xlay.Rectangle("R", lx=1, ly=2),
+        xlay.Line(xlay.Pose(), xlay.Pose().tx(1)),
+        xlay.Polygon([[0, 1, 1], [0, 0, 1]]),
+        Node("N", xlay.Rectangle("R", lx=1, ly=2), at=1),
+    ],
+    ids=type,
+)
+def test_slotted_classes_have_no_dict(obj):
+    assert not hasattr(obj, "__dict__")
+    with pytest.raises(AttributeError):
+        obj.undeclared_attribute = 1
+
+
+def test_pose_pickle_and_clone_use_slots():
+    rect = xlay.Rectangle("R", lx=1, ly=2)
+    pose = rect.at("P", xlay.Pose().tx(1).rz(30))
+    for copy in (pickle.loads(pickle.dumps(pose)), pose.clone()):
+        assert copy.name == "P"
+        assert copy.element.lx == 1
+        assert np.allclose(copy.matrix, pose.matrix)
+    assert pose.content_hash() == pickle.loads(pickle.dumps(pose)).content_hash()
+
+
+def test_pose_unset_slot_raises_without_recursion():
+    pose = xlay.Pose.__new__(xlay.Pose)
+    with pytest.raises(AttributeError):
+        pose.element
+
+
+def test_pose_view_writes_in_place():
+    array = PoseArray(np.tile(np.eye(4), (2, 1, 1)))
+    array.view(1).tx(3)
+    array[0].tx(5)  # owning copy
+    assert np.allclose(array.loc[:, 0], [0, 3])
+
+
+@pytest.fixture
+def float32_vertices():
+    xlay.set_vertex_dtype(np.float32)
+    yield
+    xlay.set_vertex_dtype(np.float64)
+
+
+def test_set_vertex_dtype(float32_vertices):
+    from xlay.canvas import WorldGeometry
+    from xlay.primitives import Points
+
+    mesh = xlay.Mesh(np.eye(3), [[0, 1, 2]])
+    assert mesh.points.dtype == np.float32
+    assert Points(np.zeros((3, 4))).dtype == np.float32
+    assert WorldGeometry().dtype == np.float32
+    mesh64 = xlay.Mesh(np.eye(3), [[0, 1, 2]], dtype=np.float64)
+    assert mesh64.points.dtype == np.float64
+
+
+def test_world_points_relative_to_origin(float32_vertices):
+    from xlay.canvas import world_points
+
+    mesh = xlay.Mesh(np.eye(3) * 1e-3, [[0, 1, 2]])
+    pose = mesh.at("M", xlay.Pose().tx(1e7))
+    assert pose.matrix.dtype == np.float64  # poses stay in double precision
+    points = world_points(pose, dtype=np.float32, origin=np.array([1e7, 0, 0]))
+    assert points.dtype == np.float32
+    assert np.allclose(points[:3], np.eye(3) * 1e-3, atol=1e-9)
+
+
+def render_frame(*parts):
+    rect = xlay.Rectangle("R", lx=1, ly=0.5, layer="mag")
+    line = xlay.Polyline("L", points=np.zeros((4, 2)))
+    poses = [rect.at(name).tx(ii) for ii, name in enumerate(parts)]
+    frame = xlay.Frame("F", *poses, line.at("L0"))
+    return list(frame.iter_render({"center.visible": False}))
+
+
+def primitive_names(primitives):
+    return [
+        pp.names if isinstance(pp, PoseArray) else [pp.name] for pp in primitives
+    ]
+
+
+@pytest.mark.parametrize("parts", [["P0"], ["P0", "P1"]], ids=["pose", "instanced"])
+def test_filter_primitives_by_layer(parts):
+    primitives = render_frame(*parts)
+    selected = list(filter_primitives(primitives, layers={"mag"}))
+    assert primitive_names(selected) == [[f"{name}/R" for name in parts]]
+    assert all(pp.element.layer == "mag" for pp in selected)
+    assert list(filter_primitives(primitives, layers={"other"})) == []
+
+
+def test_filter_primitives_by_name():
+    primitives = render_frame("P0", "P1", "Q0")
+    selected = filter_primitives(primitives, names={"P*", "L0/*"})
+    assert primitive_names(selected) == [["P0/R", "P1/R"], ["L0/L"]]
+    selected = filter_primitives(primitives, names={"Q0/R"})
+    assert primitive_names(selected) == [["Q0/R"]]
+
+
+def test_filter_primitives_by_class():
+    primitives = render_frame("P0", "P1")
+    selected = filter_primitives(primitives, classes={"Polyline"})
+    assert primitive_names(selected) == [["L0/L"]]
+    selected = filter_primitives(primitives, classes={"Polygon", "Polyline"})
+    assert len(list(selected)) == 2
+    poses = [xlay.Pose(name="C")]
+    assert primitive_names(filter_primitives(poses, classes={"Pose"})) == [["C"]]
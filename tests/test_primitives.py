@@ -0,0 +1,14 @@
+import numpy as np
+
+import xlay
+from xlay.primitives import Line
+
+
+def test_line_matrices_follow_endpoint_changes():
+    line = Line(xlay.Pose(), xlay.Pose().tz(10))
+    assert np.allclose(line.matrices(5.0)[0, :3, :3], np.eye(3))
+    line.end.rz(90)  # in place
+    expected = xlay.Pose().rz(45).matrix[:3, :3]
+    assert np.allclose(line.matrices(5.0)[0, :3, :3], expected)
+    line.end = xlay.Pose().tz(10)
+    assert np.allclose(line.matrices(5.0)[0, :3, :3], np.eye(3))
@@ -0,0 +1,70 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+
+import xlay
+from xlay import profiling
+
+
+def make_beamline(size):
+    mb = xlay.Magnet(length=3.0, angle=0.5, name="MB")
+    nodes = {f"MB.{i}": xlay.Node(f"MB.{i}", mb, at=i * 5.0) for i in range(size)}
+    return xlay.Beamline(name="RING", nodes=nodes)
+
+
+def test_profile_disabled_records_nothing():
+    profiling.registry.reset()
+    make_beamline(5).survey()
+    assert profiling.registry.counters == {}
+    assert profiling.registry.timers == {}
+
+
+def test_survey_counters():
+    with xlay.profile() as registry:
+        make_beamline(10).survey()
+    assert registry.counters["survey.nodes"] == 10
+    assert registry.counters["curve.segments"] > 0
+    assert "survey.nodes" in registry.summary()
+
+
+def test_draw_counters():
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    frame = xlay.Frame("F", *[rect.at(f"P{i}").tx(2 * i) for i in range(4)])
+    fig, ax = plt.subplots()
+    canvas = xlay.Canvas2D(fig=fig, ax=ax)
+    canvas.add(frame)
+    with xlay.profile() as registry:
+        canvas.draw()
+    plt.close(fig)
+    assert registry.counters["render.instanced_parts"] == 4
+    assert registry.counters["draw.primitives"] >= 1
+    assert registry.counters["draw.instances"] >= 4
+
+
+def test_timed_iter_reports_iteration_time():
+    @profiling.timed_iter(name="items")
+    def items(n):
+        for i in range(n):
+            yield i
+
+    with xlay.profile() as registry:
+        assert list(items(3)) == [0, 1, 2]
+        partial = items(3)
+        next(partial)
+        partial.close()
+    assert registry.timers["items"][0] == 2
+
+
+def test_canvas_draw_times_iter_render():
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    frame = xlay.Frame("F", rect.at("P0"), xlay.Pose(name="C").tx(1))
+    fig, ax = plt.subplots()
+    canvas = xlay.Canvas2D(fig=fig, ax=ax)
+    canvas.add(frame)
+    with xlay.profile() as registry:
+        canvas.draw()
+    plt.close(fig)
+    assert "Frame.iter_render" in registry.timers
+    assert "Pose.iter_render" in registry.timers
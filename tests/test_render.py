@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import xlay
+from xlay.cache import fingerprint
+from xlay.pose import PoseArray, group_parts
+
+
+def make_frame():
+    rect = xlay.Rectangle("R", lx=1, ly=0.5)
+    box = xlay.Rectangle("B", lx=2, ly=2)
+    parts = [rect.at(f"P{i}").rz(10 * i).tx(3 * i) for i in range(4)]
+    parts += [box.at("Q0").ty(5), box.at("Q1").ty(-5)]
+    parts += [xlay.Pose(name="C0"), rect.at("P4").tx(20)]
+    return xlay.Frame("F", *parts)
+
+
+def assert_same_primitives(serial, parallel):
+    assert len(serial) == len(parallel)
+    for aa, bb in zip(serial, parallel):
+        assert type(aa) is type(bb)
+        assert aa.name == bb.name
+        if isinstance(aa, PoseArray):
+            assert aa.names == bb.names
+        assert np.allclose(aa.matrix, bb.matrix)
+        assert type(aa.element) is type(bb.element)
+        assert fingerprint(aa.element) == fingerprint(bb.element)
+
+
+def test_render_workers_matches_serial():
+    frame = make_frame()
+    serial = frame.render({}, workers=None)
+    parallel = frame.render({}, workers=2)
+    assert any(isinstance(primitive, PoseArray) for primitive in serial)
+    assert_same_primitives(serial, parallel)
+
+
+def test_render_workers_shares_elements():
+    parallel = make_frame().render({}, workers=3)
+    ids = {}
+    for primitive in parallel:
+        if primitive.element is not None:
+            ids.setdefault(fingerprint(primitive.element), set()).add(
+                id(primitive.element)
+            )
+    assert all(len(found) == 1 for found in ids.values())
+
+
+def expand(primitives):
+    """Return the primitives with the PoseArray instances as single poses"""
+    result = []
+    for primitive in primitives:
+        if isinstance(primitive, PoseArray):
+            result.extend(primitive)
+        else:
+            result.append(primitive)
+    return result
+
+
+@pytest.mark.parametrize("style", [{}, {"labels": True}], ids=["centers", "labels"])
+def test_instanced_matches_per_pose_rendering(style):
+    frame = make_frame()
+    instanced = expand(frame.render(style))
+    # per pose rendering, reordered as documented in Frame.render: groups of
+    # parts sharing an element, in order of first appearance, and within a
+    # group the k-th primitive of all the parts before the (k+1)-th
+    expected = []
+    for parts in group_parts(frame.parts.values()):
+        rendered = [list(part.iter_render(style)) for part in parts]
+        for kk in range(len(rendered[0])):
+            expected.extend(primitives[kk] for primitives in rendered)
+    assert [pp.name for pp in instanced] == [pp.name for pp in expected]
+    assert_same_primitives(expected, instanced)
+    serial = [pp for part in frame.parts.values() for pp in part.iter_render(style)]
+    assert sorted(pp.name for pp in serial) == sorted(pp.name for pp in instanced)
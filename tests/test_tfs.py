@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+import xlay
+from xlay.tfs import madx_angles, madx_matrices
+
+survey_tfs = """\
+@ NAME             %06s "SURVEY"
+@ SEQUENCE         %04s "RING"
+@ LENGTH           %le  20.5
+@ NPART            %d   3
+* NAME KEYWORD S L ANGLE X Y Z THETA PHI PSI
+$ %s %s %le %le %le %le %le %le %le %le %le
+ "START" "MARKER" 0 0 0 0 0 0 0 0 0
+ "D 1" "DRIFT" 4 4 0 0 0 4 0 0 0
+ "MB.1" "SBEND" 7 3 0.1 -0.1498 0 6.9950 -0.1 0 0
+ "MQ.1" "QUADRUPOLE" 8 1 0 -0.2496 0 7.9900 -0.1 0 0
+"""
+
+
+def rotation(axis, angle):
+    cc, ss = np.cos(angle), np.sin(angle)
+    ii, jj = [(1, 2), (2, 0), (0, 1)]["xyz".index(axis)]
+    rot = np.eye(3)
+    rot[ii, ii] = rot[jj, jj] = cc
+    rot[ii, jj] = -ss
+    rot[jj, ii] = ss
+    return rot
+
+
+def random_angles(seed, size=20):
+    rng = np.random.default_rng(seed)
+    theta = rng.uniform(-np.pi, np.pi, size)
+    phi = rng.uniform(-1.5, 1.5, size)
+    psi = rng.uniform(-np.pi, np.pi, size)
+    return theta, phi, psi
+
+
+def test_madx_matrices_convention():
+    theta, phi, psi = random_angles(0, 5)
+    matrix = madx_matrices(np.zeros(5), np.zeros(5), np.zeros(5), theta, phi, psi)
+    for ii in range(5):
+        expected = (
+            rotation("y", theta[ii])
+            @ rotation("x", -phi[ii])
+            @ rotation("z", psi[ii])
+        )
+        assert np.allclose(matrix[ii, :3, :3], expected)
+
+
+def test_madx_angles_round_trip():
+    theta, phi, psi = random_angles(1)
+    xyz = np.random.default_rng(2).normal(size=(3, len(theta)))
+    result = madx_angles(madx_matrices(*xyz, theta, phi, psi))
+    for value, expected in zip(result, [*xyz, theta, phi, psi]):
+        assert np.allclose(value, expected)
+
+
+def test_read_tfs(tmp_path):
+    filename = tmp_path / "survey.tfs"
+    filename.write_text(survey_tfs)
+    table = xlay.read_tfs(filename)
+    assert len(table) == 4
+    assert table.header == {
+        "NAME": "SURVEY",
+        "SEQUENCE": "RING",
+        "LENGTH": 20.5,
+        "NPART": 3,
+    }
+    assert list(table["NAME"]) == ["START", "D 1", "MB.1", "MQ.1"]
+    assert table["S"].dtype == float
+    poses = table.to_poses()
+    assert poses.name == "RING"
+    assert np.allclose(poses.loc[2], [-0.1498, 0, 6.995])
+
+
+def test_write_read_round_trip(tmp_path):
+    theta, phi, psi = random_angles(3, 7)
+    xyz = np.random.default_rng(4).normal(size=(3, 7))
+    matrix = madx_matrices(*xyz, theta, phi, psi)
+    poses = xlay.PoseArray(matrix, names=[f"N {i}" for i in range(7)], name="L")
+    table = xlay.Table.from_poses(poses, header={"SEQUENCE": "L", "N": 7})
+    table.columns["TURN"] = np.arange(7)
+    filename = tmp_path / "out.tfs"
+    xlay.write_tfs(filename, table)
+    result = xlay.read_tfs(filename)
+    assert result.header == {"SEQUENCE": "L", "N": 7}
+    assert list(result["NAME"]) == poses.names
+    assert np.array_equal(result["TURN"], np.arange(7))
+    for key in ["X", "Y", "Z", "THETA", "PHI", "PSI"]:
+        assert np.array_equal(result[key], table[key])
+    assert np.allclose(result.to_poses().matrix, matrix)
+
+
+def test_write_tfs_rows(tmp_path):
+    table = {
+        "NAME": ["A", "B 1", "C", "D"],
+        "N": np.arange(4),
+        "S": np.array([0, 0.5, 1e-20, -3]),
+    }
+    filename = tmp_path / "out.tfs"
+    xlay.write_tfs(filename, table, fmt="%.3g", chunk=3)
+    assert filename.read_text().splitlines()[2:] == [
+        ' "A" 0 0',
+        ' "B 1" 1 0.5',
+        ' "C" 2 1e-20',
+        ' "D" 3 -3',
+    ]
+
+
+def test_read_tfs_rejects_ragged_table(tmp_path):
+    filename = tmp_path / "bad.tfs"
+    filename.write_text('* NAME S\n$ %s %le\n "A" 1 "B"\n')
+    with pytest.raises(ValueError):
+        xlay.read_tfs(filename)
+
+
+def test_beamline_from_table(tmp_path):
+    filename = tmp_path / "survey.tfs"
+    filename.write_text(survey_tfs)
+    beamline = xlay.Beamline.from_table("RING", xlay.read_tfs(filename))
+    assert list(beamline.nodes) == ["START", "MB.1", "MQ.1"]
+    assert beamline["MB.1"].at == pytest.approx(5.5)
+    assert beamline["MB.1"].assembly.angle == pytest.approx(np.degrees(0.1))